@@ -1,27 +1,52 @@
-from flask import Flask, render_template, url_for, jsonify, redirect, render_template_string, request, session
+from flask import Flask, Response, render_template, url_for, jsonify, redirect, render_template_string, request, session
 from datetime import timedelta, date
+import os
+import db
+import cache
+import export
+import intake
+import metrics
+import parallel
+import part_orders
+import templating
+from versioning import conditional
 from queries import (
     get_vehicles,
+    get_vehicles_page,
+    search_vehicles,
+    vehicles_query,
+    LISTING_FIELDS,
+    VEHICLE_FIELDS,
+    VEHICLE_SORTS,
     get_parts,
     get_vehicle_by_id,
     get_vehicle_details,
     get_part_by_id,
     insert_vehicle_full,
-    insert_part,
+    insert_part_orders,
+    get_vendors,
     get_manufacturers,
     get_vehicle_types,
     get_colors,
+    get_fuel_types,
     filter_data,
     get_sales_productivity,
     get_seller_history,
     get_part_statistics,
+    export_query,
+    stream_sql,
     authenticate_user,
     add_user,
     get_vehicle_parts,
-    get_vehicle_transactions,
-    update_part_status,
-    get_customers,
-    add_customer
+    get_vehicle_seller,
+    get_vehicle_buyer,
+    set_parts_status,
+    PART_STATUS_MOVES,
+    get_customer,
+    search_customers,
+    add_customer,
+    insert_sales_transaction,
+    insert_purchase_transaction
 )
 
 
@@ -33,6 +58,12 @@ app = Flask(__name__)
 
 app.secret_key = 'BAD_SECRET_KEY'
 app.permanent_session_lifetime = timedelta(minutes=60)
+app.config['CARS_PAGE_SIZE'] = int(os.getenv('CARS_PAGE_SIZE', '25'))
+app.config['CARS_MAX_PAGE_SIZE'] = int(os.getenv('CARS_MAX_PAGE_SIZE', '100'))
+db.init_app(app)
+cache.init_app(app)
+metrics.init_app(app)
+templating.init_app(app)
 
 @app.route('/')
 def home():
@@ -40,117 +71,265 @@ def home():
     return redirect(url_for('cars'))
 
 
-@app.route('/cars')
-def cars():
-    from flask import request
-
-    # Read possible search filters from query string
-    manufacturer_id_raw = request.args.get('manufacturer_id')
-    vehicle_type_id_raw = request.args.get('vehicle_type_id')
-    model_year_raw = request.args.get('model_year')
-    fuel_type_raw = request.args.get('fuel_type')
-    color_id_raw = request.args.get('color_id')
-    get_all_raw = request.args.get('get_all')
-
-    if get_all_raw == None or get_all_raw == '0':
-        get_all_raw = False
-    else:
-        get_all_raw = True
+def _listing_scope(get_all: bool = False) -> tuple[bool, bool]:
+    """(get_all, include_unready) for the vehicle listing, by role: Owners see every
+    vehicle, Buyers every unsold one, everyone else only those ready to sell."""
+    role = session.get('role')
+    if role == 'Owner':
+        return True, False
+    if role == 'Buyer':
+        return False, True
+    return get_all, False
 
-    # Build a filters dict for the query layer (convert to ints where appropriate)
+
+def _vehicle_filters() -> dict:
+    """The get_vehicles filters given in the query string (/cars and /api/vehicles); bad values are ignored."""
     filters = {}
+    for key in ('manufacturer_id', 'vehicle_type_id', 'model_year', 'color_id'):
+        try:
+            if request.args.get(key):
+                filters[key] = int(request.args[key])
+        except ValueError:
+            pass
+    if request.args.get('fuel_type'):
+        filters['fuel_type'] = request.args['fuel_type']
+    q = (request.args.get('q') or '').strip()
+    if q:
+        filters['q'] = q
+    return filters
+
+
+def _page_size() -> int:
     try:
-        if manufacturer_id_raw:
-            filters['manufacturer_id'] = int(manufacturer_id_raw)
-    except ValueError:
-        pass
-    try:
-        if vehicle_type_id_raw:
-            filters['vehicle_type_id'] = int(vehicle_type_id_raw)
-    except ValueError:
-        pass
-    try:
-        if model_year_raw:
-            filters['model_year'] = int(model_year_raw)
-    except ValueError:
-        pass
-    if fuel_type_raw:
-        filters['fuel_type'] = fuel_type_raw
-    try:
-        if color_id_raw:
-            filters['color_id'] = int(color_id_raw)
+        page_size = int(request.args.get('page_size') or app.config['CARS_PAGE_SIZE'])
     except ValueError:
-        pass
+        page_size = app.config['CARS_PAGE_SIZE']
+    return max(1, min(page_size, app.config['CARS_MAX_PAGE_SIZE']))
 
-    cars = get_vehicles(filters if filters else None, get_all_raw)
-    
-    role = session.get('role')
-    if role == 'Owner':
-        cars = get_vehicles(filters if filters else None, True)
-    elif role == 'Buyer':
-        cars = get_vehicles(filters if filters else None, False, True)
 
-    filters = filter_data()
+@app.route('/cars')
+@conditional('vehicle_summary', 'vehicles', 'vehiclecolors', 'colors', 'manufacturers', 'vehicletypes')
+def cars():
+    filters = _vehicle_filters()
+    q_raw = filters.get('q', '')
+    get_all_raw = request.args.get('get_all') not in (None, '0')
+
+    # Sorting and keyset pagination; search results default to best match first
+    sort = request.args.get('sort') or ('relevance' if q_raw else 'year')
+    cursor = request.args.get('cursor') or None
+    page_size = _page_size()
+
+    # One listing query per request, scoped by role
+    get_all, include_unready = _listing_scope(get_all_raw)
+    page = get_vehicles_page(filters if filters else None, get_all, include_unready, sort=sort, cursor=cursor, page_size=page_size)
+
+    # next/prev links keep the filters and sort, and only swap the cursor
+    link_args = {k: v for k, v in request.args.items() if k != 'cursor'}
+    next_url = url_for('cars', **link_args, cursor=page['next_cursor']) if page['next_cursor'] else None
+    prev_url = url_for('cars', **link_args, cursor=page['prev_cursor']) if page['prev_cursor'] else None
+
     # Provide dropdown values and echo-filter values for the template
-    manufacturers = get_manufacturers()
-    vehicle_types = get_vehicle_types()
-    colors = get_colors()
-    current_filters = {
-        'manufacturer_id': manufacturer_id_raw or '',
-        'vehicle_type_id': vehicle_type_id_raw or '',
-        'model_year': model_year_raw or '',
-        'fuel_type': fuel_type_raw or '',
-        'color_id': color_id_raw or '',
-    }
+    facets = filter_data()
+    current_filters = {k: request.args.get(k) or '' for k in ('manufacturer_id', 'vehicle_type_id', 'model_year', 'fuel_type', 'color_id')}
+    current_filters['q'] = q_raw
+    sorts = [s for s in VEHICLE_SORTS if s != 'relevance' or q_raw]
+
+    return render_template('cars/index.html', products=page['rows'], sorts=sorts, current_sort=page['sort'], next_url=next_url, prev_url=prev_url, manufacturers=facets['manufacturers'], vehicle_types=facets["vehicle_types"], colors=facets['colors'], model_year=facets['model_years'], fuel_types=facets['fuel_types'], current_filters=current_filters)
+
+
+# vehicle fields only Owners may read through the API (the pages show them to Owners only too)
+OWNER_FIELDS = ('purchase_price', 'parts_cost')
+
+
+def _allowed_fields() -> tuple:
+    """The VEHICLE_FIELDS this user may request."""
+    if session.get('role') == 'Owner':
+        return VEHICLE_FIELDS
+    return tuple(f for f in VEHICLE_FIELDS if f not in OWNER_FIELDS)
+
+
+def _requested_fields(default: tuple):
+    """(fields, error) for ?fields=a,b: names from _allowed_fields(), else `default` without
+    the fields this user may not see (None for Owners: the default columns)."""
+    allowed = _allowed_fields()
+    raw = request.args.get('fields')
+    if not raw:
+        return (None if allowed == VEHICLE_FIELDS else tuple(f for f in default if f in allowed)), None
+    fields = tuple(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in allowed]
+    if unknown or not fields:
+        return None, f"unknown fields: {', '.join(unknown)}" if unknown else "no fields given"
+    return fields, None
+
+
+@app.route('/api/vehicles')
+@conditional('vehicle_summary', 'vehicles', 'vehiclecolors', 'colors', 'manufacturers', 'vehicletypes')
+def api_vehicles():
+    # The /cars listing as JSON: same filters, sort and cursors, plus ?fields= projection.
+    # ?format=ndjson (or Accept: application/x-ndjson) streams every match instead of a page.
+    fields, error = _requested_fields(LISTING_FIELDS)
+    if error:
+        return jsonify({'error': error, 'fields': list(_allowed_fields())}), 400
+    filters = _vehicle_filters() or None
+    sort = request.args.get('sort') or ('relevance' if filters and 'q' in filters else 'year')
+    get_all, include_unready = _listing_scope(request.args.get('get_all') not in (None, '0'))
+
+    if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+        sql, params, _ = vehicles_query(filters, get_all, include_unready, sort=sort, fields=fields)
+        chunks = stream_sql(sql, params, label='api_vehicles')
+        columns = next(chunks)
+        return Response(export.encode(columns, chunks, 'ndjson'), mimetype=export.CONTENT_TYPES['ndjson'])
+
+    page = get_vehicles_page(filters, get_all, include_unready, sort=sort,
+                             cursor=request.args.get('cursor') or None, page_size=_page_size(), fields=fields)
+    link_args = {k: v for k, v in request.args.items() if k != 'cursor'}
+    return jsonify({
+        'vehicles': [export.jsonable(r, fields) for r in page['rows']],
+        'sort': page['sort'],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor'],
+        'next_url': url_for('api_vehicles', **link_args, cursor=page['next_cursor']) if page['next_cursor'] else None,
+    })
+
+
+@app.route('/api/vehicles/<int:vehicle_id>')
+@conditional('vehicle_summary', 'vehicles', 'vehiclecolors')
+def api_vehicle(vehicle_id):
+    fields, error = _requested_fields(LISTING_FIELDS + ('is_sold',))
+    if error:
+        return jsonify({'error': error, 'fields': list(_allowed_fields())}), 400
+    car = get_vehicle_details(vehicle_id, fields)
+    if not car:
+        return jsonify({'error': 'vehicle not found'}), 404
+    return jsonify(export.jsonable(car))
+
 
-    return render_template('cars/index.html', products=cars, manufacturers=filters['manufacturers'], vehicle_types=filters["vehicle_types"], colors=filters['colors'], model_year=filters['model_years'], fuel_types=filters['fuel_types'], current_filters=current_filters)
+@app.route('/api/search')
+def api_search():
+    # Ranked matches from the search index, for search-as-you-type
+    q = request.args.get('q') or ''
+    try:
+        limit = max(1, min(int(request.args.get('limit') or 10), 50))
+    except ValueError:
+        limit = 10
+    rows = search_vehicles(q, *_listing_scope(), limit=limit)
+    results = [{
+        'vehicleID': r['vehicleID'],
+        'vin': r['vin'],
+        'model_year': r['model_year'],
+        'manufacturer_name': r['manufacturer_name'],
+        'model_name': r['model_name'],
+        'vehicle_type_name': r['vehicle_type_name'],
+        'colors': r['colors'],
+        'sales_price': float(r['sales_price']) if r['sales_price'] is not None else None,
+        'score': r['search_score'],
+        'url': url_for('car_detail', car_id=r['vehicleID']),
+    } for r in rows]
+    return jsonify({'query': q, 'results': results})
 
 
 @app.route('/parts')
+@conditional('parts')
 def parts():
     parts = get_parts()
     return render_template('parts/index.html', products=parts)
 
 
+def _report_range():
+    """(start, end, error) from the ?start=&end= ISO dates; an invalid range is dropped."""
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return None, None, "Dates must be given as YYYY-MM-DD; showing all history."
+    if start and end and start > end:
+        return None, None, "The start date is after the end date; showing all history."
+    return start, end, None
+
+
 @app.route('/reports/sales-productivity')
+@conditional('sales_rollup', 'salestransactions', 'purchasetransactions', 'users')
 def sales_productivity_report():
-    rows = get_sales_productivity()
-    return render_template('reports/sales_productivity.html', rows=rows)
+    start, end, error = _report_range()
+    rows = get_sales_productivity(start, end)
+    return render_template('reports/sales_productivity.html', rows=rows, start=start, end=end, range_error=error)
 
 
 @app.route('/reports/seller-history')
+@conditional('seller_rollup', 'purchasetransactions', 'customers')
 def seller_history_report():
-    rows = get_seller_history()
-    return render_template('reports/seller_history.html', rows=rows)
+    start, end, error = _report_range()
+    rows = get_seller_history(start, end)
+    return render_template('reports/seller_history.html', rows=rows, start=start, end=end, range_error=error)
 
 
 @app.route('/reports/part-statistics')
+@conditional('vendor_rollup', 'vendors')
 def part_statistics_report():
     rows = get_part_statistics()
     return render_template('reports/part_statistics.html', rows=rows)
 
 
+@app.route('/reports/export/<any(sales, purchases, parts):dataset>.<any(csv, ndjson):fmt>')
+def export_report(dataset, fmt):
+    # Row-level detail streamed straight from the database cursor, chunk by chunk
+    if session.get('role') != 'Owner':
+        return "Unauthorized", 403
+    start, end, error = _report_range()
+    if error:
+        return error, 400
+    sql, params = export_query(dataset, start, end)
+    chunks = stream_sql(sql, params, label=f'export_{dataset}')
+    columns = next(chunks)
+    filename = '_'.join([dataset] + [d.isoformat() for d in (start, end) if d]) + '.' + fmt
+    return Response(export.encode(columns, chunks, fmt), mimetype=export.CONTENT_TYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
 @app.route('/car/<int:car_id>')
+@conditional('vehicle_summary', 'vehicles', 'vehiclecolors', 'parts', 'partorders', 'vendors',
+             'purchasetransactions', 'salestransactions', 'customers', 'users')
 def car_detail(car_id):
-    # Use enriched vehicle details (colors aggregated, parts cost, sales price)
-    car = get_vehicle_details(car_id)
+    # Enriched vehicle details (colors aggregated, parts cost, sales price), parts
+    # (the template decides visibility) and, for Owners, who we bought it from and
+    # sold it to - independent queries, fetched concurrently
+    is_owner = session.get('role') == 'Owner'
+    car, parts, seller, buyer = parallel.gather(
+        (get_vehicle_details, car_id),
+        (get_vehicle_parts, car_id),
+        (get_vehicle_seller, car_id) if is_owner else None,
+        (get_vehicle_buyer, car_id) if is_owner else None,
+    )
     if not car:
         return "Car not found", 404
-    
-    # Fetch additional data based on role
-    # Always fetch parts, let template decide visibility
-    parts = get_vehicle_parts(car_id)
-    
-    transactions = None
-    role = session.get('role')
-        
-    if role == 'Owner':
-        transactions = get_vehicle_transactions(car_id)
+
+    transactions = {'seller': seller, 'buyer': buyer} if is_owner else None
 
     # Render car-specific detail template (now under cars/ folder)
     return render_template('cars/detail.html', car=car, parts=parts, transactions=transactions, back_url=url_for('cars'))
 
 
+def _new_customer():
+    """gather() call loading the customer just created via ?new_customer_id=, if any."""
+    try:
+        return (get_customer, int(request.args['new_customer_id']))
+    except (KeyError, ValueError):
+        return None
+
+
+@app.route('/api/customers')
+def api_customers():
+    # Typeahead for the sell forms: prefix matches on name, email, ID number or phone
+    if session.get('role') not in ['Sales', 'Buyer', 'Owner']:
+        return "Unauthorized", 403
+    q = request.args.get('q') or ''
+    try:
+        limit = max(1, min(int(request.args.get('limit') or 10), 50))
+    except ValueError:
+        limit = 10
+    return jsonify({'query': q, 'results': search_customers(q, limit)})
+
+
 @app.route('/car/<int:car_id>/sell', methods=['GET', 'POST'])
 def sell_vehicle(car_id):
     if session.get('role') not in ['Sales', 'Owner']:
@@ -163,21 +342,15 @@ def sell_vehicle(car_id):
         
         if customer_id and sales_date and user_id:
             try:
-                from db import get_connection
-                conn = get_connection()
-                cur = conn.cursor()
-                cur.execute('INSERT INTO salestransactions (vehicleID, userID, customerID, sales_date) VALUES (%s, %s, %s, %s)', (car_id, user_id, customer_id, sales_date))
-                conn.commit()
-                cur.close()
-                conn.close()
+                insert_sales_transaction(car_id, user_id, customer_id, sales_date)
                 return render_template('sell/sell_success.html', message='Vehicle sold successfully!')
             except Exception as e:
+                db.rollback()
                 return f"Error selling vehicle: {e}", 500
                 
-    car = get_vehicle_details(car_id)
-    customers = get_customers()
-    new_customer_id = request.args.get('new_customer_id')
-    return render_template('cars/sell_to_customer.html', car=car, customers=customers, today=date.today(), new_customer_id=new_customer_id)
+    # the customer is picked through /api/customers, so only a just-created one is loaded
+    car, customer = parallel.gather((get_vehicle_details, car_id), _new_customer())
+    return render_template('cars/sell_to_customer.html', car=car, customer=customer, today=date.today())
 
 
 @app.route('/part/<int:part_id>/install', methods=['POST'])
@@ -185,11 +358,37 @@ def install_part(part_id):
     if session.get('role') not in ['Buyer', 'Owner']:
         return "Unauthorized", 403
     
-    update_part_status(part_id, 'Installed')
+    set_parts_status([part_id], 'Installed')
     # Redirect back to the referring page (the car detail page)
     return redirect(request.referrer or url_for('cars'))
 
 
+@app.route('/parts/status', methods=['POST'])
+def parts_status():
+    """Move several parts to Received or Installed at once.
+
+    JSON {'part_ids': [...], 'status': ...} gets the set_parts_status result back
+    for the detail page to update in place; the plain form redirects back.
+    """
+    if session.get('role') not in ['Buyer', 'Owner']:
+        return "Unauthorized", 403
+    data = request.get_json(silent=True) if request.is_json else None
+    if data is None:
+        data = {'part_ids': request.form.getlist('part_ids'), 'status': request.form.get('status')}
+    status = data.get('status') if isinstance(data, dict) else None
+    try:
+        part_ids = [int(p) for p in data.get('part_ids') or []]
+    except (AttributeError, TypeError, ValueError):
+        part_ids = []
+    if status not in PART_STATUS_MOVES or not part_ids:
+        error = f"status must be one of {', '.join(PART_STATUS_MOVES)} and part_ids a list of part IDs"
+        return (jsonify({'error': error}), 400) if request.is_json else (error, 400)
+    result = set_parts_status(part_ids, status)
+    if request.is_json:
+        return jsonify(result)
+    return redirect(request.referrer or url_for('parts'))
+
+
 @app.route('/part/<int:part_id>')
 def part_detail(part_id):
     part = get_part_by_id(part_id)
@@ -332,42 +531,96 @@ def sell_car():
             int(vehicle_type_id) if vehicle_type_id else None,
             description,
         )
-        # Optionally, insert a purchasetransactions record if price provided
+        # Optionally, insert a purchasetransactions record if price provided.
+        # Both inserts share the request transaction, so a failed purchase
+        # record also discards the vehicle instead of leaving it half-written.
         if price and customer_id and user_id:
             try:
-                from db import get_connection
-                conn = get_connection()
-                cur = conn.cursor()
-                cur.execute('INSERT INTO purchasetransactions (vehicleID, userID, customerID, purchase_price, purchase_date, vehicle_condition) VALUES (%s, %s, %s, %s, CURRENT_DATE(), %s)', (vid, user_id, customer_id, float(price), condition))
-                conn.commit()
-                cur.close()
-                conn.close()
+                insert_purchase_transaction(vid, user_id, customer_id, float(price), condition)
             except Exception as e:
                 print(f"Error inserting purchase transaction: {e}")
-                pass
+                db.rollback()
+                return f"Error recording purchase: {e}", 500
         return render_template('sell/sell_success.html', message='Car listed for sale!')
     
     # GET: provide dropdown values for manufacturers and vehicle types
-    manufacturers = get_manufacturers()
-    vehicle_types = get_vehicle_types()
-    customers = get_customers()
-    filters = filter_data()
-    fuel_types = filters['fuel_types']
-    new_customer_id = request.args.get('new_customer_id')
-    return render_template('sell/sell_car.html', manufacturers=manufacturers, vehicle_types=vehicle_types, customers=customers, fuel_types=fuel_types, new_customer_id=new_customer_id)
+    customer, manufacturers, vehicle_types, fuel_types = parallel.gather(
+        _new_customer(), (get_manufacturers,), (get_vehicle_types,), (get_fuel_types,),
+    )
+    return render_template('sell/sell_car.html', manufacturers=manufacturers, vehicle_types=vehicle_types, customer=customer, fuel_types=fuel_types)
+
+
+@app.route('/cars/intake', methods=['GET', 'POST'])
+def vehicle_intake():
+    """Buy a lot of vehicles from a CSV (see intake.py).
+
+    The form's file upload gets the report as a page; a raw text/csv body gets
+    it as JSON (200 when every row went in, 400 otherwise). ?strict=1 inserts
+    nothing unless every row is good.
+    """
+    if session.get('role') not in ['Buyer', 'Owner'] or not session.get('user_id'):
+        return "Unauthorized", 403
+    if request.method == 'GET':
+        return render_template('cars/intake.html', result=None, columns=intake.REQUIRED_COLUMNS)
+    upload = request.files.get('file')
+    body = upload.read() if upload is not None else request.get_data()
+    strict = (request.form.get('strict') or request.args.get('strict')) == '1'
+    try:
+        text = body.decode('utf-8')
+    except UnicodeDecodeError:
+        result = {'inserted': 0, 'skipped': 0, 'errors': ["the file is not UTF-8 text"], 'rows': []}
+    else:
+        result = intake.ingest(text, session['user_id'], strict)
+    status = 200 if not result['errors'] and not result['skipped'] else 400
+    if upload is not None:
+        return render_template('cars/intake.html', result=result, columns=intake.REQUIRED_COLUMNS), status
+    return jsonify(result), status
 
 
 @app.route('/parts/sell', methods=['GET', 'POST'])
 def sell_part():
-    from flask import request
+    # one part, entered by hand; a whole delivery goes through /parts/orders
+    if session.get('role') not in ['Buyer', 'Owner']:
+        return "Unauthorized", 403
+    errors = []
     if request.method == 'POST':
-        part_number = request.form.get('part_number')
-        description = request.form.get('description') or None
-        cost = request.form.get('cost') or None
-        quantity = request.form.get('quantity') or None
-        pid = insert_part(part_number, description, float(cost) if cost else None, int(quantity) if quantity else None)
-    return render_template('sell/sell_success.html', message='Part listed for sale!')
-    return render_template('sell/sell_part.html')
+        form = request.form.to_dict()
+        orders, errors = part_orders.parse_json({**form, 'parts': [form]})
+        if not errors:
+            created, errors = insert_part_orders(orders)
+        if not errors:
+            return render_template('sell/sell_success.html', message='Part ordered!')
+    return render_template('sell/sell_part.html', vendors=get_vendors(), errors=errors, form=request.form)
+
+
+@app.route('/parts/orders', methods=['POST'])
+def upload_part_orders():
+    """Bulk part orders as CSV or JSON (see part_orders.py), all or nothing.
+
+    A file posted from the form gets a page back; a raw body gets JSON
+    ({'orders': [...]} with 201, or {'errors': [...]} with 400).
+    """
+    if session.get('role') not in ['Buyer', 'Owner']:
+        return "Unauthorized", 403
+    upload = request.files.get('file')
+    if upload is not None:
+        fmt = 'json' if upload.filename.lower().endswith('.json') or upload.mimetype == 'application/json' else 'csv'
+        body = upload.read()
+    else:
+        fmt = 'json' if request.is_json else 'csv'
+        body = request.get_data()
+    orders, errors = part_orders.parse(body, fmt)
+    created = []
+    if not errors:
+        created, errors = insert_part_orders(orders)
+    if upload is not None:
+        if errors:
+            return render_template('sell/sell_part.html', vendors=get_vendors(), upload_errors=errors, form={}), 400
+        parts = sum(o['parts'] for o in created)
+        return render_template('sell/sell_success.html', message=f"Ordered {parts} parts in {len(created)} orders.")
+    if errors:
+        return jsonify({'errors': errors}), 400
+    return jsonify({'orders': created}), 201
 
 
 @app.route('/logout')
@@ -377,4 +630,5 @@ def logout():
 
 
 if __name__ == '__main__':
+    # development server; in production run serve.py
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""Micro-benchmarks for the read functions in queries.py.
+
+    python bench.py --vehicles 10000                      # generate + import (cached), run
+    python bench.py --vehicles 100000 --out results/100k.json
+    python bench.py --compare results/before.json results/after.json
+    python bench.py --mysql                                # against the database in .env
+
+Datasets come from datagen.py and are imported into SQLite under bench_data/
+(reused on later runs with the same size and seed). Each case is called once to
+warm up, then `--repeat` times; the report has p50/p95/mean latency, the rows
+returned and rows per second at p50. Results are written as JSON together with
+the git commit so runs can be compared between commits.
+"""
+import argparse
+from datetime import datetime
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import cache
+import datagen
+import db
+import load_sql
+import queries
+
+DATA_DIR = Path(__file__).parent / 'bench_data'
+
+# values common in the sample (and so in every generated dataset)
+FILTERS = {
+    'none': None,
+    'manufacturer': {'manufacturer_id': 21},
+    'vehicle_type': {'vehicle_type_id': 2},
+    'model_year': {'model_year': 2008},
+    'fuel_type': {'fuel_type': 'Gas'},
+    'color_id': {'color_id': 20},
+    'color_name': {'color_name': 'Gray'},
+    'combined': {'vehicle_type_id': 2, 'fuel_type': 'Gas', 'color_id': 20},
+}
+
+
+def cases(vehicles: int) -> list[tuple[str, object]]:
+    """(name, call) pairs; call(rng) runs the query once."""
+    # filters run over every unsold vehicle (the buyer's view); [public] is the anonymous listing
+    out = [('get_vehicles[public]', lambda rng: queries.get_vehicles())]
+    for name, filters in FILTERS.items():
+        out.append((f'get_vehicles[{name}]', lambda rng, f=filters: queries.get_vehicles(f, include_unready=True)))
+    out.append(('get_vehicles[get_all]', lambda rng: queries.get_vehicles(None, True)))
+    for sort in queries.VEHICLE_SORTS:
+        out.append((f'get_vehicles_page[{sort}]', lambda rng, s=sort: queries.get_vehicles_page(None, True, sort=s)))
+    out += [
+        ('get_vehicle_details', lambda rng: queries.get_vehicle_details(rng.randint(1, vehicles))),
+        ('get_sales_productivity', lambda rng: queries.get_sales_productivity()),
+        ('get_seller_history', lambda rng: queries.get_seller_history()),
+        ('get_part_statistics', lambda rng: queries.get_part_statistics()),
+        ('get_customers', lambda rng: queries.get_customers()),
+        ('search_vehicles', lambda rng: queries.search_vehicles('toyota cam', get_all=True)),
+    ]
+    return out
+
+
+def _row_count(result) -> int:
+    if isinstance(result, dict) and 'rows' in result:
+        return len(result['rows'])
+    if isinstance(result, list):
+        return len(result)
+    return 0 if result is None else 1
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1))]
+
+
+def time_case(call, repeat: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    call(rng)  # warm-up: connection, statement translation, page cache
+    timings, rows = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call(rng)
+        timings.append(time.perf_counter() - started)
+        rows.append(_row_count(result))
+    timings.sort()
+    p50 = _percentile(timings, 0.50)
+    median_rows = sorted(rows)[len(rows) // 2]
+    return {
+        'p50_ms': round(p50 * 1000, 3),
+        'p95_ms': round(_percentile(timings, 0.95) * 1000, 3),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'rows': median_rows,
+        'rows_per_sec': round(median_rows / p50, 1) if p50 else None,
+    }
+
+
+def prepare_sqlite(vehicles: int, seed: int) -> Path:
+    """Path of an imported SQLite dataset with `vehicles` vehicles, building it if needed."""
+    DATA_DIR.mkdir(exist_ok=True)
+    db_path = DATA_DIR / f"bench_{vehicles}_s{seed}.db"
+    if db_path.exists():
+        return db_path
+    dump = DATA_DIR / f"bench_{vehicles}_s{seed}.sql"
+    print(f"generating {vehicles:,} vehicles (seed {seed})...")
+    datagen.write_dump(dump, vehicles, seed)
+    partial = db_path.with_suffix('.partial')
+    for stale in DATA_DIR.glob(partial.name + '*'):
+        stale.unlink()
+    load_sql.run_import(str(partial), str(dump))
+    partial.rename(db_path)
+    dump.unlink()
+    return db_path
+
+
+def use_sqlite(path: Path):
+    os.environ['DB_BACKEND'] = 'sqlite'
+    os.environ['SQLITE_PATH'] = str(path)
+    if db._pool is not None:
+        db._pool.close_all()
+    db._pool = None
+    cache.lookup_cache.clear()
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=Path(__file__).parent, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(vehicles: int, repeat: int = 20, seed: int = 1, only: str | None = None) -> dict:
+    """Benchmark every case against the current backend; returns the JSON report."""
+    results = {}
+    for name, call in cases(vehicles):
+        if only and only not in name:
+            continue
+        results[name] = time_case(call, repeat, seed)
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'backend': db.dialect(),
+            'vehicles': vehicles,
+            'seed': seed,
+            'repeat': repeat,
+            'python': platform.python_version(),
+        },
+        'results': results,
+    }
+
+
+def print_report(report: dict):
+    meta = report['meta']
+    print(f"{meta['backend']}, {meta['vehicles']:,} vehicles, commit {meta['commit']}, {meta['repeat']} runs each")
+    print(f"{'case':<34} {'p50 ms':>9} {'p95 ms':>9} {'rows':>8} {'rows/s':>12}")
+    for name, r in report['results'].items():
+        rate = f"{r['rows_per_sec']:,.0f}" if r['rows_per_sec'] is not None else '-'
+        print(f"{name:<34} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['rows']:>8,} {rate:>12}")
+
+
+def compare(old: dict, new: dict):
+    print(f"p50 ms: {old['meta']['commit']} -> {new['meta']['commit']}")
+    for name, r in new['results'].items():
+        before = old['results'].get(name)
+        if before is None:
+            print(f"{name:<34} {'-':>9} {r['p50_ms']:>9.2f}")
+            continue
+        change = (r['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+        print(f"{name:<34} {before['p50_ms']:>9.2f} {r['p50_ms']:>9.2f} {change:>+8.1f}%")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vehicles', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--only', help='run only cases whose name contains this')
+    parser.add_argument('--out', help='write the JSON report here')
+    parser.add_argument('--mysql', action='store_true', help='benchmark the MySQL database from .env as-is')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two JSON reports and exit')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        old, new = (json.loads(Path(p).read_text()) for p in args.compare)
+        compare(old, new)
+        return 0
+
+    if not args.mysql:
+        use_sqlite(prepare_sqlite(args.vehicles, args.seed))
+    report = run(args.vehicles, args.repeat, args.seed, args.only)
+    print_report(report)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(report, indent=2))
+        print(f"✅ results written to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""In-process cache for near-static lookup data (manufacturers, types, colors, filter facets).
+
+Entries expire after a TTL, the cache holds at most `max_entries` values (least
+recently used are evicted first) and every entry carries tags so writes can drop
+exactly the data they affect:
+
+    @cached('lookups')
+    def get_colors(): ...
+
+    invalidate('lookups')
+
+Cached values are shared between requests - callers must treat them as read-only.
+
+`memoize` is the per-request counterpart: it collapses repeated calls with the same
+arguments within one request into a single execution.
+"""
+from collections import OrderedDict
+from functools import wraps
+import os
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+
+import db
+
+
+class TTLCache:
+    def __init__(self, ttl: float = 300.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()  # key -> (expires_at, tags, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return (True, value) on a fresh hit, (False, None) otherwise."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, entry[2]
+
+    def set(self, key, value, tags=(), ttl: float | None = None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, frozenset(tags), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        tags = set(tags)
+        with self._lock:
+            for key in [k for k, (_, t, _) in self._data.items() if t & tags]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+lookup_cache = TTLCache(
+    ttl=float(os.getenv("CACHE_TTL", "300")),
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "256")),
+)
+
+# rendered template fragments ({% cache %} in templating.py), keyed by table versions
+fragment_cache = TTLCache(
+    ttl=float(os.getenv("FRAGMENT_CACHE_TTL", "600")),
+    max_entries=int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "4096")),
+)
+
+
+def cached(*tags, ttl: float | None = None):
+    """Cache a function's result in `lookup_cache`, keyed on its name and arguments."""
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            hit, value = lookup_cache.get(key)
+            if hit:
+                return value
+            value = fn(*args, **kwargs)
+            lookup_cache.set(key, value, tags, ttl)
+            return value
+
+        wrapper.uncached = fn
+        return wrapper
+
+    return decorator
+
+
+def invalidate(*tags):
+    """Drop cached entries with any of `tags`.
+
+    Inside a request the entries are dropped now (so the request sees its own
+    writes) and again once the request's transaction commits, so a concurrent
+    request cannot re-cache pre-commit data in between.
+    """
+    lookup_cache.invalidate(*tags)
+    sess = db.current_session()
+    if sess is not None:
+        sess.after_commit(lambda: lookup_cache.invalidate(*tags))
+
+
+def _freeze(value):
+    """Turn call arguments into a hashable key (filters are passed as dicts)."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class _MemoEntry:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 1
+        self.used = False
+
+
+class _TrackedList(list):
+    """List result that records whether the caller ever looked at it (debug mode only)."""
+
+    def __init__(self, rows, entry):
+        super().__init__(rows)
+        self._entry = entry
+
+    def __iter__(self):
+        self._entry.used = True
+        return super().__iter__()
+
+    def __getitem__(self, index):
+        self._entry.used = True
+        return super().__getitem__(index)
+
+    def __len__(self):
+        self._entry.used = True
+        return super().__len__()
+
+
+class _TrackedDict(dict):
+    def __init__(self, row, entry):
+        super().__init__(row)
+        self._entry = entry
+
+    def __getitem__(self, key):
+        self._entry.used = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self._entry.used = True
+        return super().get(key, default)
+
+    def __iter__(self):
+        self._entry.used = True
+        return super().__iter__()
+
+    def __len__(self):
+        self._entry.used = True
+        return super().__len__()
+
+
+def _memo_debug() -> bool:
+    return os.getenv("QUERY_MEMO_DEBUG") == "1" or current_app.debug
+
+
+def memoize(fn):
+    """Memoize a query function for the rest of the current request.
+
+    Keyed on the function and its arguments. Outside a request it is a no-op.
+    Any write through queries.execute_write clears the request's memo, so reads
+    after a write always see it.
+    """
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not has_request_context():
+            return fn(*args, **kwargs)
+        memo = g.setdefault('query_memo', {})
+        key = (fn.__name__, _freeze(args), _freeze(kwargs))
+        entry = memo.get(key)
+        if entry is not None:
+            entry.calls += 1
+            return entry.value
+        value = fn(*args, **kwargs)
+        entry = _MemoEntry(value)
+        if _memo_debug():
+            if isinstance(value, list):
+                value = _TrackedList(value, entry)
+            elif isinstance(value, dict):
+                value = _TrackedDict(value, entry)
+            else:
+                entry.used = True
+            entry.value = value
+        memo[key] = entry
+        return value
+
+    return wrapper
+
+
+def forget_request_memo():
+    if has_request_context():
+        g.pop('table_versions', None)  # see versioning.versions_for
+    if has_request_context() and 'query_memo' in g:
+        # keep the retired entries around for the debug report
+        g.setdefault('query_memo_spent', []).extend(g.pop('query_memo').items())
+
+
+def memo_report() -> dict:
+    """Duplicate and unused memoized calls made so far in this request."""
+    entries = g.get('query_memo_spent', []) + list(g.get('query_memo', {}).items())
+    duplicates: dict = {}
+    for key, e in entries:
+        if e.calls > 1:
+            duplicates[key[0]] = duplicates.get(key[0], 0) + e.calls
+    return {
+        'duplicates': duplicates,
+        'unused': sorted(key[0] for key, e in entries if not e.used),
+    }
+
+
+def init_app(app):
+    """In debug mode, log wasted query calls at the end of every request."""
+
+    @app.teardown_request
+    def _report_query_waste(exc):
+        if not ('query_memo' in g or 'query_memo_spent' in g) or not _memo_debug():
+            return
+        report = memo_report()
+        if report['duplicates'] or report['unused']:
+            app.logger.warning(
+                "query waste on %s %s: duplicate=%s unused=%s",
+                request.method, request.path, report['duplicates'], report['unused'],
+            )
@@ -0,0 +1,23 @@
+from pathlib import Path
+
+import pytest
+
+import cache
+import db
+import load_sql
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """A fresh SQLite import of GenevaAuto.sql, used as the app's database."""
+    load_sql.run_import(str(tmp_path / 'data.db'), str(Path(__file__).parent / 'GenevaAuto.sql'))
+    monkeypatch.setenv('DB_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'data.db'))
+    monkeypatch.setattr(db, '_pool', None)
+    cache.lookup_cache.clear()
+    cache.fragment_cache.clear()
+    yield tmp_path / 'data.db'
+    db.get_pool().close_all()
+    monkeypatch.setattr(db, '_pool', None)
+    cache.lookup_cache.clear()
+    cache.fragment_cache.clear()
@@ -0,0 +1,233 @@
+"""Seeded synthetic data shaped like GenevaAuto.sql, at any number of vehicles.
+
+    python datagen.py --vehicles 100000 --out bench_100k.sql   # MySQL dump
+    mysql csc206cars < bench_100k.sql                          # load into MySQL
+    python load_sql.py bench_100k.sql bench_100k.db            # ... or into SQLite
+
+The schema and the lookup tables (colors, manufacturers, vehicle types, vendors,
+users) are copied from the sample dump. Every generated vehicle is modelled on a
+randomly drawn sample vehicle: its model, year, fuel type, purchase price, number
+of colors, part orders and their parts, and whether/how long after purchase it
+was sold, each with some jitter. That keeps the sample's distributions and their
+correlations (e.g. sold vehicles have their parts installed) at any scale.
+Customers are generated in the sample's customers-per-vehicle ratio.
+
+The same seed always produces the same dump.
+"""
+import argparse
+from datetime import date, timedelta
+import random
+import sys
+from pathlib import Path
+
+from load_sql import Insert, read_dump
+
+SAMPLE = Path(__file__).parent / 'GenevaAuto.sql'
+LOOKUP_TABLES = ['colors', 'manufacturers', 'vehicletypes', 'vendors', 'users']
+BLOCK = 1000  # vehicles per INSERT statement (children follow their block)
+VIN_CHARS = 'ABCDEFGHJKLMNPRSTUVWXYZ0123456789'
+EMAIL_DOMAINS = ['example.com', 'mail.test', 'dealer.test', 'inbox.test']
+
+
+def load_sample(path=SAMPLE) -> tuple[list[str], dict[str, tuple[list[str], list[tuple]]]]:
+    """(DDL statements, {table: (columns, rows)}) from a MySQL dump."""
+    ddl, tables = [], {}
+    with open(path, encoding='utf-8') as f:
+        for statement in read_dump(f):
+            if isinstance(statement, Insert):
+                columns, rows = tables.setdefault(statement.table, (statement.columns, []))
+                rows.extend(statement.rows)
+            elif statement.upper().startswith(('SET', 'DROP', 'CREATE')):
+                ddl.append(statement)
+    return ddl, tables
+
+
+def _dicts(tables: dict, table: str) -> list[dict]:
+    columns, rows = tables[table]
+    return [dict(zip(columns, row)) for row in rows]
+
+
+class Profile:
+    """Per-vehicle templates and pools drawn from the sample data."""
+
+    def __init__(self, tables: dict):
+        vehicles = _dicts(tables, 'vehicles')
+        purchases = {p['vehicleID']: p for p in _dicts(tables, 'purchasetransactions')}
+        sales = {s['vehicleID']: s for s in _dicts(tables, 'salestransactions')}
+        color_counts: dict = {}
+        for vc in _dicts(tables, 'vehiclecolors'):
+            color_counts[vc['vehicleID']] = color_counts.get(vc['vehicleID'], 0) + 1
+        parts_by_order: dict = {}
+        for part in _dicts(tables, 'parts'):
+            parts_by_order.setdefault(part['part_orderID'], []).append(part)
+        orders_by_vehicle: dict = {}
+        for order in _dicts(tables, 'partorders'):
+            orders_by_vehicle.setdefault(order['vehicleID'], []).append(
+                (order['vendorID'], parts_by_order.get(order['part_orderID'], [])))
+
+        self.templates = []
+        for v in vehicles:
+            purchase = purchases.get(v['vehicleID'])
+            if purchase is None:
+                continue
+            sale = sales.get(v['vehicleID'])
+            sold_after = None
+            if sale:
+                sold_after = (date.fromisoformat(sale['sales_date']) - date.fromisoformat(purchase['purchase_date'])).days
+            self.templates.append({
+                'vehicle': v,
+                'purchase': purchase,
+                'sale_user': sale['userID'] if sale else None,
+                'sold_after': sold_after,
+                'colors': color_counts.get(v['vehicleID'], 1),
+                'orders': orders_by_vehicle.get(v['vehicleID'], []),
+            })
+        # weighted by how often each color is used in the sample
+        self.color_pool = [vc['colorID'] for vc in _dicts(tables, 'vehiclecolors')]
+        customers = _dicts(tables, 'customers')
+        self.customers_per_vehicle = len(customers) / max(len(vehicles), 1)
+        self.customer_templates = customers
+        self.first_names = [c['first_name'] for c in customers]
+        self.last_names = [c['last_name'] for c in customers]
+
+
+def _literal(value) -> str:
+    if value is None:
+        return 'NULL'
+    if isinstance(value, str):
+        return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+    return repr(value)
+
+
+def _insert(table: str, columns: list[str], rows: list[tuple]) -> str:
+    values = ','.join('(' + ', '.join(_literal(v) for v in row) + ')' for row in rows)
+    return f"INSERT INTO `{table}` ({','.join(f'`{c}`' for c in columns)}) VALUES {values};\n"
+
+
+class Generator:
+    VEHICLE_COLUMNS = ['vehicleID', 'vin', 'mileage', 'description', 'model_name', 'model_year',
+                       'fuel_type', 'manufacturerID', 'vehicle_typeID']
+    COLOR_COLUMNS = ['vehicle_colorID', 'vehicleID', 'colorID']
+    PURCHASE_COLUMNS = ['purchase_transactionID', 'vehicleID', 'userID', 'customerID', 'purchase_price',
+                        'purchase_date', 'vehicle_condition']
+    SALE_COLUMNS = ['sales_transactionID', 'vehicleID', 'userID', 'customerID', 'sales_date']
+    ORDER_COLUMNS = ['part_orderID', 'order_number', 'vehicleID', 'vendorID']
+    PART_COLUMNS = ['partID', 'part_orderID', 'part_number', 'cost', 'description', 'quantity', 'status']
+    CUSTOMER_COLUMNS = ['customerID', 'phone_number', 'email_address', 'street', 'city', 'state',
+                        'postal_code', 'id_number', 'first_name', 'last_name', 'business_name']
+
+    def __init__(self, profile: Profile, vehicles: int, seed: int = 1):
+        self.profile = profile
+        self.vehicles = vehicles
+        self.customers = max(1, round(vehicles * profile.customers_per_vehicle))
+        self.rng = random.Random(seed)
+        self.ids = {'color': 0, 'order': 0, 'part': 0, 'sale': 0}
+
+    def _next(self, name: str) -> int:
+        self.ids[name] += 1
+        return self.ids[name]
+
+    def customer_rows(self, start: int, stop: int) -> list[tuple]:
+        rng, p = self.rng, self.profile
+        rows = []
+        for cid in range(start, stop):
+            t = rng.choice(p.customer_templates)
+            first, last = rng.choice(p.first_names), rng.choice(p.last_names)
+            rows.append((
+                cid, ''.join(rng.choices('0123456789', k=10)),
+                f"{first[0]}{last}{cid}@{rng.choice(EMAIL_DOMAINS)}".lower().replace(' ', ''),
+                f"{rng.randint(1, 9999)} {rng.randint(1, 40)}-street", t['city'], t['state'],
+                f"{rng.randint(10000, 99999)}", f"{t['id_number'][0]}{cid:010d}", first, last,
+                t['business_name'],
+            ))
+        return rows
+
+    def vehicle_block(self, start: int, stop: int) -> dict[str, list[tuple]]:
+        rng, p = self.rng, self.profile
+        out = {'vehicles': [], 'vehiclecolors': [], 'purchasetransactions': [], 'salestransactions': [],
+               'partorders': [], 'parts': []}
+        for vid in range(start, stop):
+            t = rng.choice(p.templates)
+            v, purchase = t['vehicle'], t['purchase']
+            vin = ''.join(rng.choices(VIN_CHARS, k=9)) + f"{vid:08d}"
+            mileage = round(max(0.0, v['mileage'] * rng.uniform(0.7, 1.3)), 1)
+            out['vehicles'].append((vid, vin, mileage, v['description'], v['model_name'], v['model_year'],
+                                    v['fuel_type'], v['manufacturerID'], v['vehicle_typeID']))
+
+            colors = set()
+            while len(colors) < t['colors']:
+                colors.add(rng.choice(p.color_pool))
+            for color_id in sorted(colors):
+                out['vehiclecolors'].append((self._next('color'), vid, color_id))
+
+            bought = date.fromisoformat(purchase['purchase_date']) + timedelta(days=rng.randint(-180, 180))
+            out['purchasetransactions'].append((
+                vid, vid, purchase['userID'], rng.randint(1, self.customers),
+                round(purchase['purchase_price'] * rng.uniform(0.85, 1.15), 2), bought.isoformat(),
+                purchase['vehicle_condition'],
+            ))
+            if t['sold_after'] is not None:
+                out['salestransactions'].append((self._next('sale'), vid, t['sale_user'], rng.randint(1, self.customers),
+                                                 (bought + timedelta(days=t['sold_after'])).isoformat()))
+
+            for number, (vendor_id, parts) in enumerate(t['orders'], start=1):
+                order_id = self._next('order')
+                out['partorders'].append((order_id, number, vid, vendor_id))
+                for part in parts:
+                    out['parts'].append((self._next('part'), order_id, part['part_number'],
+                                         round(part['cost'] * rng.uniform(0.9, 1.1), 2), part['description'],
+                                         part['quantity'], part['status']))
+        return out
+
+    def statements(self):
+        """INSERT statements for the generated tables, in foreign-key order per block."""
+        for start in range(1, self.customers + 1, BLOCK):
+            yield _insert('customers', self.CUSTOMER_COLUMNS,
+                          self.customer_rows(start, min(start + BLOCK, self.customers + 1)))
+        columns = {
+            'vehicles': self.VEHICLE_COLUMNS, 'vehiclecolors': self.COLOR_COLUMNS,
+            'purchasetransactions': self.PURCHASE_COLUMNS, 'salestransactions': self.SALE_COLUMNS,
+            'partorders': self.ORDER_COLUMNS, 'parts': self.PART_COLUMNS,
+        }
+        for start in range(1, self.vehicles + 1, BLOCK):
+            block = self.vehicle_block(start, min(start + BLOCK, self.vehicles + 1))
+            for table, rows in block.items():
+                if rows:
+                    yield _insert(table, columns[table], rows)
+
+
+def write_dump(out_path, vehicles: int, seed: int = 1, sample_path=SAMPLE) -> dict:
+    """Write a MySQL dump with `vehicles` generated vehicles; returns the row counts."""
+    ddl, tables = load_sample(sample_path)
+    generator = Generator(Profile(tables), vehicles, seed)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.write(f"/*\nSynthetic data: {vehicles} vehicles, seed {seed} (datagen.py)\n*/\n\n")
+        for statement in ddl:
+            f.write(statement + ';\n')
+        for table in LOOKUP_TABLES:
+            columns, rows = tables[table]
+            f.write(_insert(table, columns, rows))
+        for statement in generator.statements():
+            f.write(statement)
+    counts = {table: len(tables[table][1]) for table in LOOKUP_TABLES}
+    counts.update(vehicles=vehicles, customers=generator.customers, vehiclecolors=generator.ids['color'],
+                  purchasetransactions=vehicles, salestransactions=generator.ids['sale'],
+                  partorders=generator.ids['order'], parts=generator.ids['part'])
+    return counts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vehicles', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='dump file (default bench_<vehicles>.sql)')
+    args = parser.parse_args(argv)
+
+    out = args.out or f"bench_{args.vehicles}.sql"
+    counts = write_dump(out, args.vehicles, args.seed)
+    print(f"✅ wrote {out}: " + ', '.join(f"{table} {n:,}" for table, n in counts.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
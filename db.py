@@ -1,14 +1,507 @@
 import mysql.connector
 from dotenv import load_dotenv
+from contextlib import contextmanager
+from flask import g, has_request_context, session
 import os
+import threading
+import time
+
+import metrics
 
 load_dotenv()
 
-def get_connection():
+
+class PoolTimeout(RuntimeError):
+    """Raised when no pooled connection becomes free within the checkout timeout."""
+
+
+def _connect(host=None, port=None):
     return mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
+        host=host or os.getenv("DB_HOST"),
         user=os.getenv("DB_USER"),
         password=os.getenv("DB_PASSWORD"),
         database=os.getenv("DB_NAME"),
-        port=os.getenv("DB_PORT")
+        port=port or os.getenv("DB_PORT")
+    )
+
+
+class PooledConnection:
+    """Connection handed out by the pool.
+
+    Behaves like the underlying connection, except close() hands it back to the
+    pool instead of tearing down the socket, so existing call sites keep working.
+    """
+
+    def __init__(self, pool, conn, born: float):
+        self._pool = pool
+        self._conn = conn
+        self._born = born
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn, self._born)
+            self._conn = None
+
+    def discard(self):
+        """Close the underlying connection instead of returning it, e.g. after
+        abandoning an unbuffered result half-read."""
+        if self._conn is not None:
+            self._pool.discard(self._conn)
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """Fixed-size pool of database connections.
+
+    - size: maximum number of open connections (idle + checked out).
+    - timeout: seconds a caller waits for a free connection before PoolTimeout.
+    - recycle: connections older than this many seconds are closed and replaced on checkout.
+
+    Every checkout pings the connection first; dead ones are replaced transparently.
+    """
+
+    def __init__(self, connect=_connect, size: int = 5, timeout: float = 10.0, recycle: float = 1800.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self._idle: list = []  # (conn, born) pairs, most recently used last
+        self._open = 0
+        self._cond = threading.Condition()
+        self.in_use = 0
+        self.waiting = 0
+        self.created = 0
+        self.recycled = 0
+        self.closed = False  # set by close_all: released connections are closed, not kept
+
+    def acquire(self) -> PooledConnection:
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, born = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    conn, born = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"no database connection available within {self.timeout}s (pool size {self.size})")
+                self.waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.in_use += 1
+
+        try:
+            if conn is not None and not self._healthy(conn, born):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+                born = time.monotonic()
+                with self._cond:
+                    self.created += 1
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self.in_use -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, conn, born)
+
+    def release(self, conn, born: float):
+        try:
+            # never hand the next caller a half-finished transaction
+            if getattr(conn, 'in_transaction', False):
+                conn.rollback()
+        except Exception:
+            self.discard(conn)
+            return
+        with self._cond:
+            if not self.closed:
+                self._idle.append((conn, born))
+                self.in_use -= 1
+                self._cond.notify()
+                return
+        self.discard(conn)
+
+    def discard(self, conn):
+        """Close a checked-out connection and free its slot."""
+        self._discard(conn)
+        with self._cond:
+            self._open -= 1
+            self.in_use -= 1
+            self._cond.notify()
+
+    def _healthy(self, conn, born: float) -> bool:
+        if self.recycle and time.monotonic() - born > self.recycle:
+            with self._cond:
+                self.recycled += 1
+            return False
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self.in_use,
+                'waiting': self.waiting,
+                'created': self.created,
+                'recycled': self.recycled,
+            }
+
+    def close_all(self):
+        """Close idle connections; checked-out ones are closed when released."""
+        with self._cond:
+            self.closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def dialect() -> str:
+    """SQL dialect of the configured backend: 'mysql' (default) or 'sqlite' (DB_BACKEND=sqlite)."""
+    return 'sqlite' if os.getenv("DB_BACKEND", "mysql").lower() == 'sqlite' else 'mysql'
+
+
+def _new_pool(target: str | None = None):
+    """Pool for the primary (target None) or for one replica: a SQLite path or MySQL host[:port]."""
+    if dialect() == 'sqlite':
+        from sqlite_backend import ThreadLocalPool
+        return ThreadLocalPool(target or os.getenv("SQLITE_PATH", "data.db"))
+    host, _, port = (target or '').partition(':')
+    return ConnectionPool(
+        connect=(lambda: _connect(host, port or None)) if target else _connect,
+        size=int(os.getenv("DB_POOL_SIZE", "5")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        recycle=float(os.getenv("DB_POOL_RECYCLE", "1800")),
     )
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _new_pool()
+    return _pool
+
+
+def close_pool():
+    """Close the pools' idle connections and drop them; the next checkout opens new ones."""
+    global _pool, _replicas
+    with _pool_lock:
+        pool, _pool = _pool, None
+        replicas, _replicas = _replicas, None
+    for p in [pool] + ([r for _, r in replicas.pools] if replicas else []):
+        if p is not None:
+            p.close_all()
+
+
+def reset_after_fork():
+    """In a forked child: forget the parent's pools without touching their sockets."""
+    global _pool, _pool_lock, _replicas
+    _pool, _pool_lock, _replicas = None, threading.Lock(), None
+
+
+# ---------------------------------------------------------------------------
+# Read replicas. With DB_REPLICAS=host[:port],... (SQLITE_REPLICAS=path,... on
+# SQLite) reads go to the replicas, round-robin, and writes to the primary. A
+# replica that fails to connect is skipped for DB_REPLICA_RETRY seconds (default
+# 30); with none left, reads fall back to the primary. Read-your-writes: a
+# request reads from the primary once it has written, and so does the browser
+# session (or, outside requests, the thread) for DB_STICKY_SECONDS (default 5)
+# after a committed write, which covers the replicas' usual lag.
+# ---------------------------------------------------------------------------
+
+class ReplicaSet:
+    """Replica pools handed out round-robin, skipping ones that recently failed."""
+
+    def __init__(self, pools: list, retry: float = 30.0):
+        self.pools = pools  # (name, pool) pairs
+        self.retry = retry
+        self._down_until = [0.0] * len(pools)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> PooledConnection | None:
+        """A connection to the next healthy replica, or None if none can give one."""
+        with self._lock:
+            start, self._next = self._next, (self._next + 1) % len(self.pools)
+        for k in range(len(self.pools)):
+            i = (start + k) % len(self.pools)
+            name, pool = self.pools[i]
+            if self._down_until[i] > time.monotonic():
+                continue
+            try:
+                return pool.acquire()
+            except PoolTimeout:
+                continue  # busy, not broken
+            except Exception:
+                with self._lock:
+                    self._down_until[i] = time.monotonic() + self.retry
+                metrics.REPLICA_DOWN.inc(name)
+        return None
+
+    def healthy(self) -> list[str]:
+        now = time.monotonic()
+        return [name for (name, _), until in zip(self.pools, self._down_until) if until <= now]
+
+
+_replicas = None
+_local = threading.local()
+
+
+def get_replicas() -> ReplicaSet | None:
+    """The configured read replicas, or None if reads go to the primary."""
+    global _replicas
+    names = os.getenv("SQLITE_REPLICAS" if dialect() == 'sqlite' else "DB_REPLICAS", "")
+    names = [n.strip() for n in names.split(',') if n.strip()]
+    if not names:
+        return None
+    if _replicas is None:
+        with _pool_lock:
+            if _replicas is None:
+                _replicas = ReplicaSet([(n, _new_pool(n)) for n in names],
+                                       retry=float(os.getenv("DB_REPLICA_RETRY", "30")))
+    return _replicas
+
+
+def _sticky_seconds() -> float:
+    return float(os.getenv("DB_STICKY_SECONDS", "5"))
+
+
+def wrote_recently():
+    """Start the read-your-writes window for this browser session (or thread, outside requests)."""
+    if get_replicas() is None:
+        return  # every read goes to the primary anyway
+    until = time.time() + _sticky_seconds()
+    if has_request_context():
+        session['db_primary_until'] = until
+    else:
+        _local.primary_until = until
+
+
+def pin_primary(pinned: bool):
+    """Send this thread's reads to the primary, e.g. for a worker reading on behalf of a pinned request."""
+    _local.pinned = pinned
+
+
+@contextmanager
+def on_primary():
+    """Read from the primary inside the block: for checks a write relies on, which a lagging replica would get wrong."""
+    pinned = getattr(_local, 'pinned', False)
+    _local.pinned = True
+    try:
+        yield
+    finally:
+        _local.pinned = pinned
+
+
+def reads_from_primary() -> bool:
+    """True if this caller's reads must see its own recent writes."""
+    if getattr(_local, 'pinned', False):
+        return True
+    if has_request_context():
+        sess = g.get('db_session')
+        if sess is not None and sess.wrote:
+            return True
+        until = session.get('db_primary_until', 0)
+    else:
+        until = getattr(_local, 'primary_until', 0)
+    return until > time.time()
+
+
+def get_read_connection():
+    """A connection for reads outside the request transaction: a replica's unless reads_from_primary()."""
+    replicas = get_replicas()
+    if replicas is not None and not reads_from_primary():
+        started = time.perf_counter()
+        conn = replicas.acquire()
+        if conn is not None:
+            metrics.observe_acquire(time.perf_counter() - started)
+            metrics.READ_CONNECTIONS.inc('replica')
+            return conn
+    if replicas is not None:
+        metrics.READ_CONNECTIONS.inc('primary')
+    return get_connection()
+
+
+def get_connection():
+    """Check a connection out of the shared pool. Call close() to return it."""
+    started = time.perf_counter()
+    conn = get_pool().acquire()
+    metrics.observe_acquire(time.perf_counter() - started)
+    return conn
+
+
+class RequestSession:
+    """Unit of work for one Flask request: a single pooled connection and a single transaction.
+
+    The connection is checked out on first use, so requests that never touch the
+    database cost nothing. It is committed once in after_request (or rolled back if
+    the request failed) and returned to the pool at teardown.
+    """
+
+    def __init__(self):
+        self.conn = None
+        self.read_conn = None  # a replica's, for requests that have not written
+        self.rollback_only = False
+        self.wrote = False
+        self.touched: set[str] = set()  # tables written in this transaction
+        self._before_commit = []
+        self._after_commit = []
+
+    def connection(self):
+        if self.conn is None:
+            self.conn = get_connection()
+        return self.conn
+
+    def read_connection(self):
+        """Where this request reads: a replica until it writes or while it must see its own writes."""
+        if self.conn is not None or get_replicas() is None or reads_from_primary():
+            return self.connection()
+        if self.read_conn is None:
+            self.read_conn = get_read_connection()
+        return self.read_conn
+
+    def before_commit(self, callback):
+        """Run `callback` just before this request's transaction commits, as part of it."""
+        self._before_commit.append(callback)
+
+    def after_commit(self, callback):
+        """Run `callback` once this request's transaction has committed (never on rollback)."""
+        self._after_commit.append(callback)
+
+    def commit(self):
+        callbacks, self._before_commit = self._before_commit, []
+        for callback in callbacks:
+            callback()
+        if self.conn is not None:
+            self.conn.commit()
+        if self.wrote:
+            wrote_recently()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        self._before_commit = []
+        self._after_commit = []
+        self.touched = set()
+        if self.conn is not None:
+            self.conn.rollback()
+
+    def close(self):
+        if self.read_conn is not None:
+            self.read_conn.close()
+            self.read_conn = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def current_session() -> RequestSession | None:
+    """Return the request's session (creating it lazily), or None outside a request."""
+    if not has_request_context():
+        return None
+    if 'db_session' not in g:
+        g.db_session = RequestSession()
+    return g.db_session
+
+
+def rollback():
+    """Mark the current request's transaction to be rolled back instead of committed.
+
+    For routes that catch a database error and render an error page themselves,
+    so that earlier writes in the same request are not committed.
+    """
+    sess = current_session()
+    if sess is not None:
+        sess.rollback_only = True
+
+
+@contextmanager
+def transaction(write: bool = False):
+    """Yield a connection for one or more statements.
+
+    Inside a request this is the request's connection; commit/rollback is left to
+    the request teardown, and `write=True` records on the session that it has
+    uncommitted changes. Outside a request (scripts, shells) a pooled connection
+    is used and committed on success or rolled back on error. Reads (`write=False`)
+    may be served by a read replica; see get_read_connection.
+    """
+    sess = current_session()
+    if sess is not None:
+        if write:
+            sess.wrote = True
+            yield sess.connection()
+        else:
+            yield sess.read_connection()
+        return
+    conn = get_connection() if write else get_read_connection()
+    try:
+        yield conn
+        conn.commit()
+        if write:
+            wrote_recently()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    """Bind the request-scoped session to the app's request lifecycle."""
+
+    @app.after_request
+    def _commit_session(response):
+        sess = g.pop('db_session', None)
+        if sess is not None:
+            try:
+                if sess.rollback_only or response.status_code >= 500:
+                    sess.rollback()
+                else:
+                    sess.commit()
+            finally:
+                sess.close()
+        return response
+
+    @app.teardown_request
+    def _close_session(exc):
+        # only reached with a live session when the request raised
+        sess = g.pop('db_session', None)
+        if sess is not None:
+            try:
+                sess.rollback()
+            finally:
+                sess.close()
@@ -0,0 +1,61 @@
+"""CSV and NDJSON encoding for the streamed report exports.
+
+Takes the generator from queries.stream_sql (column names, then chunks of row
+tuples) and yields one piece of the response body per chunk, so an export never
+holds more than a chunk in memory. The caller reads the column names first, so
+a failing query is reported before the response has started.
+"""
+import csv
+from datetime import date, datetime
+from decimal import Decimal
+import io
+import json
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+
+def jsonable(row: dict, fields=None) -> dict:
+    """`row` (only `fields`, if given) with Decimals as floats and dates as ISO strings."""
+    out = {}
+    for key in fields or row:
+        value = row[key]
+        out[key] = _json_default(value) if isinstance(value, (Decimal, date, datetime)) else value
+    return out
+
+
+def csv_body(columns: list[str], chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()  # just the header if there were no rows
+
+
+def ndjson_body(columns: list[str], chunks):
+    for rows in chunks:
+        yield ''.join(json.dumps(dict(zip(columns, row)), default=_json_default) + '\n' for row in rows)
+
+
+def encode(columns: list[str], chunks, fmt: str):
+    """Response body for `fmt` ('csv' or 'ndjson'). Closing it (as the server does
+    when the client goes away) closes `chunks` and so frees the connection."""
+    body = csv_body(columns, chunks) if fmt == 'csv' else ndjson_body(columns, chunks)
+    try:
+        yield from body
+    finally:
+        chunks.close()
@@ -0,0 +1,189 @@
+"""Bulk vehicle intake: a fleet lot or auction feed as CSV, one row per vehicle.
+
+    python intake.py lot.csv --user-id 3            # insert the good rows, report the rest
+    python intake.py lot.csv --user-id 3 --strict   # insert nothing unless every row is good
+
+Columns (header required, order free):
+
+    vin, model_name, model_year, fuel_type, manufacturer, vehicle_type, mileage,
+    colors, customer_id, price, condition, description, purchase_date
+
+description and purchase_date (YYYY-MM-DD, default today) may be left out.
+manufacturer, vehicle_type and colors are names, matched case-insensitively
+against the cached lookup tables; colors is a list like "Blue; Silver". The
+vehicle is bought from customer_id by the user running the intake.
+
+Every row is checked before anything is written; the good rows then go in with
+queries.insert_vehicles, a few executemany statements in one transaction. The
+report has one entry per row: its vehicleID, or the reasons it was skipped.
+"""
+import argparse
+import csv
+from datetime import date
+from decimal import Decimal, InvalidOperation
+import io
+import re
+import sys
+
+import queries
+
+FUEL_TYPES = ('Gas', 'Diesel', 'Natural Gas', 'Hybrid', 'Plugin Hybrid', 'Battery', 'Fuel Cell')
+CONDITIONS = ('Excellent', 'Very Good', 'Good', 'Fair')
+REQUIRED_COLUMNS = ('vin', 'model_name', 'model_year', 'fuel_type', 'manufacturer', 'vehicle_type', 'mileage',
+                    'colors', 'customer_id', 'price', 'condition')
+MAX_ROWS = 5000
+
+
+def _lookups() -> dict:
+    """Lower-cased name -> ID for manufacturers, vehicle types and colors (cached in queries)."""
+    return {
+        'manufacturer': {r['manufacturer_name'].lower(): r['manufacturerID'] for r in queries.get_manufacturers()},
+        'vehicle_type': {r['vehicle_type_name'].lower(): r['vehicle_typeID'] for r in queries.get_vehicle_types()},
+        'color': {r['color_name'].lower(): r['colorID'] for r in queries.get_colors()},
+    }
+
+
+def _choice(value: str, choices: tuple) -> str | None:
+    return next((c for c in choices if c.lower() == value.lower()), None)
+
+
+def _amount(value: str, places: str, limit: int) -> Decimal | None:
+    try:
+        amount = Decimal(value).quantize(Decimal(places))
+    except (InvalidOperation, ValueError):
+        return None
+    return amount if 0 <= amount < limit else None
+
+
+def check_row(raw: dict, lookups: dict, today: date) -> tuple[dict | None, list[str]]:
+    """(vehicle for queries.insert_vehicles, errors) for one CSV row."""
+    row = {k: (v or '').strip() for k, v in raw.items() if k}
+    errors = []
+    vin = row.get('vin', '').upper()
+    if not vin or len(vin) > 50:
+        errors.append("vin is required (at most 50 characters)")
+    model_name = row.get('model_name', '')
+    if not model_name or len(model_name) > 255:
+        errors.append("model_name is required (at most 255 characters)")
+    model_year = int(row['model_year']) if re.fullmatch(r'\d{4}', row.get('model_year', '')) else None
+    if model_year is None or not 1900 <= model_year <= today.year + 1:
+        errors.append(f"model_year must be a year from 1900 to {today.year + 1}")
+    fuel_type = _choice(row.get('fuel_type', ''), FUEL_TYPES)
+    if fuel_type is None:
+        errors.append(f"fuel_type must be one of {', '.join(FUEL_TYPES)}")
+    manufacturer_id = lookups['manufacturer'].get(row.get('manufacturer', '').lower())
+    if manufacturer_id is None:
+        errors.append(f"unknown manufacturer {row.get('manufacturer', '')!r}")
+    vehicle_type_id = lookups['vehicle_type'].get(row.get('vehicle_type', '').lower())
+    if vehicle_type_id is None:
+        errors.append(f"unknown vehicle_type {row.get('vehicle_type', '')!r}")
+    mileage = _amount(row.get('mileage', ''), '0.1', 10 ** 9)  # DECIMAL(10,1)
+    if mileage is None:
+        errors.append("mileage must be a number of at least 0")
+    names = [c.strip() for c in re.split(r'[;/|]', row.get('colors', '')) if c.strip()]
+    color_ids = sorted({lookups['color'].get(c.lower()) for c in names} - {None})
+    unknown = [c for c in names if c.lower() not in lookups['color']]
+    if unknown or not names:
+        errors.append(f"unknown colors: {', '.join(unknown)}" if unknown else "colors is required")
+    customer_id = int(row['customer_id']) if row.get('customer_id', '').isdigit() else None
+    if not customer_id:
+        errors.append("customer_id must be a customer number")
+    price = _amount(row.get('price', ''), '0.01', 10 ** 6)  # DECIMAL(8,2)
+    if price is None:
+        errors.append("price must be an amount from 0 to 999999.99")
+    condition = _choice(row.get('condition', ''), CONDITIONS)
+    if condition is None:
+        errors.append(f"condition must be one of {', '.join(CONDITIONS)}")
+    purchase_date = today
+    if row.get('purchase_date'):
+        try:
+            purchase_date = date.fromisoformat(row['purchase_date'])
+        except ValueError:
+            errors.append("purchase_date must be YYYY-MM-DD")
+        else:
+            if purchase_date > today:
+                errors.append("purchase_date is in the future")
+    description = row.get('description') or None
+    if description and len(description) > 255:
+        errors.append("description is longer than 255 characters")
+    if errors:
+        return None, errors
+    return {
+        'vin': vin, 'model_name': model_name, 'model_year': model_year, 'fuel_type': fuel_type,
+        'manufacturer_id': manufacturer_id, 'vehicle_type_id': vehicle_type_id, 'mileage': mileage,
+        'description': description, 'color_ids': color_ids, 'customer_id': customer_id, 'price': price,
+        'condition': condition, 'purchase_date': purchase_date.isoformat(),
+    }, []
+
+
+def ingest(text: str, user_id: int, strict: bool = False) -> dict:
+    """Check and insert a CSV of vehicles bought by `user_id`.
+
+    Returns {'inserted': n, 'skipped': n, 'errors': [file-level problems],
+             'rows': [{'row', 'vin', 'vehicleID', 'errors'}]}; with `strict`,
+    nothing is inserted if any row has errors.
+    """
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')))
+    fields = [f.strip().lower() for f in reader.fieldnames or []]
+    missing = [c for c in REQUIRED_COLUMNS if c not in fields]
+    if missing:
+        return {'inserted': 0, 'skipped': 0, 'errors': [f"missing columns: {', '.join(missing)}"], 'rows': []}
+    reader.fieldnames = fields
+    raw_rows = list(reader)
+    if len(raw_rows) > MAX_ROWS:
+        return {'inserted': 0, 'skipped': len(raw_rows), 'rows': [],
+                'errors': [f"{len(raw_rows)} rows in one file; the limit is {MAX_ROWS}"]}
+
+    lookups, today = _lookups(), date.today()
+    report = []
+    for line, raw in enumerate(raw_rows, start=2):
+        vehicle, errors = check_row(raw, lookups, today)
+        report.append({'row': line, 'vin': (raw.get('vin') or '').strip().upper() or None, 'vehicleID': None,
+                       'errors': errors, 'vehicle': vehicle})
+
+    # checks against the database and across rows
+    candidates = [r for r in report if r['vehicle']]
+    existing = queries.existing_vins([r['vin'] for r in candidates])
+    customers = queries.existing_customer_ids([r['vehicle']['customer_id'] for r in candidates])
+    seen = set()
+    for r in candidates:
+        if r['vin'] in existing:
+            r['errors'].append(f"vin {r['vin']} is already recorded")
+        elif r['vin'] in seen:
+            r['errors'].append(f"vin {r['vin']} appears twice in the file")
+        if r['vehicle']['customer_id'] not in customers:
+            r['errors'].append(f"no customer {r['vehicle']['customer_id']}")
+        seen.add(r['vin'])
+
+    good = [r for r in report if not r['errors']]
+    if good and not (strict and len(good) < len(report)):
+        ids = queries.insert_vehicles([r['vehicle'] for r in good], user_id)
+        for r in good:
+            r['vehicleID'] = ids[r['vin']]
+    for r in report:
+        del r['vehicle']
+    inserted = sum(1 for r in report if r['vehicleID'])
+    return {'inserted': inserted, 'skipped': len(report) - inserted, 'errors': [], 'rows': report}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('csv', help='CSV file of vehicles')
+    parser.add_argument('--user-id', type=int, required=True, help='the buyer recorded on the purchases')
+    parser.add_argument('--strict', action='store_true', help='insert nothing if any row has errors')
+    args = parser.parse_args(argv)
+
+    with open(args.csv, encoding='utf-8', newline='') as f:
+        result = ingest(f.read(), args.user_id, args.strict)
+    for error in result['errors']:
+        print(f"❌ {error}")
+    for r in result['rows']:
+        if r['errors']:
+            print(f"row {r['row']} ({r['vin'] or 'no VIN'}): {'; '.join(r['errors'])}")
+    print(f"{'✅' if not result['skipped'] and not result['errors'] else '⚠️'} "
+          f"{result['inserted']} vehicles added, {result['skipped']} skipped")
+    return 0 if not result['skipped'] and not result['errors'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
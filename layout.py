@@ -1,6 +1,6 @@
 #jinja header template
-from jinja2 import Template
-header_template = Template("""
+from templating import string_template
+header_template = string_template('layout.header', """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -31,7 +31,9 @@ header_template = Template("""
         </div>
         <div class="navbar-end">
             <div class="navbar-item">
-                <input class="input" type="text" placeholder="Search Cars" />
+                <form method="get" action="/cars">
+                    <input class="input" type="search" name="q" placeholder="Search Cars" />
+                </form>
             </div>
             <div class="navbar-item">
                 <div class="buttons">
@@ -1,7 +1,13 @@
+import argparse
+import io
 import re
 import sqlite3
+import sys
+import time
 from pathlib import Path
 
+from migrations import migrate
+
 # your database file name
 db_file = "data.db"
 
@@ -33,6 +39,7 @@ def mysql_to_sqlite(sql_text: str) -> str:
     s = re.sub(r"(?m)^(LOCK TABLES .*?;)|^(UNLOCK TABLES;)|^(BEGIN;)|^(COMMIT;)", "", s)
 
     # Remove schema qualifiers like `csc206cars`.
+    s = re.sub(r"`\w+`\.`", "`", s)
     s = s.replace('`csc206cars`.', '')
     s = s.replace('csc206cars.', '')
 
@@ -44,7 +51,9 @@ def mysql_to_sqlite(sql_text: str) -> str:
     s = re.sub(r"\)\s*AUTO_INCREMENT=\d+\s*DEFAULT CHARSET=.*?;", ");", s, flags=re.S)
 
     # Convert common types
-    s = re.sub(r"\bint\(\d+\)\b", "INTEGER", s, flags=re.I)
+    # (no trailing \b: "int(11) NOT NULL" must become exactly INTEGER so that
+    # single-column integer primary keys alias the rowid and auto-increment)
+    s = re.sub(r"\bint\(\d+\)", "INTEGER", s, flags=re.I)
     s = re.sub(r"\bdecimal\([^)]*\)", "REAL", s, flags=re.I)
     s = re.sub(r"\bvarchar\([^)]*\)", "TEXT", s, flags=re.I)
     s = re.sub(r"\bchar\([^)]*\)", "TEXT", s, flags=re.I)
@@ -75,29 +84,368 @@ def mysql_to_sqlite(sql_text: str) -> str:
     return s
 
 
-def run_import(db_path: str, sql_path: str):
+def _rewrite_calls(sql: str, name: str, rewrite) -> str:
+    """Replace every NAME(...) call in `sql` with rewrite(list_of_top_level_args)."""
+    pattern = re.compile(r"\b" + name + r"\s*\(", re.I)
+    out, pos = [], 0
+    while True:
+        m = pattern.search(sql, pos)
+        if not m:
+            out.append(sql[pos:])
+            return ''.join(out)
+        out.append(sql[pos:m.start()])
+        depth, quote, args, start, i = 1, None, [], m.end(), m.end()
+        while depth:
+            ch = sql[i]
+            if quote:
+                if ch == quote:
+                    quote = None
+            elif ch in "'\"":
+                quote = ch
+            elif ch == '(':
+                depth += 1
+            elif ch == ')':
+                depth -= 1
+            elif ch == ',' and depth == 1:
+                args.append(sql[start:i].strip())
+                start = i + 1
+            i += 1
+        args.append(sql[start:i - 1].strip())
+        out.append(rewrite([_rewrite_calls(a, name, rewrite) for a in args]))
+        pos = i
+
+
+def _group_concat(args: list[str]) -> str:
+    # MySQL: GROUP_CONCAT([DISTINCT] expr [ORDER BY ...] [SEPARATOR 'x'])
+    # SQLite: GROUP_CONCAT(expr, 'x') - no ORDER BY, and DISTINCT only with the default separator
+    if len(args) > 1:
+        # already SQLite form: GROUP_CONCAT(expr, sep)
+        return f"GROUP_CONCAT({', '.join(args)})"
+    body = args[0]
+    m = re.search(r"\s+SEPARATOR\s+('(?:[^']|'')*')\s*$", body, re.I)
+    sep = None
+    if m:
+        sep, body = m.group(1), body[:m.start()]
+    body = re.split(r"\s+ORDER\s+BY\s+", body, flags=re.I)[0]
+    if sep is None:
+        return f"GROUP_CONCAT({body})"
+    body = re.sub(r"^DISTINCT\s+", "", body, flags=re.I)
+    return f"GROUP_CONCAT({body}, {sep})"
+
+
+def query_to_sqlite(sql: str) -> str:
+    """Translate one MySQL statement as written in queries.py into SQLite.
+
+    Handles %s placeholders, CONCAT(...), CURRENT_DATE(), GROUP_CONCAT(... SEPARATOR ...)
+    and SHOW TABLES. GROUP_CONCAT's ORDER BY is dropped, so prefer building ordered
+    concatenations through query_builder with dialect='sqlite'.
+    """
+    if re.match(r"\s*SHOW\s+TABLES", sql, re.I):
+        return "SELECT name AS table_name FROM sqlite_master WHERE type = 'table' ORDER BY name;"
+    s = sql.replace('%s', '?')
+    s = re.sub(r"\bCURRENT_DATE\(\)", "DATE('now')", s, flags=re.I)
+    s = _rewrite_calls(s, 'CONCAT', lambda args: '(' + ' || '.join(args) + ')')
+    s = _rewrite_calls(s, 'GROUP_CONCAT', _group_concat)
+    return s
+
+
+# --- streaming import ---------------------------------------------------------
+#
+# The dump is read in chunks and split into statements by a small tokenizer, so
+# memory stays flat however big the file is. Multi-row INSERT ... VALUES statements
+# are never held whole: their rows are parsed one at a time and fed to executemany
+# in bounded batches. Everything else (DROP/CREATE TABLE, ...) is small and goes
+# through mysql_to_sqlite one statement at a time.
+
+CHUNK_SIZE = 1 << 20
+# a row that is still incomplete after this much lookahead is malformed (or uses an
+# expression we don't parse) - fail instead of reading the rest of the dump into memory
+MAX_ROW_CHARS = 64 << 20
+PROGRESS_INTERVAL = 1.0
+
+# bulk-load settings; the database is rebuilt from scratch if the import dies, so
+# durability during the load buys nothing
+IMPORT_PRAGMAS = [
+    "PRAGMA journal_mode=MEMORY",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA foreign_keys=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+]
+
+_SKIP = re.compile(r"(?:\s+|--[^\n]*(?:\n|\Z)|#[^\n]*(?:\n|\Z)|/\*.*?(?:\*/|\Z))*", re.S)
+_SQL_TOKEN = re.compile(r"""
+    [^;'"`/\-\#]+
+  | '(?:[^'\\]|\\.|'')*(?:'|\\?)
+  | "(?:[^"\\]|\\.|"")*(?:"|\\?)
+  | `[^`]*`?
+  | /\*.*?(?:\*/|\Z)
+  | --[^\n]*(?:\n|\Z)
+  | \#[^\n]*(?:\n|\Z)
+  | .
+""", re.S | re.X)
+_INSERT_HEAD = re.compile(r"INSERT\s+(IGNORE\s+)?INTO\s+([`\"\w.]+)\s*(?:\(([^)]*)\))?\s*VALUES\s*", re.I)
+_ROW = re.compile(r"\s*\(((?:'(?:[^'\\]|\\.|'')*'|[^'()])*)\)\s*([,;]?)", re.S)
+_VALUE = re.compile(r"\s*('(?:[^'\\]|\\.|'')*'|[^,']*?)\s*(?:,|\Z)", re.S)
+_ESCAPE = re.compile(r"\\(.)|''", re.S)
+_ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a', '%': '\\%', '_': '\\_'}
+_IGNORED = re.compile(r"(SET|LOCK|UNLOCK|BEGIN|COMMIT|START\s+TRANSACTION|USE)\b", re.I)
+_CREATE_TABLE = re.compile(r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([`\"\w.]+)", re.I)
+_KEY_LINE = re.compile(r"^\s*(UNIQUE\s+)?KEY\s+[`\"]?(\w+)[`\"]?\s*\(((?:[^()]|\(\d+\))*)\)", re.M | re.I)
+
+
+def _name(identifier: str) -> str:
+    """`schema`.`table` -> table"""
+    return identifier.split('.')[-1].strip('`"')
+
+
+def _unescape(body: str) -> str:
+    if '\\' not in body and "''" not in body:
+        return body
+    return _ESCAPE.sub(lambda m: "'" if m.group(1) is None else _ESCAPES.get(m.group(1), m.group(1)), body)
+
+
+def _sql_value(token: str):
+    if token.startswith("'"):
+        return _unescape(token[1:-1])
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    if token.upper() == 'NULL':
+        return None
+    try:
+        return float(token)
+    except ValueError:
+        raise ValueError(f"unsupported value in INSERT: {token[:60]!r}") from None
+
+
+class _Reader:
+    """Chunked text buffer that regexes can be matched against across chunk boundaries."""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def match(self, pattern, limit: int | None = None):
+        """Match at the current position, reading more input while the match could
+        still grow (it runs into the end of the buffer) or has not been found yet."""
+        while True:
+            m = pattern.match(self.buf, self.pos)
+            if m is not None and m.end() < len(self.buf):
+                return m
+            if limit is not None and m is None and len(self.buf) - self.pos > limit:
+                return None
+            if not self._fill():
+                return m
+
+    def lookahead(self, size: int):
+        while len(self.buf) - self.pos < size and self._fill():
+            pass
+
+    def at_end(self) -> bool:
+        self.lookahead(1)
+        return self.pos >= len(self.buf)
+
+
+class Insert:
+    """A multi-row INSERT; `rows` parses the VALUES tuples lazily from the dump."""
+
+    def __init__(self, table: str, columns: list[str] | None, ignore: bool, rows):
+        self.table = table
+        self.columns = columns
+        self.ignore = ignore
+        self.rows = rows
+
+    def sql(self, width: int) -> str:
+        columns = f" ({', '.join(self.columns)})" if self.columns else ''
+        verb = 'INSERT OR IGNORE' if self.ignore else 'INSERT'
+        return f"{verb} INTO {self.table}{columns} VALUES ({', '.join(['?'] * width)})"
+
+
+def _rows(reader: _Reader, width: int | None):
+    while True:
+        m = reader.match(_ROW, limit=MAX_ROW_CHARS)
+        if m is None:
+            raise ValueError(f"could not parse INSERT row near {reader.buf[reader.pos:reader.pos + 60]!r}")
+        reader.pos = m.end()
+        # findall ends with an empty match at the end of the tuple; drop it
+        row = tuple([_sql_value(token) for token in _VALUE.findall(m.group(1))[:-1]])
+        if width is None:
+            width = len(row)
+        elif len(row) != width:
+            raise ValueError(f"expected {width} values in INSERT row {m.group(1)[:60]!r}")
+        yield row
+        if m.group(2) != ',':
+            if m.group(2) != ';' and not reader.at_end():
+                raise ValueError(f"unsupported INSERT clause near {reader.buf[reader.pos:reader.pos + 60]!r}")
+            return
+
+
+def read_dump(f, chunk_size: int = CHUNK_SIZE):
+    """Yield the statements of a MySQL dump read from text file `f`.
+
+    Plain statements come out as strings (comments dropped, no trailing ';'),
+    INSERT ... VALUES statements as Insert objects whose rows must be consumed
+    before asking for the next statement (whatever is left is skipped).
+    """
+    reader = _Reader(f, chunk_size)
+    while True:
+        reader.pos = reader.match(_SKIP).end()
+        if reader.at_end():
+            return
+        reader.lookahead(1 << 16)  # room for a full INSERT header
+        head = _INSERT_HEAD.match(reader.buf, reader.pos)
+        if head:
+            reader.pos = head.end()
+            columns = [_name(c.strip()) for c in head.group(3).split(',')] if head.group(3) else None
+            rows = _rows(reader, len(columns) if columns else None)
+            yield Insert(_name(head.group(2)), columns, bool(head.group(1)), rows)
+            for _ in rows:
+                pass
+            continue
+        parts = []
+        while True:
+            m = reader.match(_SQL_TOKEN)
+            if m is None:
+                break
+            reader.pos = m.end()
+            token = m.group()
+            if token == ';':
+                break
+            parts.append(' ' if token.startswith(('--', '#', '/*')) else token)
+        statement = ''.join(parts).strip()
+        if statement:
+            yield statement
+
+
+def _batches(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _deferred_indexes(create_sql: str) -> list[str]:
+    """CREATE INDEX statements for the KEY / UNIQUE KEY lines of a MySQL CREATE TABLE."""
+    table = _name(_CREATE_TABLE.match(create_sql).group(1))
+    indexes = []
+    for unique, name, columns in _KEY_LINE.findall(create_sql):
+        columns = ', '.join(_name(re.sub(r"\(\d+\)", '', c).strip()) for c in columns.split(','))
+        indexes.append(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {table}_{name} ON {table} ({columns})")
+    return indexes
+
+
+def run_import(db_path: str, sql_path: str, batch_size: int = 5000, commit_rows: int = 200_000,
+               progress=None, apply_migrations: bool = True) -> dict:
+    """Stream a MySQL dump into a SQLite database.
+
+    Rows are inserted with executemany in batches of `batch_size` and committed
+    every `commit_rows`. The dump's KEY / UNIQUE KEY definitions are created as
+    indexes after the data is loaded, followed by the migrations (our indexes and
+    vehicle_summary) unless `apply_migrations` is off, and the database is left
+    in WAL mode for the app.
+
+    `progress(stats)` is called about once a second and when the import finishes;
+    the same stats dict is returned.
+    """
     p = Path(sql_path)
     if not p.exists():
         raise FileNotFoundError(f"SQL file not found: {sql_path}")
 
-    text = p.read_text(encoding='utf-8')
-    fixed = mysql_to_sqlite(text)
+    stats = {'statements': 0, 'rows': 0, 'bytes': 0, 'total_bytes': p.stat().st_size,
+             'seconds': 0.0, 'rows_per_sec': 0.0}
+    started = last_report = time.monotonic()
 
-    # write out a temporary cleaned SQL to inspect if needed
-    (Path(".") / "_cleaned_sql_for_sqlite.sql").write_text(fixed, encoding='utf-8')
+    def report(force: bool = False):
+        nonlocal last_report
+        now = time.monotonic()
+        stats['seconds'] = now - started
+        stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+        if progress and (force or now - last_report >= PROGRESS_INTERVAL):
+            last_report = now
+            progress(stats)
 
     conn = sqlite3.connect(db_path)
     try:
-        # enable foreign keys
-        conn.execute('PRAGMA foreign_keys = ON;')
-        conn.executescript(fixed)
+        for pragma in IMPORT_PRAGMAS:
+            conn.execute(pragma)
+        deferred = []
+        uncommitted = 0
+        with io.TextIOWrapper(p.open('rb'), encoding='utf-8') as text:
+            raw = text.buffer
+            for statement in read_dump(text):
+                stats['statements'] += 1
+                if isinstance(statement, Insert):
+                    for batch in _batches(statement.rows, batch_size):
+                        conn.executemany(statement.sql(len(batch[0])), batch)
+                        stats['rows'] += len(batch)
+                        uncommitted += len(batch)
+                        if uncommitted >= commit_rows:
+                            conn.commit()
+                            uncommitted = 0
+                        stats['bytes'] = raw.tell()
+                        report()
+                    continue
+                if _IGNORED.match(statement):
+                    continue
+                if _CREATE_TABLE.match(statement):
+                    deferred.extend(_deferred_indexes(statement))
+                sql = mysql_to_sqlite(statement + ';').strip()
+                if sql.rstrip(';').strip():
+                    conn.execute(sql)
+            stats['bytes'] = raw.tell()
+        conn.commit()
+
+        for sql in deferred:
+            conn.execute(sql)
         conn.commit()
+        if apply_migrations:
+            # indexes and derived tables (vehicle_summary) the app expects
+            migrate(conn, 'sqlite')
+        conn.execute("PRAGMA journal_mode=WAL")
     finally:
         conn.close()
+    report(force=True)
+    return stats
 
 
-if __name__ == '__main__':
-    print(f"Importing SQL from {sql_file} into {db_file} (preprocessing MySQL -> SQLite)...")
-    run_import(db_file, sql_file)
-    print(f"✅ Import finished. Cleaned SQL written to _cleaned_sql_for_sqlite.sql and DB: {db_file}")
+def _print_progress(stats: dict):
+    pct = 100 * stats['bytes'] / stats['total_bytes'] if stats['total_bytes'] else 100.0
+    print(f"\r  {pct:5.1f}%  {stats['rows']:,} rows  {stats['rows_per_sec']:,.0f} rows/s", end='', flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import a MySQL dump into a SQLite database.")
+    parser.add_argument('sql', nargs='?', default=sql_file, help=f'dump to import (default {sql_file})')
+    parser.add_argument('db', nargs='?', default=db_file, help=f'SQLite database (default {db_file})')
+    parser.add_argument('--batch-size', type=int, default=5000, help='rows per executemany batch')
+    args = parser.parse_args(argv)
 
+    print(f"Importing SQL from {args.sql} into {args.db} (streaming MySQL -> SQLite)...")
+    stats = run_import(args.db, args.sql, batch_size=args.batch_size, progress=_print_progress)
+    print(f"\n✅ Import finished: {stats['rows']:,} rows from {stats['statements']:,} statements "
+          f"in {stats['seconds']:.1f}s ({stats['rows_per_sec']:,.0f} rows/s). DB: {args.db}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
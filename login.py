@@ -1,6 +1,6 @@
-from jinja2 import Template
+from templating import string_template
 
-login_template = Template("""
+login_template = string_template('login', """
 <section class="section">
     <div class="container">
         <div class="columns is-centered">
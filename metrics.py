@@ -0,0 +1,262 @@
+"""Query and request instrumentation, exported at /metrics in Prometheus text format.
+
+Every statement run through queries.execute_sql / execute_write is timed and
+labelled with the queries.py function that issued it, together with rows
+returned (or affected) and errors. Connection checkouts are timed in db.py.
+Per request we count queries and split the time into database, template
+rendering and the rest, labelled by route rule (e.g. /car/<int:car_id>), and
+time rendering by template, with hits and misses of the fragment cache
+(templating.py) and what the misses cost.
+Queries run concurrently through parallel.gather count towards the request, so
+its database time is the sum over all threads and can exceed the wall time.
+
+Statements slower than SLOW_QUERY_MS (default 200, 0 logs everything) are written
+to the `slow_query` logger, which SLOW_QUERY_LOG=path sends to a file. Parameters
+are never logged: they include passwords.
+"""
+from bisect import bisect_left
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+from flask import Response, before_render_template, g, has_request_context, request, template_rendered
+
+import db
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+slow_log = logging.getLogger('slow_query')
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class Family:
+    """One metric name with a value per label combination: a counter or a histogram."""
+
+    def __init__(self, name: str, help: str, kind: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = labels
+        self.buckets = buckets
+        self.values: dict = {}  # label values -> float (counter) or [bucket counts, sum, count]
+
+    def inc(self, *labels, amount: float = 1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def observe(self, *labels, value: float):
+        with _lock:
+            h = self.values.get(labels)
+            if h is None:
+                h = self.values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                h[0][i] += 1
+            h[1] += value
+            h[2] += 1
+
+    def _labels(self, values: tuple, extra: str = '') -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with _lock:
+            items = sorted((k, v if self.kind == 'counter' else (list(v[0]), v[1], v[2])) for k, v in self.values.items())
+        for labels, value in items:
+            if self.kind == 'counter':
+                lines.append(f"{self.name}{self._labels(labels)} {_number(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = self._labels(labels, 'le="%s"' % _number(bound))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = self._labels(labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {count}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+QUERY_SECONDS = Family('db_query_duration_seconds', 'Statement execution time by queries.py function.',
+                       'histogram', ('function', 'kind'))
+QUERY_ROWS = Family('db_query_rows_total', 'Rows returned (reads) or affected (writes).', 'counter', ('function', 'kind'))
+QUERY_ERRORS = Family('db_query_errors_total', 'Statements that raised.', 'counter', ('function', 'kind'))
+SLOW_QUERIES = Family('db_slow_queries_total', 'Statements slower than SLOW_QUERY_MS.', 'counter', ('function',))
+ACQUIRE_SECONDS = Family('db_connection_acquire_seconds', 'Time to check a connection out of the pool.', 'histogram')
+READ_CONNECTIONS = Family('db_read_connections_total', 'Read connections by target when replicas are configured.',
+                          'counter', ('target',))
+REPLICA_DOWN = Family('db_replica_down_total', 'Times a replica failed to connect and was taken out of rotation.',
+                      'counter', ('replica',))
+REQUESTS = Family('http_requests_total', 'Requests by route, method and status.', 'counter', ('route', 'method', 'status'))
+REQUEST_SECONDS = Family('http_request_duration_seconds', 'Request handling time.', 'histogram', ('route',))
+REQUEST_DB_SECONDS = Family('http_request_db_seconds', 'Time spent in queries per request.', 'histogram', ('route',))
+REQUEST_RENDER_SECONDS = Family('http_request_render_seconds', 'Time spent rendering templates per request.',
+                                'histogram', ('route',))
+REQUEST_QUERIES = Family('http_request_queries', 'Queries issued per request.', 'histogram', ('route',), COUNT_BUCKETS)
+TEMPLATE_SECONDS = Family('template_render_seconds', 'Rendering time by template, including the templates it includes.',
+                          'histogram', ('template',))
+FRAGMENT_SECONDS = Family('template_fragment_render_seconds', 'Time to render a cached fragment on a miss.',
+                          'histogram', ('fragment',))
+FRAGMENTS = Family('template_fragment_cache_total', 'Fragment cache lookups by fragment and result.', 'counter',
+                   ('fragment', 'result'))
+
+FAMILIES = [QUERY_SECONDS, QUERY_ROWS, QUERY_ERRORS, SLOW_QUERIES, ACQUIRE_SECONDS, READ_CONNECTIONS, REPLICA_DOWN, REQUESTS, REQUEST_SECONDS,
+            REQUEST_DB_SECONDS, REQUEST_RENDER_SECONDS, REQUEST_QUERIES, TEMPLATE_SECONDS, FRAGMENT_SECONDS, FRAGMENTS]
+
+
+def _slow_threshold() -> float:
+    return float(os.getenv('SLOW_QUERY_MS', '200')) / 1000
+
+
+def _caller() -> str:
+    """Name of the queries.py function that issued the statement."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if frame.f_globals.get('__name__') == 'queries' and code.co_name not in ('execute_sql', 'execute_write', '_execute_on', '_query_on', '_query_primary'):
+            return code.co_name
+        frame = frame.f_back
+    return 'unknown'
+
+
+class timed_query:
+    """Context manager around one statement; set `.rows` before leaving.
+
+        with metrics.timed_query('read', query) as q:
+            ...
+            q.rows = len(results)
+    """
+
+    def __init__(self, kind: str, sql: str, function: str | None = None):
+        self.kind = kind
+        self.sql = sql
+        self.rows = 0
+        self.function = function or _caller()
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        QUERY_SECONDS.observe(self.function, self.kind, value=elapsed)
+        if exc_type is not None:
+            QUERY_ERRORS.inc(self.function, self.kind)
+        else:
+            QUERY_ROWS.inc(self.function, self.kind, amount=self.rows)
+        m = request_metrics()
+        if m is not None:
+            with _lock:
+                m['queries'] += 1
+                m['db'] += elapsed
+        if elapsed >= _slow_threshold():
+            SLOW_QUERIES.inc(self.function)
+            slow_log.warning("%.1f ms %s rows=%d%s: %s", elapsed * 1000, self.function, self.rows,
+                             ' (failed)' if exc_type else '', re.sub(r"\s+", ' ', self.sql).strip()[:2000])
+        return False
+
+
+def request_metrics() -> dict | None:
+    """The current request's counters, also from worker threads attached with attach()."""
+    if has_request_context():
+        return g.get('request_metrics')
+    return getattr(_local, 'request_metrics', None)
+
+
+def attach(counters: dict | None):
+    """Count this thread's queries towards a request's counters (None detaches)."""
+    _local.request_metrics = counters
+
+
+def observe_acquire(seconds: float):
+    ACQUIRE_SECONDS.observe(value=seconds)
+
+
+def render() -> str:
+    lines = []
+    for family in FAMILIES:
+        lines += family.render()
+    if db._pool is not None:  # don't open a pool just to report on it
+        lines += ["# HELP db_pool_connections Connection pool state.", "# TYPE db_pool_connections gauge"]
+        for state, value in sorted(db._pool.stats().items()):
+            if value is not None:
+                lines.append(f'db_pool_connections{{state="{state}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        for family in FAMILIES:
+            family.values.clear()
+
+
+def _route() -> str:
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def init_app(app):
+    """Collect per-request metrics and serve them at /metrics."""
+    log_path = os.getenv('SLOW_QUERY_LOG')
+    if log_path and not slow_log.handlers:
+        handler = logging.FileHandler(log_path)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_log.addHandler(handler)
+
+    @app.before_request
+    def _start_request_metrics():
+        g.request_metrics = {'started': time.perf_counter(), 'queries': 0, 'db': 0.0, 'render': 0.0, 'status': 500}
+
+    @app.after_request
+    def _record_status(response):
+        if 'request_metrics' in g:
+            g.request_metrics['status'] = response.status_code
+        return response
+
+    @app.teardown_request
+    def _finish_request_metrics(exc):
+        m = g.pop('request_metrics', None)
+        if m is None:
+            return
+        route = _route()
+        REQUESTS.inc(route, request.method, str(m['status']))
+        REQUEST_SECONDS.observe(route, value=time.perf_counter() - m['started'])
+        REQUEST_DB_SECONDS.observe(route, value=m['db'])
+        REQUEST_RENDER_SECONDS.observe(route, value=m['render'])
+        REQUEST_QUERIES.observe(route, value=m['queries'])
+
+    def _render_started(sender, template, context, **extra):
+        if 'request_metrics' in g:
+            g.request_metrics.setdefault('render_started', []).append((template.name or '<string>', time.perf_counter()))
+
+    def _render_finished(sender, template, context, **extra):
+        if 'request_metrics' in g and g.request_metrics.get('render_started'):
+            name, started = g.request_metrics['render_started'].pop()
+            elapsed = time.perf_counter() - started
+            TEMPLATE_SECONDS.observe(name, value=elapsed)
+            if not g.request_metrics['render_started']:  # nested renders are inside the outer one
+                g.request_metrics['render'] += elapsed
+
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
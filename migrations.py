@@ -0,0 +1,305 @@
+"""Versioned schema migrations for MySQL and the SQLite import.
+
+Applied versions are recorded in `schema_migrations`, so running this repeatedly
+only applies what is new:
+
+    python migrations.py              # migrate the MySQL database from .env
+    python migrations.py --status     # list applied / pending versions
+
+load_sql.run_import() applies the same migrations to the SQLite copy.
+
+A migration is a list of steps. Each step is an Index (created only if no existing
+index already starts with the same columns, so the dump's own KEYs are reused), a
+plain SQL string, or a callable taking (cursor, dialect) for data changes.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from query_builder import UNPRICED, vehicle_aggregate
+import search
+
+
+class Index:
+    def __init__(self, table: str, name: str, columns: list[str]):
+        self.table = table
+        self.name = name
+        self.columns = columns
+
+    def __repr__(self):
+        return f"Index({self.table}.{self.name} ({', '.join(self.columns)}))"
+
+
+def _existing_index_columns(cur, dialect: str, table: str) -> list[list[str]]:
+    """Column lists of every index on `table`, in index order."""
+    if dialect == 'sqlite':
+        cur.execute(f"PRAGMA index_list({table})")
+        names = [row[1] for row in cur.fetchall()]
+        result = []
+        for name in names:
+            cur.execute(f"PRAGMA index_info({name})")
+            result.append([row[2] for row in sorted(cur.fetchall())])
+        return result
+    cur.execute(
+        "SELECT index_name, column_name FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s ORDER BY index_name, seq_in_index",
+        (table,),
+    )
+    indexes: dict = {}
+    for name, column in cur.fetchall():
+        indexes.setdefault(name, []).append(column)
+    return list(indexes.values())
+
+
+def _create_index(cur, dialect: str, index: Index) -> bool:
+    for columns in _existing_index_columns(cur, dialect, index.table):
+        if [c.lower() for c in columns[:len(index.columns)]] == [c.lower() for c in index.columns]:
+            return False
+    cur.execute(f"CREATE INDEX {index.name} ON {index.table} ({', '.join(index.columns)})")
+    return True
+
+
+def _populate_vehicle_summary(cur, dialect: str):
+    # only the columns the table has so far: an early migration populates it before later ones add columns
+    cur.execute("SELECT * FROM vehicle_summary WHERE 1 = 0")
+    cur.fetchall()
+    columns = ', '.join(c for c in VEHICLE_SUMMARY_COLUMNS if c in {d[0] for d in cur.description})
+    sql, params = vehicle_aggregate(dialect=dialect).build()
+    cur.execute("DELETE FROM vehicle_summary")
+    cur.execute(f"INSERT INTO vehicle_summary ({columns}) SELECT {columns} FROM ({sql}) a", params)
+
+
+def _populate_report_rollups(cur, dialect: str):
+    for table, (key, columns, live) in REPORT_ROLLUPS.items():
+        cur.execute(f"DELETE FROM {table}")
+        cur.execute(f"INSERT INTO {table} ({key}, {', '.join(columns)}) " + live)
+
+
+VEHICLE_SUMMARY_COLUMNS = [
+    'vehicleID', 'vin', 'mileage', 'description', 'model_name', 'model_year', 'fuel_type',
+    'manufacturerID', 'manufacturer_name', 'vehicle_typeID', 'vehicle_type_name',
+    'colors', 'purchase_price', 'parts_cost', 'sales_price', 'is_sold', 'pending_parts', 'price_sort',
+]
+
+# Pre-aggregated report totals, one row per group, kept current by the write path
+# in queries.py. table -> (key column, value columns, live aggregate they must match)
+REPORT_ROLLUPS = {
+    'sales_rollup': ('userID', ['vehicles_sold', 'total_sold_price'], (
+        "SELECT s.userID, COUNT(s.vehicleID), COALESCE(SUM(pt.purchase_price), 0) "
+        "FROM salestransactions s LEFT JOIN purchasetransactions pt ON s.vehicleID = pt.vehicleID "
+        "GROUP BY s.userID"
+    )),
+    'seller_rollup': ('customerID', ['vehicles_sold_to_dealer', 'total_paid'], (
+        "SELECT pt.customerID, COUNT(pt.vehicleID), COALESCE(SUM(pt.purchase_price), 0) "
+        "FROM purchasetransactions pt GROUP BY pt.customerID"
+    )),
+    'vendor_rollup': ('vendorID', ['parts_purchased', 'total_spent'], (
+        "SELECT po.vendorID, COALESCE(SUM(p.quantity), 0), COALESCE(SUM(p.cost * p.quantity), 0) "
+        "FROM partorders po JOIN parts p ON p.part_orderID = po.part_orderID GROUP BY po.vendorID"
+    )),
+}
+
+# Tables whose changes are counted in table_versions (see versioning.py)
+VERSIONED_TABLES = [
+    'colors', 'customers', 'manufacturers', 'partorders', 'parts', 'purchasetransactions',
+    'salestransactions', 'users', 'vehiclecolors', 'vehicles', 'vehicletypes', 'vendors',
+    'vehicle_summary', 'sales_rollup', 'seller_rollup', 'vendor_rollup', 'search_terms', 'customer_terms',
+]
+
+
+def _seed_table_versions(cur, dialect: str):
+    mark = '?' if dialect == 'sqlite' else '%s'
+    now = int(time.time())
+    cur.execute("DELETE FROM table_versions")
+    cur.executemany(f"INSERT INTO table_versions (table_name, version, updated_at) VALUES ({mark}, 1, {mark})",
+                    [(table, now) for table in VERSIONED_TABLES])
+
+
+def _populate_search_terms(cur, dialect: str):
+    mark = '?' if dialect == 'sqlite' else '%s'
+    cur.execute("DELETE FROM search_terms")
+    cur.execute(f"SELECT {', '.join(search.SOURCE_COLUMNS)} FROM vehicle_summary")
+    rows = [dict(zip(search.SOURCE_COLUMNS, row)) for row in cur.fetchall()]
+    cur.executemany(f"INSERT INTO search_terms (vehicleID, term, weight) VALUES ({mark}, {mark}, {mark})",
+                    search.index_rows(rows))
+
+
+def _populate_customer_terms(cur, dialect: str):
+    mark = '?' if dialect == 'sqlite' else '%s'
+    cur.execute("DELETE FROM customer_terms")
+    cur.execute(f"SELECT {', '.join(search.CUSTOMER_COLUMNS)} FROM customers")
+    rows = [dict(zip(search.CUSTOMER_COLUMNS, row)) for row in cur.fetchall()]
+    cur.executemany(f"INSERT INTO customer_terms (customerID, term, weight) VALUES ({mark}, {mark}, {mark})",
+                    search.customer_index_rows(rows))
+
+
+MIGRATIONS = [
+    (1, 'indexes for vehicle filters and joins', [
+        Index('vehicles', 'ix_vehicles_manufacturer', ['manufacturerID']),
+        Index('vehicles', 'ix_vehicles_model_year', ['model_year']),
+        Index('vehicles', 'ix_vehicles_fuel_type', ['fuel_type']),
+        Index('vehicles', 'ix_vehicles_type', ['vehicle_typeID']),
+        Index('vehicles', 'ix_vehicles_vin', ['vin']),
+        Index('vehiclecolors', 'ix_vehiclecolors_vehicle_color', ['vehicleID', 'colorID']),
+        Index('vehiclecolors', 'ix_vehiclecolors_color', ['colorID']),
+        Index('partorders', 'ix_partorders_vehicle', ['vehicleID']),
+        Index('partorders', 'ix_partorders_vendor', ['vendorID']),
+        Index('parts', 'ix_parts_part_order', ['part_orderID']),
+        Index('salestransactions', 'ix_salestransactions_vehicle', ['vehicleID']),
+        Index('salestransactions', 'ix_salestransactions_user', ['userID']),
+        Index('purchasetransactions', 'ix_purchasetransactions_vehicle', ['vehicleID']),
+        Index('purchasetransactions', 'ix_purchasetransactions_customer', ['customerID']),
+        Index('customers', 'ix_customers_name', ['last_name', 'first_name']),
+        Index('users', 'ix_users_username', ['username']),
+        Index('manufacturers', 'ix_manufacturers_name', ['manufacturer_name']),
+        Index('vehicletypes', 'ix_vehicletypes_name', ['vehicle_type_name']),
+        Index('colors', 'ix_colors_name', ['color_name']),
+    ]),
+    (2, 'vehicle_summary table', [
+        "CREATE TABLE IF NOT EXISTS vehicle_summary ("
+        " vehicleID INTEGER NOT NULL PRIMARY KEY,"
+        " vin VARCHAR(50), mileage DECIMAL(10,1), description VARCHAR(255),"
+        " model_name VARCHAR(255), model_year INTEGER, fuel_type VARCHAR(50),"
+        " manufacturerID INTEGER, manufacturer_name VARCHAR(50),"
+        " vehicle_typeID INTEGER, vehicle_type_name VARCHAR(50),"
+        " colors VARCHAR(1024), purchase_price DECIMAL(10,2),"
+        " parts_cost DECIMAL(12,2) NOT NULL DEFAULT 0, sales_price DECIMAL(12,2),"
+        " is_sold SMALLINT NOT NULL DEFAULT 0, pending_parts INTEGER NOT NULL DEFAULT 0)",
+        Index('vehicle_summary', 'ix_vehicle_summary_listing', ['is_sold', 'pending_parts', 'model_year', 'vehicleID']),
+        Index('vehicle_summary', 'ix_vehicle_summary_year', ['model_year', 'vehicleID']),
+        Index('vehicle_summary', 'ix_vehicle_summary_mileage', ['mileage', 'vehicleID']),
+        Index('vehicle_summary', 'ix_vehicle_summary_manufacturer_name', ['manufacturer_name', 'vehicleID']),
+        Index('vehicle_summary', 'ix_vehicle_summary_manufacturer', ['manufacturerID']),
+        Index('vehicle_summary', 'ix_vehicle_summary_type', ['vehicle_typeID']),
+        Index('vehicle_summary', 'ix_vehicle_summary_fuel_type', ['fuel_type']),
+        _populate_vehicle_summary,
+    ]),
+    (3, 'report rollup tables', [
+        "CREATE TABLE IF NOT EXISTS sales_rollup ("
+        " userID INTEGER NOT NULL PRIMARY KEY,"
+        " vehicles_sold INTEGER NOT NULL DEFAULT 0, total_sold_price DECIMAL(14,2) NOT NULL DEFAULT 0)",
+        "CREATE TABLE IF NOT EXISTS seller_rollup ("
+        " customerID INTEGER NOT NULL PRIMARY KEY,"
+        " vehicles_sold_to_dealer INTEGER NOT NULL DEFAULT 0, total_paid DECIMAL(14,2) NOT NULL DEFAULT 0)",
+        "CREATE TABLE IF NOT EXISTS vendor_rollup ("
+        " vendorID INTEGER NOT NULL PRIMARY KEY,"
+        " parts_purchased INTEGER NOT NULL DEFAULT 0, total_spent DECIMAL(14,2) NOT NULL DEFAULT 0)",
+        _populate_report_rollups,
+    ]),
+    (4, 'indexes for date-ranged reports and exports', [
+        Index('salestransactions', 'ix_salestransactions_date', ['sales_date']),
+        Index('purchasetransactions', 'ix_purchasetransactions_date', ['purchase_date']),
+    ]),
+    (5, 'table_versions for conditional GET', [
+        "CREATE TABLE IF NOT EXISTS table_versions ("
+        " table_name VARCHAR(64) NOT NULL PRIMARY KEY,"
+        " version BIGINT NOT NULL DEFAULT 0, updated_at BIGINT NOT NULL DEFAULT 0)",
+        _seed_table_versions,
+    ]),
+    (6, 'search_terms inverted index', [
+        "CREATE TABLE IF NOT EXISTS search_terms ("
+        " vehicleID INTEGER NOT NULL, term VARCHAR(64) NOT NULL, weight INTEGER NOT NULL,"
+        " PRIMARY KEY (term, vehicleID))",
+        Index('search_terms', 'ix_search_terms_vehicle', ['vehicleID']),
+        _populate_search_terms,
+    ]),
+    (7, 'customer_terms index for the customer typeahead', [
+        "CREATE TABLE IF NOT EXISTS customer_terms ("
+        " customerID INTEGER NOT NULL, term VARCHAR(64) NOT NULL, weight INTEGER NOT NULL,"
+        " PRIMARY KEY (term, customerID))",
+        Index('customer_terms', 'ix_customer_terms_customer', ['customerID']),
+        _populate_customer_terms,
+    ]),
+    (8, 'scoped indexes for every listing sort', [
+        # the listing filters on is_sold / pending_parts and orders by the sort key, so each
+        # sort needs an index starting with both flags for page N to read only its own rows
+        f"ALTER TABLE vehicle_summary ADD COLUMN price_sort DECIMAL(12,2) NOT NULL DEFAULT {UNPRICED}",
+        Index('vehicle_summary', 'ix_vehicle_summary_listing_price', ['is_sold', 'pending_parts', 'price_sort', 'vehicleID']),
+        Index('vehicle_summary', 'ix_vehicle_summary_listing_mileage', ['is_sold', 'pending_parts', 'mileage', 'vehicleID']),
+        Index('vehicle_summary', 'ix_vehicle_summary_listing_manufacturer',
+              ['is_sold', 'pending_parts', 'manufacturer_name', 'vehicleID']),
+        Index('vehicle_summary', 'ix_vehicle_summary_price', ['price_sort', 'vehicleID']),
+        _populate_vehicle_summary,
+    ]),
+]
+
+
+def _ensure_version_table(cur):
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INTEGER NOT NULL PRIMARY KEY, description VARCHAR(255) NOT NULL, applied_at VARCHAR(32) NOT NULL)"
+    )
+
+
+def applied_versions(conn) -> set[int]:
+    cur = conn.cursor()
+    _ensure_version_table(cur)
+    cur.execute("SELECT version FROM schema_migrations")
+    versions = {row[0] for row in cur.fetchall()}
+    cur.close()
+    return versions
+
+
+def migrate(conn, dialect: str, verbose: bool = False) -> list[int]:
+    """Apply pending migrations in order; returns the versions applied.
+
+    Each migration is committed on its own, together with its schema_migrations row.
+    (MySQL commits DDL implicitly, so a failed migration may be partially applied;
+    every step is safe to re-run, so fix the cause and run it again.)
+    """
+    mark = '?' if dialect == 'sqlite' else '%s'
+    done = applied_versions(conn)
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        if version in done:
+            continue
+        cur = conn.cursor()
+        try:
+            for step in steps:
+                if isinstance(step, Index):
+                    created = _create_index(cur, dialect, step)
+                    if verbose:
+                        print(f"  {step}: {'created' if created else 'already covered'}")
+                elif callable(step):
+                    step(cur, dialect)
+                else:
+                    cur.execute(step)
+            cur.execute(
+                f"INSERT INTO schema_migrations (version, description, applied_at) VALUES ({mark}, {mark}, {mark})",
+                (version, description, datetime.now().isoformat(timespec='seconds')),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+        applied.append(version)
+        if verbose:
+            print(f"applied {version}: {description}")
+    return applied
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply schema migrations to the MySQL database.")
+    parser.add_argument('--status', action='store_true', help='list applied and pending migrations')
+    args = parser.parse_args(argv)
+
+    from db import get_connection
+    conn = get_connection()
+    try:
+        if args.status:
+            done = applied_versions(conn)
+            for version, description, _ in MIGRATIONS:
+                print(f"{'applied' if version in done else 'pending'}  {version}: {description}")
+            return 0
+        applied = migrate(conn, 'mysql', verbose=True)
+        print(f"✅ {len(applied)} migration(s) applied")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""Run independent read queries concurrently.
+
+    car, parts = parallel.gather(
+        (get_vehicle_details, car_id),
+        (get_vehicle_parts, car_id),
+    )
+
+The first call runs in the calling thread (on the request's own connection); the
+others run on a bounded thread pool (PARALLEL_WORKERS, default 4), each on its own
+pooled connection, so the wait is the slowest query rather than the sum.
+
+Worker threads are outside the request: their reads are not memoized and do not
+see the request's uncommitted writes. So everything runs in the calling thread
+once the request has written, when called from a worker (no nested fan-out), or
+when the connection pool has no spare connections. A worker that still times out
+on the pool is retried in the calling thread. With read replicas, workers read
+from the primary whenever the caller would (db.reads_from_primary).
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+import db
+import metrics
+
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=int(os.getenv('PARALLEL_WORKERS', '4')),
+                                               thread_name_prefix='query')
+    return _executor
+
+
+def reset_after_fork():
+    """In a forked child: the parent's worker threads did not survive the fork."""
+    global _executor, _executor_lock
+    _executor, _executor_lock = None, threading.Lock()
+
+
+def _spare_connections() -> int | None:
+    """Connections left for workers (one is kept for the request), None if unbounded."""
+    stats = db.get_pool().stats()
+    if stats.get('size') is None:
+        return None
+    return max(0, stats['size'] - stats['in_use'] - stats['waiting'] - 1)
+
+
+def _run(call):
+    fn, *args = call
+    return fn(*args)
+
+
+def _run_in_worker(call, counters, primary):
+    _local.in_worker = True
+    metrics.attach(counters)
+    db.pin_primary(primary)
+    try:
+        return _run(call)
+    finally:
+        db.pin_primary(False)
+        metrics.attach(None)
+        _local.in_worker = False
+
+
+def gather(*calls) -> list:
+    """Run (fn, *args) calls concurrently and return their results in order.
+
+    A None call yields None, so optional queries can stay in place. If a call
+    raises, the first error (in call order) is re-raised once all have finished.
+    """
+    results = [None] * len(calls)
+    todo = [i for i, call in enumerate(calls) if call is not None]
+    sess = db.current_session()
+    workers = 0
+    if len(todo) > 1 and not getattr(_local, 'in_worker', False) and not (sess is not None and sess.wrote):
+        spare = _spare_connections()
+        workers = len(todo) - 1 if spare is None else min(len(todo) - 1, spare)
+
+    counters = metrics.request_metrics()
+    primary = workers > 0 and db.reads_from_primary()
+    futures = {i: _get_executor().submit(_run_in_worker, calls[i], counters, primary) for i in todo[1:1 + workers]}
+    errors = {}
+    for i in todo:
+        try:
+            if i not in futures:
+                results[i] = _run(calls[i])
+                continue
+            try:
+                results[i] = futures[i].result()
+            except db.PoolTimeout:
+                results[i] = _run(calls[i])
+        except Exception as e:
+            errors[i] = e
+    if errors:
+        raise errors[min(errors)]
+    return results
@@ -0,0 +1,150 @@
+"""Vendor deliveries for bulk ingestion: parse and check a part order before anything is written.
+
+A delivery is CSV with a header and one row per part:
+
+    vendor_id,vehicle_id,order_number,part_number,description,cost,quantity,status
+
+where status is optional (default Ordered) and rows sharing vehicle_id and
+order_number make up one order; or JSON, one order or a list of them:
+
+    {"vendor_id": 3, "vehicle_id": 11, "order_number": 2,
+     "parts": [{"part_number": "A-1", "description": "Mirror", "cost": 12.5, "quantity": 2}]}
+
+parse() checks every row and returns (orders, errors). Each error names the row
+or part it is about, and nothing should be written while there are any;
+queries.insert_part_orders adds the checks that need the database.
+"""
+import csv
+from decimal import Decimal, InvalidOperation
+import io
+import json
+
+STATUSES = ('Ordered', 'Received', 'Installed')
+CSV_COLUMNS = ('vendor_id', 'vehicle_id', 'order_number', 'part_number', 'description', 'cost', 'quantity', 'status')
+MAX_PARTS = 10000
+
+
+def _positive_int(value, name: str, errors: list, where: str) -> int | None:
+    try:
+        n = int(str(value).strip())
+    except (TypeError, ValueError):
+        errors.append(f"{where}: {name} must be a whole number")
+        return None
+    if n < 1:
+        errors.append(f"{where}: {name} must be at least 1")
+        return None
+    return n
+
+
+def _text(value, name: str, limit: int, errors: list, where: str) -> str | None:
+    text = str(value).strip() if value is not None else ''
+    if not text:
+        errors.append(f"{where}: {name} is required")
+        return None
+    if len(text) > limit:
+        errors.append(f"{where}: {name} is longer than {limit} characters")
+        return None
+    return text
+
+
+def check_part(raw: dict, where: str, errors: list) -> dict | None:
+    """One part as {'part_number', 'description', 'cost', 'quantity', 'status'}, or None with errors added."""
+    found = len(errors)
+    part_number = _text(raw.get('part_number'), 'part_number', 50, errors, where)
+    description = _text(raw.get('description'), 'description', 255, errors, where)
+    try:
+        cost = Decimal(str(raw.get('cost')).strip()).quantize(Decimal('0.01'))
+        if cost < 0 or cost >= Decimal('1000000'):  # DECIMAL(8,2)
+            raise InvalidOperation
+    except (InvalidOperation, ValueError):
+        errors.append(f"{where}: cost must be an amount from 0 to 999999.99")
+        cost = None
+    quantity = _positive_int(raw.get('quantity'), 'quantity', errors, where)
+    status = str(raw.get('status') or 'Ordered').strip().capitalize()
+    if status not in STATUSES:
+        errors.append(f"{where}: status must be one of {', '.join(STATUSES)}")
+    if len(errors) > found:
+        return None
+    return {'part_number': part_number, 'description': description, 'cost': cost, 'quantity': quantity,
+            'status': status}
+
+
+def _add_part(orders: dict, header: tuple, part: dict, where: str, errors: list):
+    vendor_id, vehicle_id, order_number = header
+    order = orders.setdefault((vehicle_id, order_number), {
+        'vendor_id': vendor_id, 'vehicle_id': vehicle_id, 'order_number': order_number, 'parts': []})
+    if order['vendor_id'] != vendor_id:
+        errors.append(f"{where}: order {order_number} for vehicle {vehicle_id} is already from vendor {order['vendor_id']}")
+    elif any(p['part_number'] == part['part_number'] for p in order['parts']):
+        errors.append(f"{where}: part {part['part_number']} is listed twice in order {order_number}")
+    else:
+        order['parts'].append(part)
+
+
+def _order_header(raw: dict, where: str, errors: list) -> tuple | None:
+    found = len(errors)
+    header = tuple(_positive_int(raw.get(k), k, errors, where) for k in ('vendor_id', 'vehicle_id', 'order_number'))
+    return header if len(errors) == found else None
+
+
+def parse_csv(text: str) -> tuple[list[dict], list[str]]:
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')))
+    missing = [c for c in CSV_COLUMNS if c != 'status' and c not in (reader.fieldnames or [])]
+    if missing:
+        return [], [f"missing columns: {', '.join(missing)}"]
+    orders, errors, count = {}, [], 0
+    for line, row in enumerate(reader, start=2):
+        count += 1
+        where = f"row {line}"
+        header = _order_header(row, where, errors)
+        part = check_part(row, where, errors)
+        if header and part:
+            _add_part(orders, header, part, where, errors)
+    return _finish(orders, errors, count)
+
+
+def parse_json(data) -> tuple[list[dict], list[str]]:
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or not all(isinstance(o, dict) for o in data):
+        return [], ["expected an order object or a list of them"]
+    orders, errors, count = {}, [], 0
+    for i, raw in enumerate(data, start=1):
+        header = _order_header(raw, f"order {i}", errors)
+        parts = raw.get('parts')
+        if not isinstance(parts, list) or not parts:
+            errors.append(f"order {i}: parts must be a non-empty list")
+            continue
+        for j, raw_part in enumerate(parts, start=1):
+            count += 1
+            where = f"order {i} part {j}"
+            if not isinstance(raw_part, dict):
+                errors.append(f"{where}: expected an object")
+                continue
+            part = check_part(raw_part, where, errors)
+            if header and part:
+                _add_part(orders, header, part, where, errors)
+    return _finish(orders, errors, count)
+
+
+def _finish(orders: dict, errors: list, count: int) -> tuple[list[dict], list[str]]:
+    if count > MAX_PARTS:
+        errors.insert(0, f"{count} parts in one upload; the limit is {MAX_PARTS}")
+    elif not count and not errors:
+        errors.append("no parts in the upload")
+    return list(orders.values()), errors
+
+
+def parse(body: str | bytes, fmt: str) -> tuple[list[dict], list[str]]:
+    """(orders, errors) from an upload in 'csv' or 'json'."""
+    if isinstance(body, bytes):
+        try:
+            body = body.decode('utf-8')
+        except UnicodeDecodeError:
+            return [], ["the upload is not UTF-8 text"]
+    if fmt == 'json':
+        try:
+            return parse_json(json.loads(body))
+        except ValueError as e:
+            return [], [f"invalid JSON: {e}"]
+    return parse_csv(body)
@@ -1,6 +1,6 @@
-from jinja2 import Template
+from templating import string_template
 
-product_detail_template = Template("""
+product_detail_template = string_template('product_detail', """
 <div class="container">
     <a href="{{ back_url }}" class="button is-primary mb-4">
         ← 
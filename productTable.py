@@ -1,6 +1,6 @@
-from jinja2 import Template
+from templating import string_template
 
-product_table_template = Template("""
+product_table_template = string_template('product_table', """
 <div class="columns is-multiline">
     {% for product in products %}
     <div class="column is-one-third">
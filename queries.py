@@ -1,18 +1,91 @@
-from db import get_connection
+import base64
+import json
+import re
+import time
+
+import metrics
+import search
+from db import current_session, dialect, get_read_connection, on_primary, transaction
+from parallel import gather
+from cache import cached, invalidate, memoize, forget_request_memo
+from query_builder import UNPRICED, Select, compile_vehicle_filters, in_list, vehicle_aggregate
+from migrations import REPORT_ROLLUPS, VEHICLE_SUMMARY_COLUMNS
 
 def add_user(email: str, password: str, role: str | None, first_name: str | None, last_name: str | None):
     query = "INSERT INTO users (username, password, role, first_name, last_name) VALUES (%s, %s, %s, %s, %s)"
     return execute_write(query, (email, password, role, first_name, last_name))
 
 def execute_sql(query: str, params: tuple = ()):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(query, params)
-    results = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    with transaction() as conn:
+        return _query_on(conn, query, params)
+
+
+def _query_primary(query: str, params: tuple = ()) -> list[dict]:
+    """execute_sql on the primary even with read replicas (see db.on_primary)."""
+    with on_primary(), transaction() as conn:
+        return _query_on(conn, query, params)
+
+
+def _query_on(conn, query: str, params: tuple = ()) -> list[dict]:
+    """execute_sql on a connection the caller already holds (see _execute_on)."""
+    with metrics.timed_query('read', query) as timer:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, params)
+        results = cursor.fetchall()
+        cursor.close()
+        timer.rows = len(results)
     return results
 
+_WRITE_TARGET = re.compile(r"\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)", re.I)
+
+
+def _written_table(query: str) -> str | None:
+    m = _WRITE_TARGET.match(query)
+    return m.group(1).lower() if m and m.group(1).lower() != 'table_versions' else None
+
+
+def touch_tables(conn, *tables: str):
+    """Count a change to `tables` in table_versions, in the same transaction.
+
+    Inside a request the tables are collected on the session and bumped once,
+    right before it commits, so the version rows are locked only briefly.
+    """
+    sess = current_session()
+    if sess is None:
+        _bump_versions(conn, tables)
+        return
+    if not sess.touched:
+        def flush():
+            touched, sess.touched = sess.touched, set()
+            _bump_versions(sess.conn, touched)
+        sess.before_commit(flush)
+    sess.touched.update(tables)
+
+
+def _bump_versions(conn, tables):
+    tables, now = sorted(set(tables)), int(time.time())  # fixed lock order
+    if not tables or conn is None:
+        return
+    if dialect() == 'sqlite':
+        conflict = "ON CONFLICT(table_name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at"
+    else:
+        conflict = "ON DUPLICATE KEY UPDATE version = version + 1, updated_at = VALUES(updated_at)"
+    query = f"INSERT INTO table_versions (table_name, version, updated_at) VALUES (%s, 1, %s) {conflict}"
+    with metrics.timed_query('write', query, function='touch_tables') as timer:
+        cursor = conn.cursor()
+        cursor.executemany(query, [(table, now) for table in tables])
+        cursor.close()
+        timer.rows = len(tables)
+
+
+def get_table_versions(*tables: str) -> dict:
+    """{table: (version, updated_at)} for the given tables; unknown tables are left out."""
+    marks = ', '.join(['%s'] * len(tables))
+    rows = execute_sql(f"SELECT table_name, version, updated_at FROM table_versions WHERE table_name IN ({marks})",
+                       tuple(tables))
+    return {r['table_name']: (r['version'], r['updated_at']) for r in rows}
+
+
 def authenticate_user(email: str, password: str):
     """Return user record if email/password match, else None."""
     query = "SELECT * FROM users WHERE username = %s AND password = %s"
@@ -21,81 +94,102 @@ def authenticate_user(email: str, password: str):
 
 
 def execute_write(query: str, params: tuple = ()): 
-    """Execute INSERT/UPDATE/DELETE and commit; returns lastrowid."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(query, params)
-    conn.commit()
-    last = cursor.lastrowid
-    cursor.close()
-    conn.close()
+    """Execute INSERT/UPDATE/DELETE; returns lastrowid.
+
+    Inside a request the write joins the request's transaction and is committed
+    with it; outside a request it is committed immediately.
+    """
+    with transaction(write=True) as conn:
+        last = _execute_on(conn, query, params)
+    # reads memoized earlier in this request may no longer be current
+    forget_request_memo()
+    return last
+
+
+def _execute_on(conn, query: str, params=(), many: bool = False):
+    """Run one write on `conn` (executemany over `params` if `many`); returns lastrowid.
+
+    For functions that issue several writes in one transaction of their own;
+    they call forget_request_memo() when done.
+    """
+    with metrics.timed_query('write', query) as timer:
+        cursor = conn.cursor()
+        if many:
+            cursor.executemany(query, params)
+        else:
+            cursor.execute(query, params)
+        last = cursor.lastrowid
+        timer.rows = cursor.rowcount
+        cursor.close()
+    table = _written_table(query)
+    if table:
+        touch_tables(conn, table)
     return last
 
+@memoize
 def filter_data():
     """Return distinct values for UI filters: manufacturers, vehicle types, model years, fuel types, colors.
 
     Returns a dict with keys: manufacturers, vehicle_types, model_years, fuel_types, colors.
-    Each value is the result of a small SELECT query suitable for populating dropdowns.
+    Each value comes from a cached lookup, so dropdowns are normally served without
+    touching the database.
     """
-    manufacturers = execute_sql("SELECT manufacturerID, manufacturer_name FROM manufacturers ORDER BY manufacturer_name;")
-    vehicle_types = execute_sql("SELECT vehicle_typeID, vehicle_type_name FROM vehicletypes ORDER BY vehicle_type_name;")
-    # model years — distinct values from vehicles
-    model_years_rows = execute_sql("SELECT DISTINCT model_year FROM vehicles WHERE model_year IS NOT NULL ORDER BY model_year DESC;")
-    # extract scalar list of years
-    model_years = [r.get('model_year') for r in model_years_rows]
-    # fuel types — distinct values from vehicles
-    fuel_rows = execute_sql("SELECT DISTINCT fuel_type FROM vehicles WHERE fuel_type IS NOT NULL ORDER BY fuel_type;")
-    fuel_types = [r.get('fuel_type') for r in fuel_rows]
-    colors = execute_sql("SELECT colorID, color_name FROM colors ORDER BY color_name;")
-
     return {
-        'manufacturers': manufacturers,
-        'vehicle_types': vehicle_types,
-        'model_years': model_years,
-        'fuel_types': fuel_types,
-        'colors': colors,
+        'manufacturers': get_manufacturers(),
+        'vehicle_types': get_vehicle_types(),
+        'model_years': get_model_years(),
+        'fuel_types': get_fuel_types(),
+        'colors': get_colors(),
     }
-    
+
+
+@memoize
+@cached('vehicle_facets')
+def get_model_years():
+    # model years — distinct values from vehicles, newest first
+    rows = execute_sql("SELECT DISTINCT model_year FROM vehicles WHERE model_year IS NOT NULL ORDER BY model_year DESC;")
+    return [r.get('model_year') for r in rows]
+
+
+@memoize
+@cached('vehicle_facets')
+def get_fuel_types():
+    rows = execute_sql("SELECT DISTINCT fuel_type FROM vehicles WHERE fuel_type IS NOT NULL ORDER BY fuel_type;")
+    return [r.get('fuel_type') for r in rows]
+
 def get_tables():
     return execute_sql("SHOW TABLES;")
 
 
+@memoize
 def get_parts():
     return execute_sql("SELECT * FROM parts;")
 
 
+@memoize
 def get_vehicle_by_id(vehicle_id: int):
     results = execute_sql("SELECT * FROM vehicles WHERE vehicleID = %s", (vehicle_id,))
     return results[0] if results else None
 
 
-def get_vehicle_details(vehicle_id: int):
+@memoize
+def get_vehicle_details(vehicle_id: int, fields: tuple | None = None):
     """Return a single vehicle row enriched with manufacturer and vehicle type names,
     concatenated colors, purchase price, parts cost and computed sales_price.
+
+    `fields` (VEHICLE_FIELDS names) selects only those columns.
     """
-    query = (
-        "SELECT v.vehicleID, v.vin, v.mileage, v.description, v.model_name, v.model_year, v.fuel_type, "
-        "v.manufacturerID, m.manufacturer_name, v.vehicle_typeID, vt.vehicle_type_name, "
-        "GROUP_CONCAT(DISTINCT c.color_name ORDER BY c.color_name SEPARATOR ', ') AS colors, "
-        "pt.purchase_price AS purchase_price, "
-        "COALESCE(SUM(p.cost * p.quantity), 0) AS parts_cost, "
-        "CASE WHEN pt.purchase_price IS NOT NULL THEN ROUND(1.4 * pt.purchase_price + 1.2 * COALESCE(SUM(p.cost * p.quantity),0), 2) ELSE NULL END AS sales_price, "
-        "EXISTS (SELECT 1 FROM salestransactions st WHERE st.vehicleID = v.vehicleID) AS is_sold "
-        "FROM vehicles v "
-        "LEFT JOIN manufacturers m ON v.manufacturerID = m.manufacturerID "
-        "LEFT JOIN vehicletypes vt ON v.vehicle_typeID = vt.vehicle_typeID "
-        "LEFT JOIN vehiclecolors vc ON vc.vehicleID = v.vehicleID "
-        "LEFT JOIN colors c ON vc.colorID = c.colorID "
-        "LEFT JOIN purchasetransactions pt ON pt.vehicleID = v.vehicleID "
-        "LEFT JOIN partorders po ON po.vehicleID = v.vehicleID "
-        "LEFT JOIN parts p ON p.part_orderID = po.part_orderID "
-        "WHERE v.vehicleID = %s "
-        "GROUP BY v.vehicleID, v.vin, v.mileage, v.description, v.model_name, v.model_year, v.fuel_type, v.manufacturerID, m.manufacturer_name, v.vehicle_typeID, vt.vehicle_type_name, pt.purchase_price "
+    columns = (', '.join(f"v.{f}" for f in fields),) if fields else (_SUMMARY_LISTING_COLUMNS, "v.is_sold")
+    q = (
+        Select("vehicle_summary v")
+        .columns(*columns)
+        .where("v.vehicleID = %s", vehicle_id)
     )
-    results = execute_sql(query, (vehicle_id,))
+    results = execute_sql(*q.build())
     return results[0] if results else None
 
 
+@memoize
 def get_part_by_id(part_id: int):
     results = execute_sql("SELECT * FROM parts WHERE partID = %s", (part_id,))
     return results[0] if results else None
@@ -112,17 +206,190 @@ def insert_vehicle(model_name: str, model_year: int | None, description: str | N
 
 def insert_vehicle_full(vin: str, mileage: float | None, model_name: str, model_year: int | None, fuel_type: str | None, manufacturer_id: int | None, vehicle_type_id: int | None, description: str | None):
     query = "INSERT INTO vehicles (vin, mileage, description, model_name, model_year, fuel_type, manufacturerID, vehicle_typeID) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
-    return execute_write(query, (vin, mileage, description, model_name, model_year, fuel_type, manufacturer_id, vehicle_type_id))
+    vid = execute_write(query, (vin, mileage, description, model_name, model_year, fuel_type, manufacturer_id, vehicle_type_id))
+    refresh_vehicle_summary(vid)
+    reindex_vehicles(vid)
+    # a new vehicle may introduce a model year or fuel type the filter dropdowns don't list yet
+    invalidate('vehicle_facets')
+    return vid
+
+
+def existing_vins(vins) -> set[str]:
+    """The VINs among `vins` that are already in vehicles."""
+    vins = sorted(set(vins))
+    if not vins:
+        return set()
+    sql, params = in_list("vin", vins)
+    return {r['vin'] for r in _query_primary(f"SELECT vin FROM vehicles WHERE {sql}", params)}
+
+
+def existing_customer_ids(customer_ids) -> set[int]:
+    ids = sorted(set(customer_ids))
+    if not ids:
+        return set()
+    sql, params = in_list("customerID", ids)
+    return {r['customerID'] for r in _query_primary(f"SELECT customerID FROM customers WHERE {sql}", params)}
 
 
-def insert_part(part_number: str, description: str | None, cost: float | None, quantity: int | None):
-    query = "INSERT INTO parts (part_number, description, cost, quantity) VALUES (%s, %s, %s, %s)"
-    return execute_write(query, (part_number, description, cost, quantity))
+def insert_vehicles(vehicles: list[dict], user_id: int) -> dict[str, int]:
+    """Insert checked vehicles (intake.check_row) bought by `user_id`, with their colors and
+    purchase transactions, in one transaction; returns {vin: vehicleID}.
+
+    Each table gets one executemany, and the derived tables (vehicle_summary,
+    search_terms, seller_rollup) one batch each for all the new vehicles.
+    """
+    if not vehicles:
+        return {}
+    with transaction(write=True) as conn:
+        _execute_on(conn, "INSERT INTO vehicles (vin, mileage, description, model_name, model_year, fuel_type, "
+                          "manufacturerID, vehicle_typeID) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                    [(v['vin'], float(v['mileage']), v['description'], v['model_name'], v['model_year'],
+                      v['fuel_type'], v['manufacturer_id'], v['vehicle_type_id']) for v in vehicles], many=True)
+        # executemany has no per-row insert IDs; the VINs are unique
+        vin_sql, vin_params = in_list("vin", [v['vin'] for v in vehicles])
+        ids = {r['vin']: r['vehicleID'] for r in _query_on(conn, f"SELECT vehicleID, vin FROM vehicles WHERE {vin_sql}",
+                                                             vin_params)}
+        colors = [(ids[v['vin']], c) for v in vehicles for c in v['color_ids']]
+        if colors:
+            _execute_on(conn, "INSERT INTO vehiclecolors (vehicleID, colorID) VALUES (%s, %s)", colors, many=True)
+        _execute_on(conn, "INSERT INTO purchasetransactions (vehicleID, userID, customerID, purchase_price, "
+                          "purchase_date, vehicle_condition) VALUES (%s, %s, %s, %s, %s, %s)",
+                    [(ids[v['vin']], user_id, v['customer_id'], float(v['price']), v['purchase_date'], v['condition'])
+                     for v in vehicles], many=True)
+        sellers = {}
+        for v in vehicles:
+            totals = sellers.setdefault(v['customer_id'], {'vehicles_sold_to_dealer': 0, 'total_paid': 0.0})
+            totals['vehicles_sold_to_dealer'] += 1
+            totals['total_paid'] += float(v['price'])
+        _bump_rollups_on(conn, 'seller_rollup', sellers)
+        new_ids = sorted(ids.values())
+        _refresh_summary_on(conn, new_ids)
+        _reindex_vehicles_on(conn, new_ids)
+    forget_request_memo()
+    invalidate('vehicle_facets')
+    return ids
+
+
+def insert_part(part_number: str, description: str | None, cost: float | None, quantity: int | None, part_order_id: int | None = None):
+    if part_order_id is None:
+        query = "INSERT INTO parts (part_number, description, cost, quantity) VALUES (%s, %s, %s, %s)"
+        return execute_write(query, (part_number, description, cost, quantity))
+    query = "INSERT INTO parts (part_orderID, part_number, description, cost, quantity) VALUES (%s, %s, %s, %s, %s)"
+    pid = execute_write(query, (part_order_id, part_number, description, cost, quantity))
+    order = execute_sql("SELECT vehicleID, vendorID FROM partorders WHERE part_orderID = %s", (part_order_id,))
+    if order:
+        bump_rollup('vendor_rollup', order[0]['vendorID'],
+                    parts_purchased=quantity or 0, total_spent=(cost or 0) * (quantity or 0))
+        refresh_vehicle_summary(order[0]['vehicleID'])
+    return pid
+
+def insert_part_orders(orders: list[dict]) -> tuple[list[dict], list[str]]:
+    """Insert checked part orders (part_orders.parse) with all their parts in one transaction.
+
+    First checks what needs the database (vendors and vehicles exist, order
+    numbers are new for their vehicle) and writes nothing if that finds errors.
+    Returns ([{'part_orderID', 'vehicleID', 'order_number', 'parts'}], errors).
+    """
+    if not orders:
+        return [], []
+    vendor_ids = sorted({o['vendor_id'] for o in orders})
+    vehicle_ids = sorted({o['vehicle_id'] for o in orders})
+    marks = ', '.join(['%s'] * len(vehicle_ids))
+    with on_primary(), transaction() as conn:  # not a replica: a lagging one would pass duplicates
+        known_vendors = {r['vendorID'] for r in _query_on(
+            conn, f"SELECT vendorID FROM vendors WHERE vendorID IN ({', '.join(['%s'] * len(vendor_ids))})", tuple(vendor_ids))}
+        known_vehicles = {r['vehicleID'] for r in _query_on(
+            conn, f"SELECT vehicleID FROM vehicles WHERE vehicleID IN ({marks})", tuple(vehicle_ids))}
+        taken = {(r['vehicleID'], r['order_number']) for r in _query_on(
+            conn, f"SELECT vehicleID, order_number FROM partorders WHERE vehicleID IN ({marks})", tuple(vehicle_ids))}
+    errors = []
+    for o in orders:
+        label = f"order {o['order_number']} for vehicle {o['vehicle_id']}"
+        if o['vendor_id'] not in known_vendors:
+            errors.append(f"{label}: no vendor {o['vendor_id']}")
+        if o['vehicle_id'] not in known_vehicles:
+            errors.append(f"{label}: no vehicle {o['vehicle_id']}")
+        elif (o['vehicle_id'], o['order_number']) in taken:
+            errors.append(f"{label}: already exists")
+    if errors:
+        return [], errors
+
+    created, parts, spent = [], [], {}
+    with transaction(write=True) as conn:
+        for o in orders:
+            order_id = _execute_on(conn, "INSERT INTO partorders (order_number, vehicleID, vendorID) VALUES (%s, %s, %s)",
+                                   (o['order_number'], o['vehicle_id'], o['vendor_id']))
+            created.append({'part_orderID': order_id, 'vehicleID': o['vehicle_id'],
+                            'order_number': o['order_number'], 'parts': len(o['parts'])})
+            totals = spent.setdefault(o['vendor_id'], {'parts_purchased': 0, 'total_spent': 0.0})
+            for p in o['parts']:
+                parts.append((order_id, p['part_number'], float(p['cost']), p['description'], p['quantity'], p['status']))
+                totals['parts_purchased'] += p['quantity']
+                totals['total_spent'] += float(p['cost']) * p['quantity']
+        # every part in one statement: the driver batches executemany into a single round trip
+        _execute_on(conn, "INSERT INTO parts (part_orderID, part_number, cost, description, quantity, status) "
+                          "VALUES (%s, %s, %s, %s, %s, %s)", parts, many=True)
+        _bump_rollups_on(conn, 'vendor_rollup', spent)
+        _refresh_summary_on(conn, vehicle_ids)
+    forget_request_memo()
+    return created, []
+
 
 def get_users():
     return execute_sql("SELECT * FROM users;")
 
-def get_vehicles(filters: dict | None = None, get_all = False, include_unready = False):
+# columns of vehicle_summary that callers may project with `fields` (price_sort is internal)
+VEHICLE_FIELDS = tuple(c for c in VEHICLE_SUMMARY_COLUMNS if c != 'price_sort')
+
+_SUMMARY_LISTING_COLUMNS = (
+    "v.vehicleID, v.vin, v.mileage, v.description, v.model_name, v.model_year, v.fuel_type, "
+    "v.manufacturerID, v.manufacturer_name, v.vehicle_typeID, v.vehicle_type_name, "
+    "v.colors, v.purchase_price, v.parts_cost, v.sales_price"
+)
+# the fields of a listing row (get_vehicles without `fields`)
+LISTING_FIELDS = tuple(c.strip()[2:] for c in _SUMMARY_LISTING_COLUMNS.split(','))
+
+# Sort keys for the vehicle listing: key -> (SQL expression, direction, row field).
+# Every sort is made total by breaking ties on vehicleID in the same direction, which
+# is what lets a (value, vehicleID) cursor resume exactly where a page ended.
+VEHICLE_SORTS = {
+    'year': ('v.model_year', 'DESC', 'model_year'),
+    'price': ('v.price_sort', 'ASC', 'sales_price'),  # sales_price, unpriced last (see UNPRICED)
+    'mileage': ('v.mileage', 'ASC', 'mileage'),
+    'manufacturer': ('v.manufacturer_name', 'ASC', 'manufacturer_name'),
+    # only with a search query ('q' filter); falls back to 'year' without one
+    'relevance': ('m.score', 'DESC', 'search_score'),
+}
+
+
+def encode_cursor(direction: str, value, vehicle_id: int) -> str:
+    raw = json.dumps([direction, value, vehicle_id], default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """Return (direction, value, vehicle_id) or None if the cursor is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, value, vehicle_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if direction not in ('n', 'p'):
+        return None
+    return direction, value, int(vehicle_id)
+
+
+def _sort_value(row: dict, sort: str):
+    value = row.get(VEHICLE_SORTS[sort][2])
+    if sort == 'price' and value is None:
+        return UNPRICED
+    return value
+
+
+@memoize
+def get_vehicles(filters: dict | None = None, get_all = False, include_unready = False,
+                 sort: str = 'year', cursor: str | None = None, limit: int | None = None,
+                 fields: tuple | None = None):
     """
     Return vehicle rows enriched with manufacturer and vehicle type names for display.
 
@@ -132,135 +399,280 @@ def get_vehicles(filters: dict | None = None, get_all = False, include_unready =
       - model_year (int)
       - fuel_type (str)
       - color_id (int) or color_name (str)
+      - q (str): search words, matched against the search_terms index (also with get_all)
 
-    Only sellable vehicles are returned (not sold and no outstanding parts orders).
-    """
-    where_clauses = [
-        "NOT EXISTS (SELECT 1 FROM salestransactions s WHERE s.vehicleID = v.vehicleID)",
-    ]
-    
-    if not include_unready:
-        where_clauses.append("NOT EXISTS (SELECT 1 FROM partorders po JOIN parts p ON p.part_orderID = po.part_orderID WHERE po.vehicleID = v.vehicleID AND COALESCE(p.status,'') <> 'Installed')")
-
-    params: list = []
-
-    if filters:
-        # manufacturer filter
-        mid = filters.get('manufacturer_id')
-        if mid:
-            where_clauses.append('v.manufacturerID = %s')
-            params.append(mid)
-        # vehicle type filter
-        vt = filters.get('vehicle_type_id')
-        if vt:
-            where_clauses.append('v.vehicle_typeID = %s')
-            params.append(vt)
-        # model year filter (exact match)
-        my = filters.get('model_year')
-        if my:
-            where_clauses.append('v.model_year = %s')
-            params.append(my)
-        # fuel type filter
-        ft = filters.get('fuel_type')
-        if ft:
-            where_clauses.append('v.fuel_type = %s')
-            params.append(ft)
-        # color filter - allow either id or name
-        color_id = filters.get('color_id')
-        color_name = filters.get('color_name')
-        if color_id:
-            where_clauses.append('EXISTS (SELECT 1 FROM vehiclecolors vc WHERE vc.vehicleID = v.vehicleID AND vc.colorID = %s)')
-            params.append(color_id)
-        elif color_name:
-            where_clauses.append("EXISTS (SELECT 1 FROM vehiclecolors vc JOIN colors c ON vc.colorID = c.colorID WHERE vc.vehicleID = v.vehicleID AND c.color_name = %s)")
-            params.append(color_name)
-
-    where_sql = (' WHERE ' + ' AND '.join(where_clauses)) if where_clauses else ''
-
-    # Aggregate colors (concatenate multi-colors into a single field) and compute
-    # parts cost and sales price. Sales price = 140% of purchase price + 120% of parts cost.
-    # Use LEFT JOINs so vehicles without purchase records still appear (sales_price NULL).
-
-    if (get_all):
-        where_sql = ''
-    query = (
-        "SELECT v.vehicleID, v.vin, v.mileage, v.description, v.model_name, v.model_year, v.fuel_type, "
-        "v.manufacturerID, m.manufacturer_name, v.vehicle_typeID, vt.vehicle_type_name, "
-        "GROUP_CONCAT(DISTINCT c.color_name ORDER BY c.color_name SEPARATOR ', ') AS colors, "
-        "pt.purchase_price AS purchase_price, "
-        "COALESCE(SUM(p.cost * p.quantity), 0) AS parts_cost, "
-        "CASE WHEN pt.purchase_price IS NOT NULL THEN ROUND(1.4 * pt.purchase_price + 1.2 * COALESCE(SUM(p.cost * p.quantity),0), 2) ELSE NULL END AS sales_price "
-        "FROM vehicles v "
-        "LEFT JOIN manufacturers m ON v.manufacturerID = m.manufacturerID "
-        "LEFT JOIN vehicletypes vt ON v.vehicle_typeID = vt.vehicle_typeID "
-        "LEFT JOIN vehiclecolors vc ON vc.vehicleID = v.vehicleID "
-        "LEFT JOIN colors c ON vc.colorID = c.colorID "
-        "LEFT JOIN purchasetransactions pt ON pt.vehicleID = v.vehicleID "
-        "LEFT JOIN partorders po ON po.vehicleID = v.vehicleID "
-        "LEFT JOIN parts p ON p.part_orderID = po.part_orderID "
-        + where_sql +
-    " GROUP BY v.vehicleID, v.vin, v.mileage, v.description, v.model_name, v.model_year, v.fuel_type, v.manufacturerID, m.manufacturer_name, v.vehicle_typeID, vt.vehicle_type_name, pt.purchase_price "
-    "ORDER BY v.model_year DESC, m.manufacturer_name ASC;"
-    )
-
-    return execute_sql(query, tuple(params))
+    Only sellable vehicles are returned (not sold and no outstanding parts orders),
+    unless `get_all` is set; the filters apply either way.
 
+    Rows are ordered by `sort` (a VEHICLE_SORTS key). With `limit` set, at most that
+    many rows are returned, starting after (or, for a 'p' cursor, before) the
+    position encoded in `cursor`; see get_vehicles_page.
 
+    `fields` (VEHICLE_FIELDS names) selects only those columns instead of the
+    listing columns.
+    """
+    query, params, backwards = vehicles_query(filters, get_all, include_unready, sort, cursor, limit, fields)
+    rows = execute_sql(query, params)
+    return rows[::-1] if backwards else rows
+
+
+def vehicles_query(filters: dict | None = None, get_all = False, include_unready = False,
+                   sort: str = 'year', cursor: str | None = None, limit: int | None = None,
+                   fields: tuple | None = None) -> tuple[str, tuple, bool]:
+    """(sql, params, backwards) for get_vehicles; backwards results come in reverse display order."""
+    # colors, parts cost and sales price are precomputed per vehicle in vehicle_summary
+    columns = ', '.join(f"v.{f}" for f in fields) if fields else _SUMMARY_LISTING_COLUMNS
+    q = Select("vehicle_summary v").columns(columns)
+
+    terms = search.query_terms(filters.get('q')) if filters else []
+    if terms:
+        match_sql, match_params = search.match_query(terms)
+        q.columns("m.score AS search_score").join(f"JOIN ({match_sql}) m ON m.vehicleID = v.vehicleID", *match_params)
+    elif sort == 'relevance':
+        sort = 'year'
+
+    if not get_all:
+        # sold / readiness flags are maintained in vehicle_summary, so no correlated subqueries here
+        q.where("v.is_sold = 0")
+        if not include_unready:
+            q.where("v.pending_parts = 0")
+    for clause, params in compile_vehicle_filters(filters):
+        q.where(clause, *params)
+
+    sort = sort if sort in VEHICLE_SORTS else 'year'
+    sort_expr, direction, _ = VEHICLE_SORTS[sort]
+    position = decode_cursor(cursor) if cursor else None
+    backwards = bool(position) and position[0] == 'p'
+    if backwards:
+        # walk the index the other way, then flip the page back into display order
+        direction = 'ASC' if direction == 'DESC' else 'DESC'
+    if position:
+        # keyset predicate: (sort, vehicleID) strictly past the cursor in scan order
+        op = '<' if direction == 'DESC' else '>'
+        q.where(f"({sort_expr} {op} %s OR ({sort_expr} = %s AND v.vehicleID {op} %s))",
+                position[1], position[1], position[2])
+
+    q.order_by(f"{sort_expr} {direction}", f"v.vehicleID {direction}").limit(limit)
+    return (*q.build(), backwards)
+
+
+def get_vehicles_page(filters: dict | None = None, get_all = False, include_unready = False,
+                      sort: str = 'year', cursor: str | None = None, page_size: int = 25,
+                      fields: tuple | None = None):
+    """Return one page of get_vehicles as {'rows', 'next_cursor', 'prev_cursor', 'sort'}.
+
+    Pages are addressed by keyset cursors rather than OFFSET, so page 100 costs the
+    same as page 1. One extra row is fetched to learn whether another page exists.
+    """
+    sort = sort if sort in VEHICLE_SORTS else 'year'
+    if sort == 'relevance' and not search.query_terms((filters or {}).get('q')):
+        sort = 'year'
+    position = decode_cursor(cursor) if cursor else None
+    if not position:
+        cursor = None
+    if fields:
+        # the cursors need the vehicleID and sort value of the first and last rows
+        sort_field = VEHICLE_SORTS[sort][2]
+        fields = tuple(dict.fromkeys(('vehicleID', *fields) + ((sort_field,) if sort_field in VEHICLE_FIELDS else ())))
+    rows = get_vehicles(filters, get_all, include_unready, sort=sort, cursor=cursor, limit=page_size + 1, fields=fields)
+    backwards = bool(position) and position[0] == 'p'
+    more = len(rows) > page_size
+    if backwards:
+        # the surplus row sits at the front once the page is back in display order
+        rows = rows[1:] if more else rows
+        has_prev, has_next = more, True
+    else:
+        rows = rows[:page_size]
+        has_prev, has_next = position is not None, more
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        last = rows[-1]
+        next_cursor = encode_cursor('n', _sort_value(last, sort), last['vehicleID'])
+    if rows and has_prev:
+        first = rows[0]
+        prev_cursor = encode_cursor('p', _sort_value(first, sort), first['vehicleID'])
+    return {'rows': rows, 'next_cursor': next_cursor, 'prev_cursor': prev_cursor, 'sort': sort}
+
+
+def search_vehicles(q: str, get_all = False, include_unready = False, limit: int = 20):
+    """The best `limit` matches for `q` from the search index, highest score first."""
+    if not search.query_terms(q):
+        return []
+    return get_vehicles({'q': q}, get_all, include_unready, sort='relevance', limit=limit)
+
+
+@memoize
+@cached('lookups')
 def get_manufacturers():
     return execute_sql("SELECT * FROM manufacturers ORDER BY manufacturer_name;")
 
 
+@memoize
+@cached('lookups')
 def get_vehicle_types():
     return execute_sql("SELECT * FROM vehicletypes ORDER BY vehicle_type_name;")
 
 
+@memoize
+@cached('lookups')
+def get_vendors():
+    return execute_sql("SELECT vendorID, vendor_name FROM vendors ORDER BY vendor_name;")
+
+
+@memoize
+@cached('lookups')
 def get_colors():
     return execute_sql("SELECT * FROM colors ORDER BY color_name;")
 
 
-def get_sales_productivity():
-    """Sales Productivity: salesperson, number vehicles sold, total selling prices, avg sale price."""
-    query = (
-        "SELECT u.userID, CONCAT(u.first_name, ' ', u.last_name) AS salesperson, "
-        "COUNT(s.vehicleID) AS vehicles_sold, COALESCE(SUM(pt.purchase_price),0) AS total_sold_price, "
-        "CASE WHEN COUNT(s.vehicleID) > 0 THEN COALESCE(SUM(pt.purchase_price),0)/COUNT(s.vehicleID) ELSE NULL END AS avg_sale_price "
-        "FROM salestransactions s "
-        "JOIN users u ON s.userID = u.userID "
-        "LEFT JOIN purchasetransactions pt ON s.vehicleID = pt.vehicleID "
-        "GROUP BY u.userID, u.first_name, u.last_name "
-        "ORDER BY vehicles_sold DESC, total_sold_price DESC;"
-    )
-    return execute_sql(query)
-
+def _date_range(q: Select, column: str, start=None, end=None) -> Select:
+    """Restrict q to start <= column <= end (either bound may be None)."""
+    if start:
+        q.where(f"{column} >= %s", str(start))
+    if end:
+        q.where(f"{column} <= %s", str(end))
+    return q
 
-def get_seller_history():
-    """Seller History: sellers (customers) and number of vehicles sold to dealer and total paid."""
-    query = (
-        "SELECT c.customerID, CONCAT(c.first_name, ' ', c.last_name) AS seller_name, "
-        "COUNT(pt.vehicleID) AS vehicles_sold_to_dealer, COALESCE(SUM(pt.purchase_price),0) AS total_paid "
-        "FROM purchasetransactions pt "
-        "JOIN customers c ON pt.customerID = c.customerID "
-        "GROUP BY c.customerID, c.first_name, c.last_name "
-        "ORDER BY vehicles_sold_to_dealer DESC, total_paid ASC;"
-    )
-    return execute_sql(query)
 
+@memoize
+def get_sales_productivity(start=None, end=None):
+    """Sales Productivity: salesperson, number vehicles sold, total selling prices, avg sale price.
 
+    All of history comes from sales_rollup; a date range aggregates the sales in
+    range instead (sales_date is indexed).
+    """
+    if start is None and end is None:
+        query = (
+            "SELECT u.userID, CONCAT(u.first_name, ' ', u.last_name) AS salesperson, "
+            "r.vehicles_sold, r.total_sold_price, "
+            "CASE WHEN r.vehicles_sold > 0 THEN r.total_sold_price / r.vehicles_sold ELSE NULL END AS avg_sale_price "
+            "FROM sales_rollup r "
+            "JOIN users u ON r.userID = u.userID "
+            "ORDER BY r.vehicles_sold DESC, r.total_sold_price DESC;"
+        )
+        return execute_sql(query)
+    q = (Select("salestransactions s")
+         .columns("u.userID", "CONCAT(u.first_name, ' ', u.last_name) AS salesperson",
+                  "COUNT(s.vehicleID) AS vehicles_sold", "COALESCE(SUM(pt.purchase_price), 0) AS total_sold_price",
+                  "CASE WHEN COUNT(s.vehicleID) > 0 THEN COALESCE(SUM(pt.purchase_price), 0) / COUNT(s.vehicleID) "
+                  "ELSE NULL END AS avg_sale_price")
+         .join("JOIN users u ON s.userID = u.userID")
+         .join("LEFT JOIN purchasetransactions pt ON s.vehicleID = pt.vehicleID")
+         .group_by("u.userID", "u.first_name", "u.last_name")
+         .order_by("vehicles_sold DESC", "total_sold_price DESC"))
+    return execute_sql(*_date_range(q, "s.sales_date", start, end).build())
+
+
+@memoize
+def get_seller_history(start=None, end=None):
+    """Seller History: sellers (customers) and number of vehicles sold to dealer and total paid.
+
+    All of history comes from seller_rollup; a date range aggregates the purchases
+    in range instead (purchase_date is indexed).
+    """
+    if start is None and end is None:
+        query = (
+            "SELECT c.customerID, CONCAT(c.first_name, ' ', c.last_name) AS seller_name, "
+            "r.vehicles_sold_to_dealer, r.total_paid "
+            "FROM seller_rollup r "
+            "JOIN customers c ON r.customerID = c.customerID "
+            "ORDER BY r.vehicles_sold_to_dealer DESC, r.total_paid ASC;"
+        )
+        return execute_sql(query)
+    q = (Select("purchasetransactions pt")
+         .columns("c.customerID", "CONCAT(c.first_name, ' ', c.last_name) AS seller_name",
+                  "COUNT(pt.vehicleID) AS vehicles_sold_to_dealer", "COALESCE(SUM(pt.purchase_price), 0) AS total_paid")
+         .join("JOIN customers c ON pt.customerID = c.customerID")
+         .group_by("c.customerID", "c.first_name", "c.last_name")
+         .order_by("vehicles_sold_to_dealer DESC", "total_paid ASC"))
+    return execute_sql(*_date_range(q, "pt.purchase_date", start, end).build())
+
+
+@memoize
 def get_part_statistics():
     """Part statistics per vendor: total parts purchased (sum quantity), total spent, avg cost per unit."""
     query = (
-        "SELECT v.vendorID, v.vendor_name, COALESCE(SUM(p.quantity),0) AS parts_purchased, "
-        "COALESCE(SUM(p.cost * p.quantity),0.00) AS total_spent, "
-        "CASE WHEN SUM(p.quantity) > 0 THEN SUM(p.cost * p.quantity)/SUM(p.quantity) ELSE NULL END AS avg_cost_per_part "
-        "FROM partorders po "
-        "JOIN vendors v ON po.vendorID = v.vendorID "
-        "JOIN parts p ON p.part_orderID = po.part_orderID "
-        "GROUP BY v.vendorID, v.vendor_name "
-        "ORDER BY parts_purchased DESC;"
+        "SELECT v.vendorID, v.vendor_name, r.parts_purchased, r.total_spent, "
+        "CASE WHEN r.parts_purchased > 0 THEN r.total_spent / r.parts_purchased ELSE NULL END AS avg_cost_per_part "
+        "FROM vendor_rollup r "
+        "JOIN vendors v ON r.vendorID = v.vendorID "
+        "ORDER BY r.parts_purchased DESC;"
     )
     return execute_sql(query)
 
 
+# Row-level detail for the report exports: dataset -> (query factory, date column
+# or None, order). Each is ordered by an indexed column so rows stream without a sort.
+EXPORTS = {
+    'sales': (lambda: Select("salestransactions st")
+              .columns("st.sales_transactionID", "st.sales_date", "st.vehicleID", "vs.vin", "vs.model_year",
+                       "vs.manufacturer_name", "vs.model_name", "vs.purchase_price", "vs.parts_cost",
+                       "vs.sales_price", "u.username AS salesperson", "c.customerID",
+                       "CONCAT(c.first_name, ' ', c.last_name) AS customer_name", "c.business_name")
+              .join("JOIN vehicle_summary vs ON vs.vehicleID = st.vehicleID")
+              .join("JOIN users u ON u.userID = st.userID")
+              .join("JOIN customers c ON c.customerID = st.customerID"),
+              "st.sales_date", ("st.sales_date", "st.sales_transactionID")),
+    'purchases': (lambda: Select("purchasetransactions pt")
+                  .columns("pt.purchase_transactionID", "pt.purchase_date", "pt.vehicleID", "vs.vin",
+                           "vs.model_year", "vs.manufacturer_name", "vs.model_name", "pt.vehicle_condition",
+                           "pt.purchase_price", "u.username AS buyer", "c.customerID",
+                           "CONCAT(c.first_name, ' ', c.last_name) AS seller_name", "c.business_name")
+                  .join("JOIN vehicle_summary vs ON vs.vehicleID = pt.vehicleID")
+                  .join("JOIN users u ON u.userID = pt.userID")
+                  .join("JOIN customers c ON c.customerID = pt.customerID"),
+                  "pt.purchase_date", ("pt.purchase_date", "pt.purchase_transactionID")),
+    'parts': (lambda: Select("parts p")
+              .columns("p.partID", "po.part_orderID", "po.order_number", "po.vehicleID", "v.vendor_name",
+                       "p.part_number", "p.description", "p.quantity", "p.cost", "p.status")
+              .join("JOIN partorders po ON po.part_orderID = p.part_orderID")
+              .join("JOIN vendors v ON v.vendorID = po.vendorID"),
+              None, ("p.partID",)),
+}
+
+
+def export_query(dataset: str, start=None, end=None) -> tuple[str, tuple]:
+    """(sql, params) for an export; parts have no date and ignore the range."""
+    select, date_column, order = EXPORTS[dataset]
+    q = select()
+    if date_column:
+        _date_range(q, date_column, start, end)
+    return q.order_by(*order).build()
+
+
+def stream_sql(query: str, params: tuple = (), chunk_size: int = 1000, label: str = 'stream_sql'):
+    """Run a read on its own pooled connection and yield the column names, then
+    lists of up to chunk_size row tuples.
+
+    On MySQL the cursor is unbuffered, so the server streams rows as they are
+    fetched and memory stays at one chunk however large the result. Not part of
+    the request transaction: a streamed response outlives the request context.
+    A stream closed before the end discards its connection (the unread rest of
+    the result would otherwise block it). Served by a read replica if there is one.
+    """
+    conn = get_read_connection()
+    finished = False
+    try:
+        with metrics.timed_query('stream', query, function=label) as timer:
+            cursor = conn.cursor(buffered=False) if dialect() == 'mysql' else conn.cursor()
+            cursor.execute(query, params)
+            yield [d[0] for d in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                timer.rows += len(rows)
+                yield rows
+            cursor.close()
+            finished = True
+    finally:
+        if finished:
+            conn.close()
+        else:
+            conn.discard()
+
+
+@memoize
 def get_vehicle_parts(vehicle_id: int):
     """Return all parts ordered for a specific vehicle."""
     query = (
@@ -272,41 +684,331 @@ def get_vehicle_parts(vehicle_id: int):
     )
     return execute_sql(query, (vehicle_id,))
 
-def get_vehicle_transactions(vehicle_id: int):
-    """Return seller (purchase tx) and buyer (sales tx) info for a vehicle."""
-    # Seller info (who we bought it from)
-    seller_query = (
+@memoize
+def get_vehicle_seller(vehicle_id: int):
+    """The customer we bought the vehicle from, with the purchase date and price."""
+    query = (
         "SELECT c.first_name, c.last_name, c.email_address, c.phone_number, c.street, c.city, c.state, c.postal_code, pt.purchase_date, pt.purchase_price "
         "FROM purchasetransactions pt "
         "JOIN customers c ON pt.customerID = c.customerID "
         "WHERE pt.vehicleID = %s"
     )
-    seller = execute_sql(seller_query, (vehicle_id,))
-    
-    # Buyer info (who we sold it to)
-    buyer_query = (
+    rows = execute_sql(query, (vehicle_id,))
+    return rows[0] if rows else None
+
+
+@memoize
+def get_vehicle_buyer(vehicle_id: int):
+    """The customer we sold the vehicle to, with the sales date."""
+    query = (
         "SELECT c.first_name, c.last_name, c.email_address, c.phone_number, c.street, c.city, c.state, c.postal_code, st.sales_date "
         "FROM salestransactions st "
         "JOIN customers c ON st.customerID = c.customerID "
         "WHERE st.vehicleID = %s"
     )
-    buyer = execute_sql(buyer_query, (vehicle_id,))
-    
-    return {
-        'seller': seller[0] if seller else None,
-        'buyer': buyer[0] if buyer else None
-    }
+    rows = execute_sql(query, (vehicle_id,))
+    return rows[0] if rows else None
+
+
+@memoize
+def get_vehicle_transactions(vehicle_id: int):
+    """Return seller (purchase tx) and buyer (sales tx) info for a vehicle."""
+    seller, buyer = gather((get_vehicle_seller, vehicle_id), (get_vehicle_buyer, vehicle_id))
+    return {'seller': seller, 'buyer': buyer}
 
 def update_part_status(part_id: int, status: str):
     query = "UPDATE parts SET status = %s WHERE partID = %s"
-    return execute_write(query, (status, part_id))
+    result = execute_write(query, (status, part_id))
+    # installing the last outstanding part makes the vehicle sellable
+    rows = execute_sql("SELECT po.vehicleID FROM parts p JOIN partorders po ON p.part_orderID = po.part_orderID WHERE p.partID = %s", (part_id,))
+    refresh_vehicle_summary(*[r['vehicleID'] for r in rows])
+    return result
+
+
+# status -> the statuses a part may move to it from (parts only move forward)
+PART_STATUS_MOVES = {'Received': ('Ordered',), 'Installed': ('Ordered', 'Received')}
 
 
+def set_parts_status(part_ids, status: str) -> dict:
+    """Move several parts to `status` ('Received' or 'Installed') with one UPDATE, in one transaction.
+
+    Parts already at or past `status` are left alone. Returns
+    {'updated': [partIDs changed], 'missing': [partIDs not found], 'parts': [the parts, as now],
+     'vehicles': [{'vehicleID', 'pending_parts', 'is_sold', 'sellable', 'became_sellable'}]},
+    where sellable is the get_vehicles readiness rule: unsold with no part left to install.
+    """
+    ids = sorted({int(p) for p in part_ids})
+    if not ids:
+        return {'updated': [], 'missing': [], 'parts': [], 'vehicles': []}
+    ids_sql, ids_params = in_list("p.partID", ids)
+    with transaction(write=True) as conn:
+        before = _query_on(conn, "SELECT p.partID, p.status, po.vehicleID FROM parts p "
+                                 f"JOIN partorders po ON po.part_orderID = p.part_orderID WHERE {ids_sql}", ids_params)
+        vehicle_ids = sorted({r['vehicleID'] for r in before})
+        movable = [r['partID'] for r in before if r['status'] in PART_STATUS_MOVES[status]]
+        was_sellable = {v['vehicleID']: _sellable(v) for v in _vehicle_states_on(conn, vehicle_ids)}
+        if movable:
+            move_sql, move_params = in_list("partID", movable)
+            from_sql, from_params = in_list("status", PART_STATUS_MOVES[status])
+            _execute_on(conn, f"UPDATE parts SET status = %s WHERE {move_sql} AND {from_sql}",
+                        (status, *move_params, *from_params))
+            _refresh_summary_on(conn, vehicle_ids)
+        parts = _query_on(conn, "SELECT p.partID, p.part_number, p.description, p.status, po.vehicleID FROM parts p "
+                                f"JOIN partorders po ON po.part_orderID = p.part_orderID WHERE {ids_sql} "
+                                "ORDER BY p.partID", ids_params)
+        vehicles = _vehicle_states_on(conn, vehicle_ids)
+    forget_request_memo()
+    for v in vehicles:
+        v['sellable'] = _sellable(v)
+        v['became_sellable'] = v['sellable'] and not was_sellable.get(v['vehicleID'], False)
+    found = {r['partID'] for r in before}
+    return {'updated': movable, 'missing': [p for p in ids if p not in found], 'parts': parts, 'vehicles': vehicles}
+
+
+def _vehicle_states_on(conn, vehicle_ids: list[int]) -> list[dict]:
+    if not vehicle_ids:
+        return []
+    sql, params = in_list("vehicleID", vehicle_ids)
+    return _query_on(conn, f"SELECT vehicleID, pending_parts, is_sold FROM vehicle_summary WHERE {sql} "
+                           "ORDER BY vehicleID", params)
+
+
+def _sellable(state: dict) -> bool:
+    # the get_vehicles listing rule: is_sold = 0 AND pending_parts = 0
+    return not state['is_sold'] and state['pending_parts'] == 0
+
+
+@memoize
 def get_customers():
     return execute_sql("SELECT * FROM customers ORDER BY last_name, first_name;")
 
 
+# what the customer pickers show; never the ID number
+_CUSTOMER_PICKER_COLUMNS = "c.customerID, c.first_name, c.last_name, c.business_name, c.email_address, c.phone_number, c.city, c.state"
+
+
+def search_customers(q: str, limit: int = 10):
+    """Customers matching every word of `q` by prefix (names, email, ID number, phone digits), best first."""
+    terms = search.customer_query_terms(q)
+    if not terms:
+        return []
+    match_sql, match_params = search.match_query(terms, 'customer_terms', 'customerID')
+    query, params = (Select("customers c")
+                     .columns(_CUSTOMER_PICKER_COLUMNS)
+                     .join(f"JOIN ({match_sql}) m ON m.customerID = c.customerID", *match_params)
+                     .order_by("m.score DESC", "c.last_name", "c.first_name", "c.customerID")
+                     .limit(limit)
+                     .build())
+    return execute_sql(query, params)
+
+
+@memoize
+def get_customer(customer_id: int):
+    rows = execute_sql(f"SELECT {_CUSTOMER_PICKER_COLUMNS} FROM customers c WHERE c.customerID = %s", (customer_id,))
+    return rows[0] if rows else None
+
+
 def add_customer(first_name, last_name, email, phone, street, city, state, zip_code, id_number):
     query = "INSERT INTO customers (first_name, last_name, email_address, phone_number, street, city, state, postal_code, id_number) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"
-    return execute_write(query, (first_name, last_name, email, phone, street, city, state, zip_code, id_number))
-
+    cid = execute_write(query, (first_name, last_name, email, phone, street, city, state, zip_code, id_number))
+    reindex_customers(cid)
+    return cid
+
+
+def reindex_customers(*customer_ids: int):
+    """Rebuild the customer_terms of the given customers."""
+    ids = sorted({int(c) for c in customer_ids if c is not None})
+    if not ids:
+        return
+    marks = ', '.join(['%s'] * len(ids))
+    rows = execute_sql(f"SELECT {', '.join(search.CUSTOMER_COLUMNS)} FROM customers WHERE customerID IN ({marks})",
+                       tuple(ids))
+    execute_write(f"DELETE FROM customer_terms WHERE customerID IN ({marks})", tuple(ids))
+    entries = search.customer_index_rows(rows)
+    if entries:
+        values = ', '.join(['(%s, %s, %s)'] * len(entries))
+        execute_write(f"INSERT INTO customer_terms (customerID, term, weight) VALUES {values}",
+                      tuple(v for entry in entries for v in entry))
+
+
+def insert_sales_transaction(vehicle_id: int, user_id: int, customer_id: int, sales_date: str):
+    query = "INSERT INTO salestransactions (vehicleID, userID, customerID, sales_date) VALUES (%s, %s, %s, %s)"
+    tid = execute_write(query, (vehicle_id, user_id, customer_id, sales_date))
+    price = execute_sql("SELECT purchase_price FROM purchasetransactions WHERE vehicleID = %s", (vehicle_id,))
+    bump_rollup('sales_rollup', user_id, vehicles_sold=1, total_sold_price=price[0]['purchase_price'] if price else 0)
+    refresh_vehicle_summary(vehicle_id)
+    return tid
+
+
+def insert_purchase_transaction(vehicle_id: int, user_id: int, customer_id: int, purchase_price: float, condition: str | None):
+    query = "INSERT INTO purchasetransactions (vehicleID, userID, customerID, purchase_price, purchase_date, vehicle_condition) VALUES (%s, %s, %s, %s, CURRENT_DATE(), %s)"
+    tid = execute_write(query, (vehicle_id, user_id, customer_id, purchase_price, condition))
+    bump_rollup('seller_rollup', customer_id, vehicles_sold_to_dealer=1, total_paid=purchase_price)
+    # the sales report totals the purchase price of sold vehicles
+    execute_write(
+        "UPDATE sales_rollup SET total_sold_price = total_sold_price + %s "
+        "WHERE userID IN (SELECT userID FROM salestransactions WHERE vehicleID = %s)",
+        (purchase_price, vehicle_id),
+    )
+    refresh_vehicle_summary(vehicle_id)
+    return tid
+
+
+def set_vehicle_colors(vehicle_id: int, color_ids: list[int]):
+    """Replace a vehicle's colors."""
+    execute_write("DELETE FROM vehiclecolors WHERE vehicleID = %s", (vehicle_id,))
+    for color_id in color_ids:
+        execute_write("INSERT INTO vehiclecolors (vehicleID, colorID) VALUES (%s, %s)", (vehicle_id, color_id))
+    refresh_vehicle_summary(vehicle_id)
+    reindex_vehicles(vehicle_id)
+
+
+# ---------------------------------------------------------------------------
+# vehicle_summary: one row per vehicle with the derived listing columns
+# (colors, parts cost, sales price, sold / pending-parts flags). Kept current by
+# the write functions above via refresh_vehicle_summary, inside the same
+# transaction as the write. The table is created by migrations.py;
+# rebuild/check it from the command line with summary.py.
+# ---------------------------------------------------------------------------
+
+def refresh_vehicle_summary(*vehicle_ids: int):
+    """Recompute the vehicle_summary rows of the given vehicles from the live tables."""
+    ids = sorted({int(v) for v in vehicle_ids if v is not None})
+    if not ids:
+        return
+    with transaction(write=True) as conn:
+        _refresh_summary_on(conn, ids)
+    forget_request_memo()
+
+
+def _refresh_summary_on(conn, ids: list[int]):
+    marks = ', '.join(['%s'] * len(ids))
+    _execute_on(conn, f"DELETE FROM vehicle_summary WHERE vehicleID IN ({marks})", tuple(ids))
+    sql, params = vehicle_aggregate(ids, dialect=dialect()).build()
+    _execute_on(conn, f"INSERT INTO vehicle_summary ({', '.join(VEHICLE_SUMMARY_COLUMNS)}) " + sql, params)
+
+
+def reindex_vehicles(*vehicle_ids: int):
+    """Rebuild the search_terms of the given vehicles from their vehicle_summary rows."""
+    ids = sorted({int(v) for v in vehicle_ids if v is not None})
+    if not ids:
+        return
+    with transaction(write=True) as conn:
+        _reindex_vehicles_on(conn, ids)
+    forget_request_memo()
+
+
+def _reindex_vehicles_on(conn, ids: list[int]):
+    marks = ', '.join(['%s'] * len(ids))
+    rows = _query_on(conn, f"SELECT {', '.join(search.SOURCE_COLUMNS)} FROM vehicle_summary "
+                           f"WHERE vehicleID IN ({marks})", tuple(ids))
+    _execute_on(conn, f"DELETE FROM search_terms WHERE vehicleID IN ({marks})", tuple(ids))
+    entries = search.index_rows(rows)
+    if entries:
+        _execute_on(conn, "INSERT INTO search_terms (vehicleID, term, weight) VALUES (%s, %s, %s)", entries, many=True)
+
+
+def rebuild_vehicle_summary() -> int:
+    """Repopulate vehicle_summary for every vehicle in one transaction; returns the row count."""
+    sql, params = vehicle_aggregate(dialect=dialect()).build()
+    with transaction(write=True) as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM vehicle_summary")
+        cur.execute(f"INSERT INTO vehicle_summary ({', '.join(VEHICLE_SUMMARY_COLUMNS)}) " + sql, params)
+        cur.execute("SELECT COUNT(*) FROM vehicle_summary")
+        count = cur.fetchone()[0]
+        cur.close()
+        touch_tables(conn, 'vehicle_summary')
+    return count
+
+
+def check_vehicle_summary() -> list[dict]:
+    """Compare vehicle_summary with the live aggregate.
+
+    Returns one {'vehicleID', 'column', 'summary', 'live'} entry per differing value;
+    missing or extra rows are reported with column '*'.
+    """
+    # both reads on one primary connection, so they see the same data
+    with on_primary(), transaction() as conn:
+        live = {r['vehicleID']: r for r in _query_on(conn, *vehicle_aggregate(dialect=dialect()).build())}
+        stored = {r['vehicleID']: r for r in _query_on(conn, f"SELECT {', '.join(VEHICLE_SUMMARY_COLUMNS)} FROM vehicle_summary")}
+    problems = []
+    for vid in sorted(live.keys() | stored.keys()):
+        if vid not in stored or vid not in live:
+            problems.append({'vehicleID': vid, 'column': '*', 'summary': stored.get(vid), 'live': live.get(vid)})
+            continue
+        for col in VEHICLE_SUMMARY_COLUMNS:
+            a, b = stored[vid][col], live[vid][col]
+            if a == b:
+                continue
+            try:
+                if a is not None and b is not None and abs(float(a) - float(b)) < 0.005:
+                    continue
+            except (TypeError, ValueError):
+                pass
+            problems.append({'vehicleID': vid, 'column': col, 'summary': a, 'live': b})
+    return problems
+
+
+# --- report rollups (see migrations.REPORT_ROLLUPS) ---
+
+def bump_rollup(table: str, key_value: int, **deltas):
+    """Add `deltas` to one rollup row, creating it if needed, in the current transaction."""
+    with transaction(write=True) as conn:
+        _bump_rollups_on(conn, table, {key_value: deltas})
+    forget_request_memo()
+
+
+def _bump_rollups_on(conn, table: str, deltas_by_key: dict):
+    """bump_rollup for several rows at once: {key value: {column: delta}}, same columns for each."""
+    if not deltas_by_key:
+        return
+    key = REPORT_ROLLUPS[table][0]
+    columns = list(next(iter(deltas_by_key.values())))
+    if dialect() == 'sqlite':
+        conflict = "ON CONFLICT(" + key + ") DO UPDATE SET " + ', '.join(f"{c} = {c} + excluded.{c}" for c in columns)
+    else:
+        conflict = "ON DUPLICATE KEY UPDATE " + ', '.join(f"{c} = {c} + VALUES({c})" for c in columns)
+    marks = ', '.join(['%s'] * (len(columns) + 1))
+    rows = [(k, *(deltas[c] for c in columns)) for k, deltas in sorted(deltas_by_key.items())]  # fixed lock order
+    _execute_on(conn, f"INSERT INTO {table} ({key}, {', '.join(columns)}) VALUES ({marks}) {conflict}", rows, many=True)
+
+
+def rebuild_report_rollups() -> dict:
+    """Recompute every rollup table from the live tables in one transaction; returns row counts."""
+    counts = {}
+    with transaction(write=True) as conn:
+        cur = conn.cursor()
+        for table, (key, columns, live) in REPORT_ROLLUPS.items():
+            cur.execute(f"DELETE FROM {table}")
+            cur.execute(f"INSERT INTO {table} ({key}, {', '.join(columns)}) " + live)
+            cur.execute(f"SELECT COUNT(*) FROM {table}")
+            counts[table] = cur.fetchone()[0]
+        cur.close()
+        touch_tables(conn, *REPORT_ROLLUPS)
+    return counts
+
+
+def check_report_rollups() -> list[dict]:
+    """Compare the rollup tables with their live aggregates.
+
+    Returns one {'table', 'key', 'column', 'rollup', 'live'} entry per differing value;
+    missing or extra groups are reported with column '*'.
+    """
+    problems = []
+    # every read on one primary connection, so the rollups and aggregates see the same data
+    with on_primary(), transaction() as conn:
+        tables = [(table, key, columns,
+                   {r[0]: r[1:] for r in (tuple(row.values()) for row in _query_on(conn, live))},
+                   {r[key]: tuple(r[c] for c in columns)
+                    for r in _query_on(conn, f"SELECT {key}, {', '.join(columns)} FROM {table}")})
+                  for table, (key, columns, live) in REPORT_ROLLUPS.items()]
+    for table, key, columns, live_rows, stored in tables:
+        for k in sorted(live_rows.keys() | stored.keys()):
+            if k not in live_rows or k not in stored:
+                problems.append({'table': table, 'key': k, 'column': '*', 'rollup': stored.get(k), 'live': live_rows.get(k)})
+                continue
+            for col, a, b in zip(columns, stored[k], live_rows[k]):
+                if a != b and abs(float(a or 0) - float(b or 0)) >= 0.005:
+                    problems.append({'table': table, 'key': k, 'column': col, 'rollup': a, 'live': b})
+    return problems
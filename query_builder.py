@@ -0,0 +1,181 @@
+"""Small SQL builder for the vehicle queries.
+
+Two jobs:
+
+- vehicle_aggregate() builds the per-vehicle aggregate (colors, parts cost, sales
+  price, sold / pending-parts flags) without join fan-out: colors and parts are
+  aggregated in their own derived tables keyed by vehicleID and only then joined
+  to vehicles, so a two-color vehicle no longer counts each part twice.
+- compile_vehicle_filters() turns the /cars filter dict into sargable predicates
+  (plain equality on indexed columns, EXISTS on the vehiclecolors key).
+
+Everything is emitted with %s placeholders; `dialect` only changes the few
+constructs that differ between MySQL and SQLite (GROUP_CONCAT).
+"""
+
+
+class Select:
+    """Minimal SELECT builder: collects clauses and their parameters in order."""
+
+    def __init__(self, source: str, *params):
+        self._columns: list[str] = []
+        self._from = source
+        self._from_params = list(params)
+        self._joins: list[tuple[str, list]] = []
+        self._where: list[tuple[str, list]] = []
+        self._group_by: list[str] = []
+        self._order_by: list[str] = []
+        self._limit: int | None = None
+
+    def columns(self, *columns: str) -> 'Select':
+        self._columns.extend(columns)
+        return self
+
+    def join(self, clause: str, *params) -> 'Select':
+        self._joins.append((clause, list(params)))
+        return self
+
+    def where(self, clause: str, *params) -> 'Select':
+        self._where.append((clause, list(params)))
+        return self
+
+    def group_by(self, *columns: str) -> 'Select':
+        self._group_by.extend(columns)
+        return self
+
+    def order_by(self, *terms: str) -> 'Select':
+        self._order_by.extend(terms)
+        return self
+
+    def limit(self, n: int | None) -> 'Select':
+        self._limit = int(n) if n else None
+        return self
+
+    def build(self) -> tuple[str, tuple]:
+        params = list(self._from_params)
+        sql = f"SELECT {', '.join(self._columns) or '*'} FROM {self._from}"
+        for clause, p in self._joins:
+            sql += f" {clause}"
+            params.extend(p)
+        if self._where:
+            sql += " WHERE " + " AND ".join(clause for clause, _ in self._where)
+            for _, p in self._where:
+                params.extend(p)
+        if self._group_by:
+            sql += " GROUP BY " + ", ".join(self._group_by)
+        if self._order_by:
+            sql += " ORDER BY " + ", ".join(self._order_by)
+        if self._limit:
+            sql += f" LIMIT {self._limit}"
+        return sql, tuple(params)
+
+
+def in_list(column: str, values) -> tuple[str, tuple]:
+    values = tuple(values)
+    return f"{column} IN ({', '.join(['%s'] * len(values))})", values
+
+
+def _colors_derived(scope: tuple | None, dialect: str) -> tuple[str, tuple]:
+    """vehicleID -> 'Blue, Red' (alphabetical), one row per vehicle."""
+    scope_sql, scope_params = in_list("vc.vehicleID", scope) if scope else ('', ())
+    where = f" WHERE {scope_sql}" if scope else ''
+    if dialect == 'sqlite':
+        # SQLite has no ORDER BY / SEPARATOR inside GROUP_CONCAT: order the input instead
+        sql = (
+            "(SELECT x.vehicleID, GROUP_CONCAT(x.color_name, ', ') AS colors FROM ("
+            "SELECT vc.vehicleID, c.color_name FROM vehiclecolors vc JOIN colors c ON c.colorID = vc.colorID"
+            f"{where} ORDER BY vc.vehicleID, c.color_name) x GROUP BY x.vehicleID)"
+        )
+    else:
+        sql = (
+            "(SELECT vc.vehicleID, GROUP_CONCAT(c.color_name ORDER BY c.color_name SEPARATOR ', ') AS colors "
+            f"FROM vehiclecolors vc JOIN colors c ON c.colorID = vc.colorID{where} GROUP BY vc.vehicleID)"
+        )
+    return sql, scope_params
+
+
+def _parts_derived(scope: tuple | None) -> tuple[str, tuple]:
+    """vehicleID -> parts_cost, pending_parts (parts not yet installed)."""
+    scope_sql, scope_params = in_list("po.vehicleID", scope) if scope else ('', ())
+    where = f" WHERE {scope_sql}" if scope else ''
+    sql = (
+        "(SELECT po.vehicleID, SUM(p.cost * p.quantity) AS parts_cost, "
+        "SUM(CASE WHEN COALESCE(p.status,'') <> 'Installed' THEN 1 ELSE 0 END) AS pending_parts "
+        f"FROM partorders po JOIN parts p ON p.part_orderID = po.part_orderID{where} GROUP BY po.vehicleID)"
+    )
+    return sql, scope_params
+
+
+# price_sort of a vehicle without a purchase price, so it sorts after every real price
+UNPRICED = 99999999.99
+
+
+def vehicle_aggregate(vehicle_ids=None, dialect: str = 'mysql') -> Select:
+    """Per-vehicle aggregate with the vehicle_summary columns, one row per vehicle.
+
+    Pass `vehicle_ids` to restrict it (the restriction is pushed into the derived
+    tables too, so refreshing one vehicle reads only that vehicle's rows).
+    """
+    scope = tuple(vehicle_ids) if vehicle_ids is not None else None
+    colors_sql, colors_params = _colors_derived(scope, dialect)
+    parts_sql, parts_params = _parts_derived(scope)
+    q = (
+        Select("vehicles v")
+        .columns(
+            "v.vehicleID", "v.vin", "v.mileage", "v.description", "v.model_name", "v.model_year", "v.fuel_type",
+            "v.manufacturerID", "m.manufacturer_name", "v.vehicle_typeID", "vt.vehicle_type_name",
+            "vcol.colors",
+            "pt.purchase_price",
+            "COALESCE(vp.parts_cost, 0) AS parts_cost",
+            # Sales price = 140% of purchase price + 120% of parts cost
+            "CASE WHEN pt.purchase_price IS NOT NULL THEN ROUND(1.4 * pt.purchase_price + 1.2 * COALESCE(vp.parts_cost, 0), 2) ELSE NULL END AS sales_price",
+            "CASE WHEN st.vehicleID IS NOT NULL THEN 1 ELSE 0 END AS is_sold",
+            "COALESCE(vp.pending_parts, 0) AS pending_parts",
+            # non-null copy of sales_price for the indexed price sort (unpriced vehicles last)
+            f"CASE WHEN pt.purchase_price IS NOT NULL THEN ROUND(1.4 * pt.purchase_price + 1.2 * COALESCE(vp.parts_cost, 0), 2) ELSE {UNPRICED} END AS price_sort",
+        )
+        .join("LEFT JOIN manufacturers m ON m.manufacturerID = v.manufacturerID")
+        .join("LEFT JOIN vehicletypes vt ON vt.vehicle_typeID = v.vehicle_typeID")
+        .join(f"LEFT JOIN {colors_sql} vcol ON vcol.vehicleID = v.vehicleID", *colors_params)
+        .join(f"LEFT JOIN {parts_sql} vp ON vp.vehicleID = v.vehicleID", *parts_params)
+        # both are unique per vehicle (UC_PurchaseTransaction / UC_SalesTransaction), so no fan-out
+        .join("LEFT JOIN purchasetransactions pt ON pt.vehicleID = v.vehicleID")
+        .join("LEFT JOIN salestransactions st ON st.vehicleID = v.vehicleID")
+    )
+    if scope is not None:
+        scope_sql, scope_params = in_list("v.vehicleID", scope)
+        q.where(scope_sql, *scope_params)
+    return q
+
+
+def compile_vehicle_filters(filters: dict | None, alias: str = 'v') -> list[tuple[str, tuple]]:
+    """Compile the /cars filter dict into (predicate, params) pairs.
+
+    Understood keys: manufacturer_id, vehicle_type_id, model_year, fuel_type,
+    color_id or color_name. Empty values are ignored.
+    """
+    if not filters:
+        return []
+    compiled = []
+    for key, column in (
+        ('manufacturer_id', 'manufacturerID'),
+        ('vehicle_type_id', 'vehicle_typeID'),
+        ('model_year', 'model_year'),
+        ('fuel_type', 'fuel_type'),
+    ):
+        value = filters.get(key)
+        if value:
+            compiled.append((f"{alias}.{column} = %s", (value,)))
+    # color filter - allow either id or name; both probe the (vehicleID, colorID) key
+    if filters.get('color_id'):
+        compiled.append((
+            f"EXISTS (SELECT 1 FROM vehiclecolors vc WHERE vc.vehicleID = {alias}.vehicleID AND vc.colorID = %s)",
+            (filters['color_id'],),
+        ))
+    elif filters.get('color_name'):
+        compiled.append((
+            f"EXISTS (SELECT 1 FROM vehiclecolors vc WHERE vc.vehicleID = {alias}.vehicleID "
+            "AND vc.colorID = (SELECT c.colorID FROM colors c WHERE c.color_name = %s))",
+            (filters['color_name'],),
+        ))
+    return compiled
@@ -1,6 +1,6 @@
-from jinja2 import Template
+from templating import string_template
 
-register_template = Template("""
+register_template = string_template('register', """
 <section class="section">
     <div class="container">
         <div class="columns is-centered">
@@ -0,0 +1,36 @@
+"""Maintain the report rollup tables (sales_rollup, seller_rollup, vendor_rollup).
+
+    python rollups.py rebuild   # recompute from the live tables
+    python rollups.py check     # compare against the live aggregates
+
+The tables are created by migrations.py and kept current by the write path in
+queries.py (sales, purchases and parts inserts).
+"""
+import argparse
+import sys
+
+from queries import check_report_rollups, rebuild_report_rollups
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    args = parser.parse_args(argv)
+
+    if args.command == 'rebuild':
+        counts = rebuild_report_rollups()
+        print("✅ rollups rebuilt: " + ', '.join(f"{table} {n} rows" for table, n in counts.items()))
+        return 0
+
+    problems = check_report_rollups()
+    for p in problems[:50]:
+        print(f"{p['table']} {p['key']}: {p['column']} rollup={p['rollup']!r} live={p['live']!r}")
+    if problems:
+        print(f"❌ {len(problems)} differences between the rollups and the live aggregates")
+        return 1
+    print("✅ rollups match the live aggregates")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Inverted index for vehicle search (the `search_terms` table).
+
+Each vehicle is indexed from its vehicle_summary row: every word of the model
+name, manufacturer, vehicle type, colors, model year and description becomes a
+(term, vehicleID, weight) row, the weight adding up the fields the word appears
+in. The whole VIN is one more term, so VINs are found by prefix.
+
+A query matches vehicles that have every query word as a term or as the prefix
+of one ("cam" finds Camry). Each word is a range scan on the (term, vehicleID)
+primary key, never a LIKE '%...%' over the vehicles; exact words score double.
+
+Customers have the same kind of index in `customer_terms` (names, email, ID
+number and the phone number's digits) for the typeahead on the sell forms.
+
+Pure functions only: queries.py keeps the indexes current and runs the searches,
+migrations.py builds them for existing data.
+"""
+import re
+
+FIELD_WEIGHTS = {
+    'model_name': 8,
+    'manufacturer_name': 6,
+    'vehicle_type_name': 4,
+    'colors': 3,
+    'model_year': 3,
+    'description': 1,
+}
+VIN_WEIGHT = 10
+SOURCE_COLUMNS = ['vehicleID', 'vin'] + list(FIELD_WEIGHTS)
+CUSTOMER_WEIGHTS = {
+    'last_name': 4,
+    'first_name': 3,
+    'id_number': 2,
+    'email_address': 1,
+}
+PHONE_WEIGHT = 2
+CUSTOMER_COLUMNS = ['customerID', 'phone_number'] + list(CUSTOMER_WEIGHTS)
+MAX_TERM = 64
+MAX_QUERY_TERMS = 6
+MIN_PREFIX = 2  # shorter words only match whole terms
+
+_WORD = re.compile(r"[a-z0-9]+")
+_PHONE = re.compile(r"[\d\s()+.-]*\d[\d\s()+.-]*")
+
+
+def tokens(text) -> list[str]:
+    return [t[:MAX_TERM] for t in _WORD.findall(str(text).lower())] if text is not None else []
+
+
+def vehicle_terms(row: dict) -> dict[str, int]:
+    """{term: weight} for one vehicle_summary row."""
+    terms: dict[str, int] = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for term in set(tokens(row.get(field))):
+            terms[term] = terms.get(term, 0) + weight
+    vin = ''.join(tokens(row.get('vin')))
+    if vin:
+        terms[vin] = terms.get(vin, 0) + VIN_WEIGHT
+    return terms
+
+
+def index_rows(rows) -> list[tuple[int, str, int]]:
+    """(vehicleID, term, weight) rows for search_terms."""
+    return [(row['vehicleID'], term, weight) for row in rows for term, weight in vehicle_terms(row).items()]
+
+
+def customer_terms(row: dict) -> dict[str, int]:
+    """{term: weight} for one customers row."""
+    terms: dict[str, int] = {}
+    for field, weight in CUSTOMER_WEIGHTS.items():
+        for term in set(tokens(row.get(field))):
+            terms[term] = terms.get(term, 0) + weight
+    phone = ''.join(c for c in str(row.get('phone_number') or '') if c.isdigit())[:MAX_TERM]
+    if phone:
+        terms[phone] = terms.get(phone, 0) + PHONE_WEIGHT
+    return terms
+
+
+def customer_index_rows(rows) -> list[tuple[int, str, int]]:
+    """(customerID, term, weight) rows for customer_terms."""
+    return [(row['customerID'], term, weight) for row in rows for term, weight in customer_terms(row).items()]
+
+
+def query_terms(q: str | None) -> list[str]:
+    """The distinct words of a search string, at most MAX_QUERY_TERMS of them."""
+    return list(dict.fromkeys(tokens(q)))[:MAX_QUERY_TERMS]
+
+
+def customer_query_terms(q: str | None) -> list[str]:
+    """Like query_terms, but something typed like a phone number is one term of its digits."""
+    if q and _PHONE.fullmatch(q.strip()):
+        return [''.join(c for c in q if c.isdigit())]
+    return query_terms(q)
+
+
+def _prefix_end(term: str) -> str:
+    return term[:-1] + chr(ord(term[-1]) + 1)
+
+
+def match_query(terms: list[str], table: str = 'search_terms', key: str = 'vehicleID') -> tuple[str, tuple]:
+    """(sql, params) selecting (key, score) for the rows matching every term."""
+    parts, params = [], []
+    for term in terms:
+        if len(term) < MIN_PREFIX:
+            parts.append(f"SELECT {key}, MAX(weight) * 2 AS score FROM {table} WHERE term = %s GROUP BY {key}")
+            params.append(term)
+        else:
+            parts.append(f"SELECT {key}, MAX(CASE WHEN term = %s THEN weight * 2 ELSE weight END) AS score "
+                         f"FROM {table} WHERE term >= %s AND term < %s GROUP BY {key}")
+            params += [term, term, _prefix_end(term)]
+    if len(parts) == 1:
+        return parts[0], tuple(params)
+    union = ' UNION ALL '.join(parts)
+    return (f"SELECT {key}, SUM(score) AS score FROM ({union}) t GROUP BY {key} HAVING COUNT(*) = {len(parts)}",
+            tuple(params))
@@ -0,0 +1,142 @@
+"""Production server: the app under gunicorn, preloaded and warmed up before the workers fork.
+
+    python serve.py                          # WEB_WORKERS processes x WEB_THREADS threads on BIND
+    python serve.py --workers 4 --threads 8
+    gunicorn -c serve.py                     # the same settings from gunicorn's own CLI
+
+    kill -HUP <master pid>                   # graceful reload: warm the master again, start new
+                                             # workers, let the old ones finish their requests
+    kill -USR2 <master pid>                  # deploy new code: start a new master next to the old
+    kill -QUIT <old master pid>              # one, then retire the old one once the new is up
+
+The app is imported once in the master (preload_app). Before forking, the master
+fills the lookup caches and compiles every template (also into the Jinja
+bytecode cache, see templating.py), then closes its database connections. Each
+worker therefore starts warm and opens its own connection pool. After the fork,
+post_fork drops the inherited pool, query thread pool and metrics.
+
+Settings come from the environment:
+
+    BIND                  address to listen on (default 0.0.0.0:8000)
+    WEB_WORKERS           processes (default 2 x CPUs + 1)
+    WEB_THREADS           request threads per process (default 4)
+    WEB_TIMEOUT           seconds before a stuck worker is restarted (default 30)
+    WEB_GRACEFUL_TIMEOUT  seconds old workers get to finish on reload (default 30)
+    WEB_MAX_REQUESTS      restart a worker after this many requests (default 0, never)
+
+DB_POOL_SIZE defaults to WEB_THREADS + PARALLEL_WORKERS, so no request thread
+waits for a connection while parallel.gather has queries out. The database must
+allow WEB_WORKERS x DB_POOL_SIZE connections.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+log = logging.getLogger('serve')
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_WORKERS') or multiprocessing.cpu_count() * 2 + 1)
+threads = int(os.getenv('WEB_THREADS', '4'))
+worker_class = 'gthread'
+preload_app = True
+wsgi_app = 'app:app'
+timeout = int(os.getenv('WEB_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+SETTINGS = ('bind', 'workers', 'threads', 'worker_class', 'preload_app', 'timeout', 'graceful_timeout',
+            'keepalive', 'max_requests', 'max_requests_jitter')
+
+
+def size_pool(threads: int):
+    """Default DB_POOL_SIZE for `threads` request threads (read when the pool opens)."""
+    os.environ.setdefault('DB_POOL_SIZE', str(threads + int(os.getenv('PARALLEL_WORKERS', '4'))))
+
+
+def warm_up(app) -> dict:
+    """Fill the lookup caches and compile the templates, then close the database connections.
+
+    Run in the master before forking: the workers inherit the caches and open
+    their own connections.
+    """
+    import db
+    import queries
+    import templating
+
+    started = time.perf_counter()
+    with app.app_context():
+        for lookup in (queries.get_manufacturers, queries.get_vehicle_types, queries.get_colors,
+                       queries.get_vendors, queries.get_model_years, queries.get_fuel_types):
+            lookup()
+    templates = templating.precompile(app)
+    db.close_pool()
+    return {'templates': templates, 'seconds': round(time.perf_counter() - started, 3)}
+
+
+def _warm_master(server):
+    size_pool(server.cfg.threads)
+    app = server.app.wsgi()  # already imported: preload_app
+    try:
+        result = warm_up(app)
+    except Exception:
+        # a cold start is better than none; the workers fill the caches as they go
+        log.exception("warm-up failed")
+        return
+    server.log.info("warmed up: %(templates)d templates in %(seconds)ss", result)
+
+
+# gunicorn server hooks
+
+def when_ready(server):
+    _warm_master(server)
+
+
+def on_reload(server):
+    # HUP: the new workers fork from this master, so refresh what they inherit
+    _warm_master(server)
+
+
+def post_fork(server, worker):
+    import db
+    import metrics
+    import parallel
+
+    db.reset_after_fork()
+    parallel.reset_after_fork()
+    metrics.reset()  # the master's warm-up queries are not this worker's
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', default=bind)
+    parser.add_argument('--workers', type=int, default=workers)
+    parser.add_argument('--threads', type=int, default=threads)
+    args = parser.parse_args(argv)
+
+    from gunicorn.app.base import BaseApplication
+
+    settings = {name: globals()[name] for name in SETTINGS}
+    settings.update(bind=args.bind, workers=args.workers, threads=args.threads)
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for name, value in settings.items():
+                self.cfg.set(name, value)
+            for hook in (when_ready, on_reload, post_fork):
+                self.cfg.set(hook.__name__, hook)
+
+        def load(self):
+            from app import app
+            return app
+
+    Server().run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
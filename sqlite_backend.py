@@ -0,0 +1,173 @@
+"""SQLite backend for the query layer (DB_BACKEND=sqlite, SQLITE_PATH=data.db).
+
+Wraps sqlite3 so that queries.py runs unchanged: connections accept
+cursor(dictionary=True), statements are written MySQL-style (%s placeholders,
+CONCAT, CURRENT_DATE(), GROUP_CONCAT ... SEPARATOR) and translated on the fly
+by load_sql.query_to_sqlite.
+
+Build the database with `python load_sql.py`.
+"""
+from functools import lru_cache
+import sqlite3
+import threading
+import time
+
+from load_sql import query_to_sqlite
+
+
+@lru_cache(maxsize=1024)
+def _translate(query: str) -> str:
+    return query_to_sqlite(query)
+
+
+def _dict_row(cursor, row):
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+class SQLiteCursor:
+    def __init__(self, cursor: sqlite3.Cursor, dictionary: bool):
+        self._cursor = cursor
+        if dictionary:
+            self._cursor.row_factory = _dict_row
+
+    def execute(self, query: str, params=()):
+        self._cursor.execute(_translate(query), tuple(params))
+        return self
+
+    def executemany(self, query: str, seq_of_params):
+        self._cursor.executemany(_translate(query), seq_of_params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size: int = 100):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """sqlite3 connection with the subset of the mysql.connector API the app uses."""
+
+    def __init__(self, path: str):
+        # connections are owned by one thread at a time (see ThreadLocalPool) but may
+        # be closed from another one at shutdown
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+
+    def cursor(self, dictionary: bool = False, **kwargs) -> SQLiteCursor:
+        return SQLiteCursor(self._conn.cursor(), dictionary)
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._conn.in_transaction
+
+    def is_connected(self) -> bool:
+        try:
+            self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class ThreadLocalPool:
+    """Connection pool for SQLite: each thread keeps and reuses its own connections.
+
+    There is no network handshake to amortize, so the point is just to keep one warm
+    connection per thread (WAL lets readers run alongside the single writer). A second
+    connection is opened only if a thread checks out another one while its first is
+    still in use. Same interface as db.ConnectionPool.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._parked = set()  # idle connections of every thread, so close_all reaches them all
+        self.closed = False
+        self.created = 0
+        self.in_use = 0
+
+    def _idle(self) -> list:
+        if not hasattr(self._local, 'idle'):
+            self._local.idle = []
+        return self._local.idle
+
+    def acquire(self):
+        from db import PooledConnection
+
+        idle = self._idle()
+        conn = None
+        with self._lock:
+            while idle and conn is None:
+                conn, born = idle.pop()
+                if conn not in self._parked:  # closed by close_all
+                    conn = None
+            self._parked.discard(conn)
+        if conn is None:
+            conn, born = SQLiteConnection(self.path), time.monotonic()
+            with self._lock:
+                self.created += 1
+        with self._lock:
+            self.in_use += 1
+        return PooledConnection(self, conn, born)
+
+    def release(self, conn, born: float):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self.in_use -= 1
+            if not self.closed:
+                self._parked.add(conn)
+                self._idle().append((conn, born))
+                return
+        conn.close()
+
+    def discard(self, conn):
+        conn.close()
+        with self._lock:
+            self.in_use -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'size': None, 'in_use': self.in_use, 'waiting': 0, 'created': self.created}
+
+    def close_all(self):
+        """Close the idle connections of every thread; checked-out ones are closed when released."""
+        with self._lock:
+            self.closed = True
+            parked, self._parked = self._parked, set()
+        for conn in parked:
+            conn.close()
+        self._local.idle = []
@@ -0,0 +1,35 @@
+"""Maintain the vehicle_summary table.
+
+    python summary.py rebuild   # repopulate from the live tables
+    python summary.py check     # compare against the live aggregate
+
+The table itself is created by migrations.py.
+"""
+import argparse
+import sys
+
+from queries import check_vehicle_summary, rebuild_vehicle_summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    args = parser.parse_args(argv)
+
+    if args.command == 'rebuild':
+        count = rebuild_vehicle_summary()
+        print(f"✅ vehicle_summary rebuilt: {count} vehicles")
+        return 0
+
+    problems = check_vehicle_summary()
+    for p in problems[:50]:
+        print(f"vehicle {p['vehicleID']}: {p['column']} summary={p['summary']!r} live={p['live']!r}")
+    if problems:
+        print(f"❌ {len(problems)} differences between vehicle_summary and the live aggregate")
+        return 1
+    print("✅ vehicle_summary matches the live aggregate")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
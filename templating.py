@@ -0,0 +1,128 @@
+"""Jinja setup: a persistent bytecode cache and a fragment cache for template blocks.
+
+Compiled templates are kept in JINJA_CACHE_DIR (Jinja's per-user temp directory
+by default, "off" to disable), so a fresh worker loads bytecode instead of
+compiling every template again.
+
+Expensive blocks that rarely change can be cached across requests:
+
+    {% cache 'cars_row', p.vehicleID, row_version(p) %}
+        ...
+    {% endcache %}
+
+The first argument names the fragment (it labels the metrics); the rest make up
+the key. Put everything the block depends on in the key. `data_version(*tables)`
+gives the tables' versions from table_versions, so the key changes whenever one
+of them is written; `row_version(row)` is a digest of one row's values, so a
+write only replaces the fragments of the rows it changed. Fragments live in cache.fragment_cache (FRAGMENT_CACHE_TTL,
+FRAGMENT_CACHE_MAX_ENTRIES).
+"""
+import hashlib
+import os
+import time
+
+from flask import g, has_request_context
+from jinja2 import DictLoader, Environment, FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from cache import _freeze, fragment_cache
+import metrics
+from versioning import versions_for
+
+def bytecode_cache() -> FileSystemBytecodeCache | None:
+    directory = os.getenv("JINJA_CACHE_DIR")
+    if directory == 'off':
+        return None
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory)
+
+
+class FragmentCacheExtension(Extension):
+    """The {% cache name, key... %}...{% endcache %} tag."""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cached', [nodes.List(args)]), [], [], body).set_lineno(lineno)
+
+    def _cached(self, key, caller):
+        name = str(key[0])
+        key = ('fragment', _freeze(key))
+        hit, value = fragment_cache.get(key)
+        if hit:
+            metrics.FRAGMENTS.inc(name, 'hit')
+            return value
+        started = time.perf_counter()
+        value = caller()
+        metrics.FRAGMENT_SECONDS.observe(name, value=time.perf_counter() - started)
+        metrics.FRAGMENTS.inc(name, 'miss')
+        if not _uncommitted_writes():
+            fragment_cache.set(key, value)
+        return value
+
+
+def _uncommitted_writes() -> bool:
+    """True while this request has written: the versions in the key are bumped only at commit."""
+    sess = g.get('db_session') if has_request_context() else None
+    return bool(sess and sess.wrote)
+
+
+def data_version(*tables: str) -> tuple:
+    """Fragment cache key part that changes whenever one of `tables` is written."""
+    return tuple(sorted(versions_for(*tables).items()))
+
+
+def row_version(row: dict) -> str:
+    """Fragment cache key part that changes whenever a value in `row` does."""
+    return hashlib.blake2b(repr(sorted(row.items())).encode(), digest_size=12).hexdigest()
+
+
+class _StringTemplate:
+    """A template from a Python string, compiled on first use through the bytecode cache."""
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        _sources[name] = source
+        _string_templates.append(self)
+        self._template = None
+
+    def compile(self):
+        if self._template is None:
+            self._template = _string_env.get_template(self.name)
+        return self._template
+
+    def render(self, *args, **kwargs) -> str:
+        return self.compile().render(*args, **kwargs)
+
+
+_sources: dict[str, str] = {}
+_string_templates: list[_StringTemplate] = []
+_string_env = Environment(loader=DictLoader(_sources), bytecode_cache=bytecode_cache())
+
+
+def string_template(name: str, source: str) -> _StringTemplate:
+    """Replacement for jinja2.Template(source) that is not compiled at import time."""
+    return _StringTemplate(name, source)
+
+
+def precompile(app) -> int:
+    """Compile every app template and string template now, filling the bytecode cache; returns the count."""
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    for template in _string_templates:
+        template.compile()
+    return len(names) + len(_string_templates)
+
+
+def init_app(app):
+    app.jinja_env.bytecode_cache = bytecode_cache()
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.globals['data_version'] = data_version
+    app.jinja_env.globals['row_version'] = row_version
@@ -0,0 +1,65 @@
+"""The /api/vehicles JSON and NDJSON endpoints."""
+import json
+
+import metrics
+import queries
+from app import app
+
+
+def test_pages_follow_the_cars_filters_and_cursors(sqlite_db):
+    client = app.test_client()
+    first = client.get('/api/vehicles?fuel_type=Gas&sort=price&page_size=5&fields=vin,sales_price').get_json()
+    assert len(first['vehicles']) == 5
+    assert all(set(v) == {'vin', 'sales_price'} for v in first['vehicles'])
+    second = client.get(first['next_url']).get_json()
+    expected = queries.get_vehicles({'fuel_type': 'Gas'}, sort='price', limit=10)
+    assert [v['vin'] for v in first['vehicles'] + second['vehicles']] == [r['vin'] for r in expected]
+
+    bad = client.get('/api/vehicles?fields=vin,password')
+    assert bad.status_code == 400 and 'password' in bad.get_json()['error']
+
+
+def test_projection_reaches_the_sql(sqlite_db):
+    sql, _, _ = queries.vehicles_query(fields=('vin', 'model_year'))
+    assert sql.startswith('SELECT v.vin, v.model_year FROM')
+    car = app.test_client().get('/api/vehicles/11?fields=vin,colors').get_json()
+    assert car == {'vin': queries.get_vehicle_details(11)['vin'], 'colors': queries.get_vehicle_details(11)['colors']}
+    assert app.test_client().get('/api/vehicles/999999').status_code == 404
+
+
+def test_ndjson_streams_every_match(sqlite_db):
+    metrics.reset()
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['role'] = 'Owner'
+    response = client.get('/api/vehicles?fields=vehicleID,model_year', headers={'Accept': 'application/x-ndjson'})
+    assert response.is_streamed and response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(rows) == 277 and set(rows[0]) == {'vehicleID', 'model_year'}
+    assert [r['model_year'] for r in rows] == sorted((r['model_year'] for r in rows), reverse=True)
+    assert 'db_query_rows_total{function="api_vehicles",kind="stream"} 277' in metrics.render()
+
+
+def test_owner_listing_applies_the_filters(sqlite_db):
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['role'] = 'Owner'
+    rows = client.get('/api/vehicles?manufacturer_id=3&page_size=100&fields=vehicleID,manufacturerID').get_json()['vehicles']
+    assert rows and {r['manufacturerID'] for r in rows} == {3}
+    everything = queries.get_vehicles({'manufacturer_id': 3}, get_all=True)
+    assert len(rows) == len(everything) > len(queries.get_vehicles({'manufacturer_id': 3}))
+
+
+def test_cost_fields_are_for_owners_only(sqlite_db):
+    client = app.test_client()
+    for url in ('/api/vehicles?page_size=1', '/api/vehicles/11'):
+        body = client.get(url).get_json()
+        car = body['vehicles'][0] if 'vehicles' in body else body
+        assert car['vin'] and not {'purchase_price', 'parts_cost'} & set(car)
+    denied = client.get('/api/vehicles/11?fields=vin,purchase_price')
+    assert denied.status_code == 400 and 'parts_cost' not in denied.get_json()['fields']
+
+    with client.session_transaction() as s:
+        s['role'] = 'Owner'
+    assert {'purchase_price', 'parts_cost'} <= set(client.get('/api/vehicles/11').get_json())
+    assert client.get('/api/vehicles/11?fields=purchase_price').status_code == 200
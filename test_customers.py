@@ -0,0 +1,38 @@
+"""Customer typeahead over the customer_terms index."""
+import queries
+from app import app
+
+
+def test_prefix_search_on_names_email_phone_and_id_number(sqlite_db):
+    # last names outrank first names and emails
+    assert [c['customerID'] for c in queries.search_customers('mitch')][:1] == [203]
+    assert [c['customerID'] for c in queries.search_customers('teri mit')] == [203]
+    assert queries.search_customers('teri choi') == []
+    assert [c['customerID'] for c in queries.search_customers('(745) 762-9')] == [203]
+    assert [c['customerID'] for c in queries.search_customers('leroman@scot')] == [203]
+    assert [c['customerID'] for c in queries.search_customers('c39025')] == [203]
+    assert 'id_number' not in queries.search_customers('mitch')[0]
+    assert len(queries.search_customers('com', limit=5)) == 5
+
+
+def test_new_customers_are_searchable(sqlite_db):
+    cid = queries.add_customer('Zelda', 'Quartermaine', 'zq@example.com', '555-010-9999', '1 St', 'Town', 'ST',
+                               '00000', 'D123')
+    assert [c['customerID'] for c in queries.search_customers('quarter zel')] == [cid]
+    assert [c['customerID'] for c in queries.search_customers('5550109')] == [cid]
+
+
+def test_api_and_sell_forms(sqlite_db):
+    client = app.test_client()
+    assert client.get('/api/customers?q=mitch').status_code == 403
+    with client.session_transaction() as s:
+        s['role'] = 'Owner'
+        s['user_id'] = 1
+    data = client.get('/api/customers?q=mitch').get_json()
+    assert data['results'][0]['last_name'] == 'Mitchell'
+
+    # the forms no longer embed the customer list, only a preselected new customer
+    page = client.get('/cars/sell').get_data(as_text=True)
+    assert 'Choi' not in page and 'Mitchell' not in page
+    page = client.get('/car/11/sell?new_customer_id=203').get_data(as_text=True)
+    assert 'value="203"' in page and 'Mitchell, Teri' in page and 'Choi' not in page
@@ -0,0 +1,56 @@
+"""datagen.py output imports cleanly and is reproducible; bench.py runs against it."""
+import sqlite3
+
+import pytest
+
+import bench
+import datagen
+import load_sql
+
+
+@pytest.fixture(scope='module')
+def generated(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('datagen')
+    counts = datagen.write_dump(tmp / 'gen.sql', 300, seed=7)
+    load_sql.run_import(str(tmp / 'gen.db'), str(tmp / 'gen.sql'))
+    yield tmp, counts
+
+
+def test_dump_is_seeded_and_consistent(generated, tmp_path):
+    tmp, counts = generated
+    datagen.write_dump(tmp_path / 'again.sql', 300, seed=7)
+    assert (tmp_path / 'again.sql').read_bytes() == (tmp / 'gen.sql').read_bytes()
+
+    conn = sqlite3.connect(tmp / 'gen.db')
+    for table, n in counts.items():
+        assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == n, table
+    assert counts['vehiclecolors'] >= 300 and counts['parts'] > counts['partorders'] > 0
+    orphans = [
+        "SELECT COUNT(*) FROM vehicles v WHERE NOT EXISTS (SELECT 1 FROM purchasetransactions p WHERE p.vehicleID = v.vehicleID)",
+        "SELECT COUNT(*) FROM vehicles v WHERE NOT EXISTS (SELECT 1 FROM vehiclecolors vc WHERE vc.vehicleID = v.vehicleID)",
+        "SELECT COUNT(*) FROM parts p WHERE NOT EXISTS (SELECT 1 FROM partorders o WHERE o.part_orderID = p.part_orderID)",
+        "SELECT COUNT(*) FROM salestransactions s JOIN purchasetransactions p ON p.vehicleID = s.vehicleID"
+        " WHERE s.sales_date < p.purchase_date",
+        "SELECT COUNT(*) FROM purchasetransactions p WHERE p.customerID NOT IN (SELECT customerID FROM customers)",
+    ]
+    for sql in orphans:
+        assert conn.execute(sql).fetchone()[0] == 0, sql
+    conn.close()
+
+
+def test_bench_reports_every_case(generated, monkeypatch):
+    tmp, _ = generated
+    monkeypatch.setattr(bench.db, '_pool', None)
+    # use_sqlite sets these; let monkeypatch restore them
+    monkeypatch.setenv('DB_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp / 'gen.db'))
+    bench.use_sqlite(tmp / 'gen.db')
+    try:
+        report = bench.run(300, repeat=2)
+    finally:
+        bench.db.get_pool().close_all()
+        bench.db._pool = None
+        bench.cache.lookup_cache.clear()
+    assert set(report['results']) == {name for name, _ in bench.cases(300)}
+    result = report['results']['get_vehicles[get_all]']
+    assert result['rows'] == 300 and result['p95_ms'] >= result['p50_ms'] > 0
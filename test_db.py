@@ -0,0 +1,133 @@
+import threading
+
+import pytest
+from flask import Flask
+
+import db
+from db import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.in_transaction = False
+        self.rollbacks = 0
+        self.commits = 0
+
+    def is_connected(self):
+        return self.alive
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_reuses_connections():
+    pool = ConnectionPool(connect=FakeConnection, size=2)
+    first = pool.acquire()
+    raw = first._conn
+    first.close()
+    second = pool.acquire()
+    assert second._conn is raw
+    second.close()
+    assert pool.stats()['created'] == 1
+    assert pool.stats()['in_use'] == 0
+
+
+def test_close_all_closes_checked_out_connections_on_release():
+    pool = ConnectionPool(connect=FakeConnection, size=2)
+    idle, busy = pool.acquire(), pool.acquire()
+    idle_raw, busy_raw = idle._conn, busy._conn
+    idle.close()
+    pool.close_all()
+    assert idle_raw.closed and not busy_raw.closed
+    busy.close()
+    assert busy_raw.closed
+    assert pool.stats()['open'] == 0 and pool.stats()['idle'] == 0 and pool.stats()['in_use'] == 0
+
+
+def test_pool_replaces_dead_and_stale_connections():
+    pool = ConnectionPool(connect=FakeConnection, size=1)
+    conn = pool.acquire()
+    raw = conn._conn
+    conn.close()
+    raw.alive = False
+    conn = pool.acquire()
+    assert conn._conn is not raw and raw.closed
+    conn.close()
+
+    pool.recycle = -1  # everything is stale
+    conn = pool.acquire()
+    conn.close()
+    assert pool.stats()['recycled'] == 1
+    assert pool.stats()['created'] == 3
+
+
+def test_pool_rolls_back_open_transactions_on_release():
+    pool = ConnectionPool(connect=FakeConnection, size=1)
+    conn = pool.acquire()
+    conn._conn.in_transaction = True
+    raw = conn._conn
+    conn.close()
+    assert raw.rollbacks == 1
+
+
+def test_pool_waits_then_times_out():
+    pool = ConnectionPool(connect=FakeConnection, size=1, timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    pool.timeout = 5
+    waiter.start()
+    held.close()
+    waiter.join(2)
+    assert got and pool.stats()['in_use'] == 1
+    got[0].close()
+
+
+def _session_app(monkeypatch):
+    pool = ConnectionPool(connect=FakeConnection, size=1)
+    monkeypatch.setattr(db, '_pool', pool)
+    app = Flask(__name__)
+    db.init_app(app)
+    seen = []
+
+    @app.route('/ok')
+    def ok():
+        with db.transaction() as a, db.transaction() as b:
+            assert a is b
+            seen.append(a._conn)
+        return 'ok'
+
+    @app.route('/fail')
+    def fail():
+        with db.transaction() as conn:
+            seen.append(conn._conn)
+        db.rollback()
+        return 'nope', 500
+
+    return app, pool, seen
+
+
+def test_request_session_commits_once(monkeypatch):
+    app, pool, seen = _session_app(monkeypatch)
+    assert app.test_client().get('/ok').status_code == 200
+    assert seen[0].commits == 1 and seen[0].rollbacks == 0
+    assert pool.stats()['in_use'] == 0
+
+
+def test_request_session_rolls_back_failed_request(monkeypatch):
+    app, pool, seen = _session_app(monkeypatch)
+    assert app.test_client().get('/fail').status_code == 500
+    assert seen[0].commits == 0 and seen[0].rollbacks == 1
+    assert pool.stats()['in_use'] == 0
@@ -0,0 +1,43 @@
+"""Bulk vehicle intake."""
+import intake
+import queries
+from app import app
+
+HEADER = "vin,model_name,model_year,fuel_type,manufacturer,vehicle_type,mileage,colors,customer_id,price,condition,purchase_date\n"
+LOT = HEADER + (
+    "LOT0000000000001,Roadster,2020,gas,Acura,Convertible,1200.5,Blue; silver,203,15000,good,2024-03-01\n"
+    "LOT0000000000002,Roadster,2021,Battery,acura,convertible,80,Red,203,18000.25,Excellent,\n"
+    "LOT0000000000001,Roadster,2020,Gas,Acura,Convertible,1,Blue,203,1,Good,\n"
+    ",Wagon,1850,Steam,Nope,Convertible,-1,Plaid,0,x,Mint,2024-13-01\n"
+)
+
+
+def test_good_rows_go_in_together_and_bad_rows_are_reported(sqlite_db):
+    result = intake.ingest(LOT, user_id=1)
+    assert (result['inserted'], result['skipped']) == (2, 2)
+    first, second, dup, bad = result['rows']
+    assert first['vehicleID'] and second['vehicleID'] and not first['errors']
+    assert dup['errors'] == ["vin LOT0000000000001 appears twice in the file"]
+    assert len(bad['errors']) == 10 and bad['vehicleID'] is None
+
+    car = queries.get_vehicle_details(first['vehicleID'])
+    assert car['colors'] == 'Blue, Silver' and car['manufacturer_name'] == 'Acura'
+    seller = queries.get_vehicle_seller(first['vehicleID'])
+    assert (str(seller['purchase_date']), seller['purchase_price']) == ('2024-03-01', 15000)
+    assert [v['vehicleID'] for v in queries.search_vehicles('LOT0000000000002', get_all=True)] == [second['vehicleID']]
+    assert queries.check_vehicle_summary() == [] and queries.check_report_rollups() == []
+
+    # the same file again: every VIN is taken, and strict mode adds nothing
+    again = intake.ingest(LOT, user_id=1, strict=True)
+    assert again['inserted'] == 0 and again['rows'][0]['errors'] == ["vin LOT0000000000001 is already recorded"]
+
+
+def test_intake_endpoint(sqlite_db):
+    client = app.test_client()
+    assert client.post('/cars/intake', data=LOT, content_type='text/csv').status_code == 403
+    with client.session_transaction() as s:
+        s.update(role='Buyer', user_id=1)
+    response = client.post('/cars/intake?strict=1', data=LOT, content_type='text/csv')
+    assert response.status_code == 400 and response.get_json()['inserted'] == 0
+    response = client.post('/cars/intake', data=HEADER + LOT.splitlines(True)[2], content_type='text/csv')
+    assert response.status_code == 200 and response.get_json()['inserted'] == 1
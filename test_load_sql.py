@@ -0,0 +1,68 @@
+"""Streaming dump reader: statements and INSERT rows split across tiny chunks."""
+import io
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import load_sql
+
+DUMP = """/*
+MariaDB Backup
+*/
+SET FOREIGN_KEY_CHECKS=0;
+/*!40101 SET NAMES utf8 */;
+-- a comment; with a semicolon
+DROP TABLE IF EXISTS `shop`.`notes`;
+CREATE TABLE `notes` (
+  `noteID` int(11) NOT NULL AUTO_INCREMENT,
+  `body` varchar(255) DEFAULT NULL,
+  `price` decimal(10,2) NOT NULL,
+  PRIMARY KEY (`noteID`),
+  UNIQUE KEY `body` (`body`(20))
+) ENGINE=InnoDB AUTO_INCREMENT=4 DEFAULT CHARSET=latin1;
+INSERT INTO `shop`.`notes` (`noteID`,`body`,`price`) VALUES (1, 'it''s; (fine)', 12.50),(2, 'back\\\\slash \\'q\\'\\nline', -3),
+(3, NULL, 0.5);
+"""
+
+
+def test_read_dump_is_independent_of_chunk_boundaries():
+    expected = None
+    for chunk_size in (1, 2, 3, 7, 64, load_sql.CHUNK_SIZE):
+        out = []
+        for statement in load_sql.read_dump(io.StringIO(DUMP), chunk_size):
+            if isinstance(statement, load_sql.Insert):
+                out.append((statement.table, statement.columns, list(statement.rows)))
+            else:
+                out.append(statement)
+        expected = expected or out
+        assert out == expected, chunk_size
+
+    assert expected[0] == 'SET FOREIGN_KEY_CHECKS=0'
+    assert expected[1] == 'DROP TABLE IF EXISTS `shop`.`notes`'
+    table, columns, rows = expected[-1]
+    assert (table, columns) == ('notes', ['noteID', 'body', 'price'])
+    assert rows == [(1, "it's; (fine)", 12.5), (2, "back\\slash 'q'\nline", -3), (3, None, 0.5)]
+
+
+def test_run_import_batches_rows_and_defers_indexes(tmp_path):
+    dump = tmp_path / 'dump.sql'
+    dump.write_text(DUMP, encoding='utf-8')
+    seen = []
+    stats = load_sql.run_import(str(tmp_path / 'notes.db'), str(dump), batch_size=2,
+                                  progress=seen.append, apply_migrations=False)
+
+    assert stats['rows'] == 3 and stats['bytes'] == stats['total_bytes'] and seen
+    conn = sqlite3.connect(tmp_path / 'notes.db')
+    assert conn.execute("SELECT COUNT(*), SUM(price) FROM notes").fetchone() == (3, 10.0)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    assert [row[1] for row in conn.execute("PRAGMA index_list(notes)")] == ['notes_body']
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO notes (body, price) VALUES ('it''s; (fine)', 1)")
+    conn.close()
+
+
+def test_unparseable_row_fails_loudly():
+    statements = load_sql.read_dump(io.StringIO("INSERT INTO t VALUES (1, NOW());"), 4)
+    with pytest.raises(ValueError):
+        list(next(statements).rows)
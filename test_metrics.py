@@ -0,0 +1,47 @@
+import logging
+
+import pytest
+
+import metrics
+from app import app
+
+
+@pytest.fixture
+def client(sqlite_db):
+    metrics.reset()
+    yield app.test_client()
+    metrics.reset()
+
+
+def sample(text: str, name: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    raise AssertionError(f"{name} not in /metrics")
+
+
+def test_queries_and_requests_are_recorded(client):
+    assert client.get('/cars?get_all=1').status_code == 200
+    assert client.get('/car/11').status_code == 200
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert sample(text, 'db_query_duration_seconds_count{function="get_vehicles",kind="read"}') == 1
+    assert sample(text, 'db_query_rows_total{function="get_vehicles",kind="read"}') == 26  # page + lookahead row
+    assert sample(text, 'db_query_duration_seconds_count{function="get_vehicle_details",kind="read"}') == 1
+    assert sample(text, 'http_requests_total{route="/car/<int:car_id>",method="GET",status="200"}') == 1
+    assert sample(text, 'http_request_queries_count{route="/cars"}') == 1
+    assert sample(text, 'http_request_queries_sum{route="/cars"}') >= 2  # listing + facets
+    assert sample(text, 'http_request_render_seconds_sum{route="/cars"}') > 0
+    assert sample(text, 'db_connection_acquire_seconds_count') >= 2
+    assert '# TYPE db_query_duration_seconds histogram' in text
+    assert 'db_pool_connections{state="in_use"} 0' in text
+
+
+def test_slow_queries_are_logged_without_parameters(client, monkeypatch, caplog):
+    monkeypatch.setenv('SLOW_QUERY_MS', '0')
+    with caplog.at_level(logging.WARNING, logger='slow_query'):
+        client.post('/login', data={'email_address': 'user01', 'password': 'secret-pw'})
+    assert any('authenticate_user' in r.getMessage() for r in caplog.records)
+    assert not any('secret-pw' in r.getMessage() for r in caplog.records)
+    text = client.get('/metrics').get_data(as_text=True)
+    assert sample(text, 'db_slow_queries_total{function="authenticate_user"}') == 1
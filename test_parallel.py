@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+import metrics
+import parallel
+import queries
+from app import app
+
+
+def slow(value, delay=0.2):
+    time.sleep(delay)
+    return value
+
+
+def thread_name(_=None):
+    return threading.current_thread().name
+
+
+def test_gather_runs_calls_concurrently_in_order(sqlite_db):
+    started = time.perf_counter()
+    assert parallel.gather((slow, 1), None, (slow, 2), (slow, 3)) == [1, None, 2, 3]
+    assert time.perf_counter() - started < 0.5
+
+
+def test_gather_reraises_the_first_error(sqlite_db):
+    def boom(message):
+        raise ValueError(message)
+
+    with pytest.raises(ValueError, match='first'):
+        parallel.gather((slow, 1, 0.05), (boom, 'first'), (boom, 'second'))
+
+
+def test_gather_stays_in_the_request_thread_after_a_write(sqlite_db):
+    with app.test_request_context('/'):
+        here = thread_name()
+        assert here not in parallel.gather((thread_name,), (thread_name,))[1:]
+        queries.set_vehicle_colors(11, [3])
+        assert parallel.gather((thread_name,), (thread_name,)) == [here, here]
+        # and the uncommitted write is visible to the gathered reads
+        details, = parallel.gather((queries.get_vehicle_details, 11))
+        assert details['colors'] == 'Black'
+
+
+def test_car_detail_fetches_transactions_concurrently(sqlite_db):
+    metrics.reset()
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['role'] = 'Owner'
+    html = client.get('/car/11').get_data(as_text=True)
+    seller = queries.get_vehicle_seller(11)
+    assert seller['last_name'] in html
+
+    text = metrics.render()
+    # the four page queries plus the table_versions lookup for the ETag
+    assert 'http_request_queries_sum{route="/car/<int:car_id>"} 5' in text
+    metrics.reset()
@@ -0,0 +1,82 @@
+"""Bulk part orders and batch status changes."""
+import pytest
+
+import part_orders
+import queries
+from app import app
+
+CSV = """vendor_id,vehicle_id,order_number,part_number,description,cost,quantity,status
+3,11,90,BULK-1,Mirror,12.50,2,
+3,11,90,BULK-2,Bumper,100,1,received
+3,12,90,BULK-1,Mirror,12.50,4,Ordered
+"""
+
+
+def test_parse_reports_every_bad_row():
+    orders, errors = part_orders.parse(CSV + "x,11,91,BULK-3,Lamp,-1,0,Lost\n3,11,90,BULK-1,Mirror,1,1,\n", 'csv')
+    assert [len(o['parts']) for o in orders] == [2, 1]
+    assert errors == [
+        "row 5: vendor_id must be a whole number",
+        "row 5: cost must be an amount from 0 to 999999.99",
+        "row 5: quantity must be at least 1",
+        "row 5: status must be one of Ordered, Received, Installed",
+        "row 6: part BULK-1 is listed twice in order 90",
+    ]
+    assert part_orders.parse('[{"vendor_id": 3}]', 'json')[1] == ["order 1: vehicle_id must be a whole number",
+                                                                "order 1: order_number must be a whole number",
+                                                                "order 1: parts must be a non-empty list"]
+
+
+def test_upload_inserts_orders_parts_and_rollups_together(sqlite_db):
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s.update(role='Buyer', user_id=1)
+    before = queries.get_vehicle_details(11)['parts_cost']
+
+    response = client.post('/parts/orders', data=CSV, content_type='text/csv')
+    assert response.status_code == 201
+    assert [(o['vehicleID'], o['parts']) for o in response.get_json()['orders']] == [(11, 2), (12, 1)]
+    assert queries.get_vehicle_details(11)['parts_cost'] == before + 125
+    assert queries.check_vehicle_summary() == [] and queries.check_report_rollups() == []
+
+    # the same order again, plus one for a missing vehicle: nothing is written
+    again = client.post('/parts/orders', json=[{'vendor_id': 3, 'vehicle_id': 99999, 'order_number': 1,
+                                                'parts': [{'part_number': 'X', 'description': 'X', 'cost': 1, 'quantity': 1}]},
+                                               {'vendor_id': 3, 'vehicle_id': 12, 'order_number': 90,
+                                                'parts': [{'part_number': 'Y', 'description': 'Y', 'cost': 1, 'quantity': 1}]}])
+    assert again.status_code == 400
+    assert again.get_json()['errors'] == ["order 1 for vehicle 99999: no vehicle 99999",
+                                          "order 90 for vehicle 12: already exists"]
+    assert not queries.execute_sql("SELECT partID FROM parts WHERE part_number IN ('X', 'Y')")
+
+
+def test_batch_status_reports_when_the_vehicle_becomes_sellable(sqlite_db):
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s.update(role='Owner', user_id=1)
+    # vehicle 204: 992 installed, 993 and 1094 received
+
+    def post(ids, status):
+        response = client.post('/parts/status', json={'part_ids': ids, 'status': status})
+        assert response.status_code == 200
+        return response.get_json()
+
+    result = post([993, 992, 999999], 'Received')  # parts never move back
+    assert result['updated'] == [] and result['missing'] == [999999]
+    result = post([993], 'Installed')
+    assert result['updated'] == [993] and result['vehicles'][0]['pending_parts'] == 1
+    assert not result['vehicles'][0]['became_sellable']
+
+    result = post([1094, 992], 'Installed')
+    assert result['updated'] == [1094]
+    assert {p['partID']: p['status'] for p in result['parts']} == {992: 'Installed', 1094: 'Installed'}
+    assert result['vehicles'] == [{'vehicleID': 204, 'pending_parts': 0, 'is_sold': 0, 'sellable': True,
+                                   'became_sellable': True}]
+    assert 204 in {v['vehicleID'] for v in queries.get_vehicles()}
+    assert client.post('/parts/status', json={'part_ids': [1], 'status': 'Lost'}).status_code == 400
+
+
+def test_no_orders_issue_no_queries(monkeypatch):
+    # an empty IN () would be a syntax error on MySQL
+    monkeypatch.setattr(queries, 'execute_sql', lambda *a: pytest.fail("queried"))
+    assert queries.insert_part_orders([]) == ([], [])
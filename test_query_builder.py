@@ -0,0 +1,113 @@
+import sqlite3
+
+import pytest
+
+from query_builder import Select, compile_vehicle_filters, vehicle_aggregate
+
+SCHEMA = """
+CREATE TABLE manufacturers (manufacturerID INTEGER PRIMARY KEY, manufacturer_name TEXT);
+CREATE TABLE vehicletypes (vehicle_typeID INTEGER PRIMARY KEY, vehicle_type_name TEXT);
+CREATE TABLE colors (colorID INTEGER PRIMARY KEY, color_name TEXT);
+CREATE TABLE vehicles (vehicleID INTEGER PRIMARY KEY, vin TEXT, mileage REAL, description TEXT,
+    model_name TEXT, model_year INTEGER, fuel_type TEXT, manufacturerID INTEGER, vehicle_typeID INTEGER);
+CREATE TABLE vehiclecolors (vehicle_colorID INTEGER PRIMARY KEY, vehicleID INTEGER, colorID INTEGER);
+CREATE TABLE partorders (part_orderID INTEGER PRIMARY KEY, order_number INTEGER, vehicleID INTEGER, vendorID INTEGER);
+CREATE TABLE parts (partID INTEGER PRIMARY KEY, part_orderID INTEGER, part_number TEXT, cost REAL,
+    description TEXT, quantity INTEGER, status TEXT);
+CREATE TABLE purchasetransactions (purchase_transactionID INTEGER PRIMARY KEY, vehicleID INTEGER,
+    userID INTEGER, customerID INTEGER, purchase_price REAL, purchase_date TEXT, vehicle_condition TEXT);
+CREATE TABLE salestransactions (sales_transactionID INTEGER PRIMARY KEY, vehicleID INTEGER,
+    userID INTEGER, customerID INTEGER, sales_date TEXT);
+
+INSERT INTO manufacturers VALUES (1, 'Acme');
+INSERT INTO vehicletypes VALUES (1, 'Sedan');
+INSERT INTO colors VALUES (1, 'Red'), (2, 'Blue'), (3, 'Green');
+INSERT INTO vehicles VALUES
+    (1, 'VIN1', 1000, NULL, 'Two-tone', 2020, 'Gas', 1, 1),
+    (2, 'VIN2', 2000, NULL, 'Three-tone', 2021, 'Gas', 1, 1),
+    (3, 'VIN3', 3000, NULL, 'Plain', 2019, 'Diesel', 1, 1);
+INSERT INTO vehiclecolors (vehicleID, colorID) VALUES (1, 1), (1, 2), (2, 1), (2, 2), (2, 3);
+INSERT INTO partorders VALUES (10, 1, 1, 1), (11, 2, 1, 1), (20, 1, 2, 1);
+INSERT INTO parts (part_orderID, part_number, cost, description, quantity, status) VALUES
+    (10, 'A', 100.00, 'a', 2, 'Installed'),
+    (11, 'B', 50.00, 'b', 1, 'Ordered'),
+    (20, 'C', 10.00, 'c', 3, 'Installed');
+INSERT INTO purchasetransactions (vehicleID, userID, customerID, purchase_price, purchase_date, vehicle_condition) VALUES
+    (1, 1, 1, 1000.00, '2024-01-01', 'Good'),
+    (2, 1, 1, 2000.00, '2024-01-01', 'Good');
+INSERT INTO salestransactions (vehicleID, userID, customerID, sales_date) VALUES (2, 1, 1, '2024-02-01');
+"""
+
+# the pre-builder listing query: colors and parts joined in the same FROM clause
+LEGACY_FROM = (
+    "FROM vehicles v "
+    "LEFT JOIN vehiclecolors vc ON vc.vehicleID = v.vehicleID "
+    "LEFT JOIN colors c ON vc.colorID = c.colorID "
+    "LEFT JOIN purchasetransactions pt ON pt.vehicleID = v.vehicleID "
+    "LEFT JOIN partorders po ON po.vehicleID = v.vehicleID "
+    "LEFT JOIN parts p ON p.part_orderID = po.part_orderID"
+)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    yield conn
+    conn.close()
+
+
+def run(conn, q: Select):
+    sql, params = q.build()
+    return [dict(r) for r in conn.execute(sql.replace('%s', '?'), params)]
+
+
+def test_prices_match_hand_computed_reference_on_multicolor_vehicles(conn):
+    rows = {r['vehicleID']: r for r in run(conn, vehicle_aggregate(dialect='sqlite'))}
+
+    # vehicle 1: two colors, parts 100*2 + 50*1 = 250, price 1.4*1000 + 1.2*250 = 1700
+    assert rows[1]['colors'] == 'Blue, Red'
+    assert rows[1]['parts_cost'] == pytest.approx(250.00)
+    assert rows[1]['sales_price'] == pytest.approx(1700.00)
+    assert rows[1]['pending_parts'] == 1 and rows[1]['is_sold'] == 0
+
+    # vehicle 2: three colors, parts 10*3 = 30, price 1.4*2000 + 1.2*30 = 2836
+    assert rows[2]['colors'] == 'Blue, Green, Red'
+    assert rows[2]['parts_cost'] == pytest.approx(30.00)
+    assert rows[2]['sales_price'] == pytest.approx(2836.00)
+    assert rows[2]['is_sold'] == 1
+
+    # vehicle 3: no colors, parts or purchase
+    assert rows[3]['colors'] is None
+    assert rows[3]['parts_cost'] == 0
+    assert rows[3]['sales_price'] is None
+
+
+def test_legacy_join_inflated_parts_cost(conn):
+    legacy = conn.execute(f"SELECT SUM(p.cost * p.quantity) {LEGACY_FROM} WHERE v.vehicleID = 1").fetchone()[0]
+    assert legacy == pytest.approx(500.00)  # each part counted once per color
+
+
+def test_aggregate_examines_one_joined_row_per_vehicle(conn):
+    sql, params = vehicle_aggregate(dialect='sqlite').build()
+    built = conn.execute(f"SELECT COUNT(*) FROM ({sql.replace('%s', '?')})", params).fetchone()[0]
+    legacy = conn.execute(f"SELECT COUNT(*) {LEGACY_FROM}").fetchone()[0]
+    assert built == 3
+    # 2 colors x 2 parts + 3 colors x 1 part + 1 bare row
+    assert legacy == 8
+
+
+def test_scoped_aggregate_only_returns_requested_vehicles(conn):
+    rows = run(conn, vehicle_aggregate([1, 3], dialect='sqlite').order_by("v.vehicleID"))
+    assert [r['vehicleID'] for r in rows] == [1, 3]
+    assert rows[0]['sales_price'] == pytest.approx(1700.00)
+
+
+def test_compiled_filters(conn):
+    compiled = compile_vehicle_filters({'model_year': 2020, 'fuel_type': '', 'color_name': 'Blue'})
+    assert [c.split(' ')[0] for c, _ in compiled] == ['v.model_year', 'EXISTS']
+    q = Select("vehicles v").columns("v.vehicleID")
+    for clause, params in compiled:
+        q.where(clause, *params)
+    assert run(conn, q) == [{'vehicleID': 1}]
@@ -0,0 +1,168 @@
+"""Plan regression tests: EXPLAIN QUERY PLAN every query in queries.py against a
+scaled SQLite import of GenevaAuto.sql (indexes come from migrations.py) and fail
+if a query falls back to a full table scan it is not expected to need.
+"""
+import contextlib
+import re
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import load_sql
+import queries
+
+SCALE = 20
+OFFSET = 100000
+
+# (table, {column: SQL expression}) copied SCALE times with shifted keys
+SCALED_TABLES = [
+    ('vehicles', {'vehicleID': 'vehicleID + {off}', 'vin': "vin || '-{k}'"}),
+    ('vehiclecolors', {'vehicle_colorID': 'vehicle_colorID + {off}', 'vehicleID': 'vehicleID + {off}'}),
+    ('partorders', {'part_orderID': 'part_orderID + {off}', 'vehicleID': 'vehicleID + {off}'}),
+    ('parts', {'partID': 'partID + {off}', 'part_orderID': 'part_orderID + {off}'}),
+    ('purchasetransactions', {'purchase_transactionID': 'purchase_transactionID + {off}', 'vehicleID': 'vehicleID + {off}'}),
+    ('salestransactions', {'sales_transactionID': 'sales_transactionID + {off}', 'vehicleID': 'vehicleID + {off}'}),
+    ('vehicle_summary', {'vehicleID': 'vehicleID + {off}'}),
+    ('search_terms', {'vehicleID': 'vehicleID + {off}'}),
+]
+
+# Full scans that are inherent to the query (it reads every row by definition).
+# Keyed by the queries.py function; values are the scanned table/alias names.
+EXPECTED_SCANS = {
+    'get_parts': {'parts'},
+    'get_users': {'users'},
+    'get_tables': {'sqlite_master'},
+    'check_vehicle_summary': {'v', 'vehicle_summary'},
+    # reports read every row of their rollup table (one per group)
+    'get_sales_productivity': {'r'},
+    'get_seller_history': {'r'},
+    'get_part_statistics': {'r'},
+    'export[parts]': {'p'},
+    # searches scan their own match set (m, and t for several words), which comes
+    # from range lookups on the search_terms primary key
+    **{f'get_vehicles[q={q}]': {'m', 't'} for q in ('camry', 'toyota cam', 'blue', '1hgc')},
+    'search_customers': {'m', 't'},
+    'search_customers[phone]': {'m'},
+}
+
+
+@pytest.fixture(scope='module')
+def scaled_db(tmp_path_factory):
+    root = Path(__file__).parent
+    tmp = tmp_path_factory.mktemp('plans')
+    load_sql.run_import(str(tmp / 'scaled.db'), str(root / 'GenevaAuto.sql'))
+    conn = sqlite3.connect(tmp / 'scaled.db')
+    for table, overrides in SCALED_TABLES:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        for k in range(1, SCALE):
+            exprs = [overrides.get(c, c).format(off=k * OFFSET, k=k) for c in columns]
+            conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(exprs)} FROM {table} WHERE {columns[0]} < {OFFSET}")
+    conn.commit()
+    conn.execute("ANALYZE")
+    yield conn
+    conn.close()
+
+
+def capture(monkeypatch, fn, *args, **kwargs) -> list[tuple[str, tuple]]:
+    statements = []
+
+    def fake_execute_sql(query, params=()):
+        statements.append((query, tuple(params)))
+        return []
+
+    monkeypatch.setattr(queries, 'execute_sql', fake_execute_sql)
+    # reads that must see the primary run on one connection through _query_on
+    monkeypatch.setattr(queries, '_query_on', lambda conn, query, params=(): fake_execute_sql(query, params))
+    monkeypatch.setattr(queries, 'transaction', lambda write=False: contextlib.nullcontext())
+    fn(*args, **kwargs)
+    return statements
+
+
+def full_scans(conn, sql: str, params: tuple) -> set[str]:
+    plan = conn.execute("EXPLAIN QUERY PLAN " + load_sql.query_to_sqlite(sql), params).fetchall()
+    scans = set()
+    for row in plan:
+        m = re.match(r"SCAN (\w+)$", row[3])
+        if m:
+            scans.add(m.group(1))
+    return scans
+
+
+FILTERS = [
+    {},
+    {'manufacturer_id': 3},
+    {'vehicle_type_id': 2},
+    {'model_year': 2015},
+    {'fuel_type': 'Gas'},
+    {'color_id': 4},
+    {'color_name': 'Blue'},
+    {'manufacturer_id': 3, 'model_year': 2015, 'color_id': 4},
+]
+
+CASES = [
+    ('authenticate_user', queries.authenticate_user, ('user01', 'pw')),
+    ('get_manufacturers', queries.get_manufacturers.uncached, ()),
+    ('get_vehicle_types', queries.get_vehicle_types.uncached, ()),
+    ('get_colors', queries.get_colors.uncached, ()),
+    ('get_model_years', queries.get_model_years.uncached, ()),
+    ('get_fuel_types', queries.get_fuel_types.uncached, ()),
+    ('get_tables', queries.get_tables, ()),
+    ('get_parts', queries.get_parts, ()),
+    ('get_users', queries.get_users, ()),
+    ('get_customers', queries.get_customers, ()),
+    ('get_customer', queries.get_customer, (203,)),
+    ('search_customers', queries.search_customers, ('teri mit',)),
+    ('search_customers[phone]', queries.search_customers, ('745-762',)),
+    ('get_vehicle_by_id', queries.get_vehicle_by_id, (11,)),
+    ('get_vehicle_details', queries.get_vehicle_details, (11,)),
+    ('get_part_by_id', queries.get_part_by_id, (5,)),
+    ('get_vehicle_parts', queries.get_vehicle_parts, (11,)),
+    ('get_vehicle_transactions', queries.get_vehicle_transactions, (11,)),
+    ('get_sales_productivity', queries.get_sales_productivity, ()),
+    ('get_seller_history', queries.get_seller_history, ()),
+    ('get_part_statistics', queries.get_part_statistics, ()),
+    ('check_vehicle_summary', queries.check_vehicle_summary, ()),
+    ('get_table_versions', queries.get_table_versions, ('parts', 'vehicle_summary')),
+    ('get_vehicles[get_all]', queries.get_vehicles, (None, True), {'limit': 26}),
+    ('get_sales_productivity[range]', queries.get_sales_productivity, ('2019-01-01', '2019-03-31')),
+    ('get_seller_history[range]', queries.get_seller_history, ('2019-01-01', '2019-03-31')),
+] + [
+    (f'export[{dataset}]', lambda d=dataset: queries.execute_sql(*queries.export_query(d)), ())
+    for dataset in queries.EXPORTS
+] + [
+    (f'export[{dataset}, range]', lambda d=dataset: queries.execute_sql(*queries.export_query(d, '2019-01-01', None)), ())
+    for dataset in ('sales', 'purchases')
+] + [
+    (f'get_vehicles[{f}]', queries.get_vehicles, (f or None, False, True), {'limit': 26})
+    for f in FILTERS
+] + [
+    (f'get_vehicles[q={q}]', queries.get_vehicles, ({'q': q},), {'sort': sort, 'limit': 26})
+    for q, sort in (('camry', 'relevance'), ('toyota cam', 'relevance'), ('blue', 'year'), ('1hgc', 'relevance'))
+] + [
+    (f'get_vehicles[sort={sort}]', queries.get_vehicles, (None,), {'sort': sort, 'limit': 26,
+     'cursor': queries.encode_cursor('n', 1000 if sort != 'manufacturer' else 'Ford', 500)})
+    for sort in queries.VEHICLE_SORTS
+]
+
+
+@pytest.mark.parametrize('case', CASES, ids=[c[0] for c in CASES])
+def test_no_unexpected_full_scans(scaled_db, monkeypatch, case):
+    name, fn, args = case[:3]
+    kwargs = case[3] if len(case) > 3 else {}
+    statements = capture(monkeypatch, fn, *args, **kwargs)
+    assert statements, f"{name} issued no query"
+    for sql, params in statements:
+        unexpected = full_scans(scaled_db, sql, params) - EXPECTED_SCANS.get(name, set())
+        assert not unexpected, f"{name} full-scans {sorted(unexpected)}:\n{sql}"
+
+
+@pytest.mark.parametrize('sort', [s for s in queries.VEHICLE_SORTS if s != 'relevance'])
+@pytest.mark.parametrize('get_all', [False, True], ids=['sellable', 'get_all'])
+def test_listing_sorts_walk_an_index(scaled_db, sort, get_all):
+    # page one and a deep page both read their rows in index order, without sorting the listing first
+    value = {'year': 2000, 'price': 20000, 'mileage': 50000, 'manufacturer': 'Ford'}[sort]
+    for cursor in (None, queries.encode_cursor('n', value, 500), queries.encode_cursor('p', value, 500)):
+        sql, params, _ = queries.vehicles_query(None, get_all, sort=sort, cursor=cursor, limit=26)
+        plan = scaled_db.execute("EXPLAIN QUERY PLAN " + load_sql.query_to_sqlite(sql), params).fetchall()
+        assert not any('TEMP B-TREE' in row[3] for row in plan), f"{sort} sorts:\n{plan}"
@@ -0,0 +1,117 @@
+import os
+import shutil
+import sqlite3
+import threading
+
+import pytest
+from flask import Flask
+
+import db
+import metrics
+import queries
+
+COLOR = "SELECT color_name FROM colors WHERE colorID = 1"
+
+
+def set_color(path, name):
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE colors SET color_name = ? WHERE colorID = 1", (name,))
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def replicas(sqlite_db, monkeypatch):
+    """Two copies of the database as replicas, marked so a read shows where it went."""
+    paths = []
+    for name in ('replica-a', 'replica-b'):
+        path = sqlite_db.parent / f'{name}.db'
+        shutil.copy(sqlite_db, path)
+        set_color(path, name)
+        paths.append(path)
+    monkeypatch.setattr(db, '_replicas', None)
+    monkeypatch.setattr(db, '_local', threading.local())
+    monkeypatch.setenv('SQLITE_REPLICAS', ','.join(map(str, paths)))
+    yield paths
+    db.close_pool()
+
+
+def read_color() -> str:
+    return queries.execute_sql(COLOR)[0]['color_name']
+
+
+def test_reads_round_robin_over_replicas_and_writes_go_to_primary(replicas, monkeypatch):
+    assert {read_color() for _ in range(4)} == {'replica-a', 'replica-b'}
+    monkeypatch.setenv('DB_STICKY_SECONDS', '0')
+    queries.execute_write("UPDATE colors SET color_name = %s WHERE colorID = 1", ('primary',))
+    assert read_color().startswith('replica')  # not replicated here
+    assert sqlite3.connect(os.environ['SQLITE_PATH']).execute(COLOR).fetchone()[0] == 'primary'
+
+
+def test_reads_stick_to_primary_after_a_write(replicas):
+    queries.execute_write("UPDATE colors SET color_name = %s WHERE colorID = 1", ('primary',))
+    assert db.reads_from_primary()
+    assert read_color() == 'primary'
+
+
+def test_failed_replica_is_skipped_then_primary_is_used(replicas, monkeypatch, tmp_path):
+    missing = tmp_path / 'no-such-dir' / 'replica.db'
+    monkeypatch.setenv('SQLITE_REPLICAS', f'{missing},{replicas[1]}')
+    before = metrics.REPLICA_DOWN.values.get((str(missing),), 0)
+    assert [read_color() for _ in range(3)] == ['replica-b'] * 3
+    assert metrics.REPLICA_DOWN.values[(str(missing),)] == before + 1  # then left out until retry
+    assert db.get_replicas().healthy() == [str(replicas[1])]
+
+    db.close_pool()
+    monkeypatch.setenv('SQLITE_REPLICAS', str(missing))
+    assert read_color() == 'Aluminum'  # the primary's own value
+
+
+def test_request_reads_its_writes_and_the_session_sticks(replicas):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    db.init_app(app)
+
+    @app.post('/color')
+    def write():
+        queries.execute_write("UPDATE colors SET color_name = %s WHERE colorID = 1", ('primary',))
+        return read_color()
+
+    @app.get('/color')
+    def read():
+        return read_color()
+
+    client = app.test_client()
+    assert client.get('/color').text.startswith('replica')
+    assert client.post('/color').text == 'primary'
+    assert client.get('/color').text == 'primary'  # read-your-writes on the next request
+    assert app.test_client().get('/color').text.startswith('replica')  # other sessions are not pinned
+
+
+def test_without_replicas_the_session_is_left_alone(sqlite_db, monkeypatch):
+    monkeypatch.setattr(db, '_replicas', None)
+    monkeypatch.delenv('SQLITE_REPLICAS', raising=False)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    db.init_app(app)
+
+    @app.post('/color')
+    def write():
+        queries.execute_write("UPDATE colors SET color_name = %s WHERE colorID = 1", ('primary',))
+        return read_color()
+
+    response = app.test_client().post('/color')
+    assert response.text == 'primary' and 'Set-Cookie' not in response.headers
+
+
+def test_checks_before_writes_and_consistency_checks_read_the_primary(replicas):
+    vin = queries.get_vehicle_details(11)['vin']
+    for path in replicas:  # replicas that have not caught up yet
+        conn = sqlite3.connect(path)
+        conn.execute("DELETE FROM vehicle_summary WHERE vehicleID = 11")
+        conn.execute("UPDATE vehicles SET vin = 'LAGGING' WHERE vehicleID = 11")
+        conn.commit()
+        conn.close()
+    assert queries.existing_vins([vin]) == {vin}
+    assert queries.check_vehicle_summary() == [] and queries.check_report_rollups() == []
+    assert not db.reads_from_primary()  # only inside the checks
@@ -0,0 +1,82 @@
+"""Date-ranged reports and the streamed CSV/NDJSON exports."""
+import csv
+from datetime import date
+import io
+import json
+
+import pytest
+
+import db
+import queries
+from app import app
+
+START, END = date(2023, 1, 1), date(2023, 6, 30)
+
+
+def test_ranged_reports_aggregate_only_the_range(sqlite_db):
+    sales = queries.execute_sql("SELECT s.userID, pt.purchase_price FROM salestransactions s "
+                                "LEFT JOIN purchasetransactions pt ON s.vehicleID = pt.vehicleID "
+                                "WHERE s.sales_date BETWEEN %s AND %s", (str(START), str(END)))
+    report = {r['userID']: r for r in queries.get_sales_productivity(START, END)}
+    assert sum(r['vehicles_sold'] for r in report.values()) == len(sales) == 87
+    for user_id, row in report.items():
+        mine = [s['purchase_price'] or 0 for s in sales if s['userID'] == user_id]
+        assert row['vehicles_sold'] == len(mine)
+        assert row['total_sold_price'] == pytest.approx(sum(mine))
+
+    everything = queries.get_seller_history()
+    assert sum(r['vehicles_sold_to_dealer'] for r in queries.get_seller_history(None, END)) < \
+        sum(r['vehicles_sold_to_dealer'] for r in everything)
+    # a range covering all history gives the rollup's numbers
+    ranged = queries.get_seller_history(date(2000, 1, 1), date(2100, 1, 1))
+    totals = {r['customerID']: r['total_paid'] for r in everything}
+    assert {r['customerID']: r['total_paid'] for r in ranged} == pytest.approx(totals)
+
+
+def login_as_owner(client):
+    with client.session_transaction() as s:
+        s['role'] = 'Owner'
+        s['user_id'] = 1
+
+
+def test_export_streams_csv_and_ndjson(sqlite_db):
+    client = app.test_client()
+    assert client.get('/reports/export/sales.csv').status_code == 403
+    login_as_owner(client)
+
+    response = client.get(f'/reports/export/sales.csv?start={START}&end={END}')
+    assert response.status_code == 200 and response.is_streamed
+    assert response.headers['Content-Disposition'] == 'attachment; filename="sales_2023-01-01_2023-06-30.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 87
+    assert [r['sales_date'] for r in rows] == sorted(r['sales_date'] for r in rows)
+    assert all(str(START) <= r['sales_date'] <= str(END) for r in rows)
+
+    response = client.get('/reports/export/parts.ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 1636
+    first = json.loads(lines[0])
+    assert set(first) >= {'partID', 'vendor_name', 'cost', 'status'}
+
+    assert client.get('/reports/export/purchases.csv?start=2023-13-01').status_code == 400
+    assert db.get_pool().stats()['in_use'] == 0
+
+
+def test_abandoned_export_frees_its_connection(sqlite_db):
+    sql, params = queries.export_query('purchases')
+    chunks = queries.stream_sql(sql, params, chunk_size=10)
+    assert 'purchase_date' in next(chunks)
+    assert len(next(chunks)) == 10
+    assert db.get_pool().stats()['in_use'] == 1
+    chunks.close()
+    assert db.get_pool().stats()['in_use'] == 0
+
+
+def test_report_pages_take_a_date_range(sqlite_db):
+    client = app.test_client()
+    login_as_owner(client)
+    page = client.get(f'/reports/sales-productivity?start={START}&end={END}').get_data(as_text=True)
+    assert f'value="{START}"' in page and f'start={START}&amp;end={END}' in page
+    page = client.get('/reports/seller-history?start=2023-06-30&end=2023-01-01').get_data(as_text=True)
+    assert 'start date is after the end date' in page
@@ -0,0 +1,69 @@
+"""The rollup-backed reports match the original full GROUP BY queries, also after writes."""
+import pytest
+
+import db
+import queries
+from app import app
+
+LIVE_REPORTS = {
+    'get_sales_productivity': (
+        "SELECT u.userID, CONCAT(u.first_name, ' ', u.last_name) AS salesperson, "
+        "COUNT(s.vehicleID) AS vehicles_sold, COALESCE(SUM(pt.purchase_price),0) AS total_sold_price "
+        "FROM salestransactions s JOIN users u ON s.userID = u.userID "
+        "LEFT JOIN purchasetransactions pt ON s.vehicleID = pt.vehicleID "
+        "GROUP BY u.userID, u.first_name, u.last_name"
+    ),
+    'get_seller_history': (
+        "SELECT c.customerID, CONCAT(c.first_name, ' ', c.last_name) AS seller_name, "
+        "COUNT(pt.vehicleID) AS vehicles_sold_to_dealer, COALESCE(SUM(pt.purchase_price),0) AS total_paid "
+        "FROM purchasetransactions pt JOIN customers c ON pt.customerID = c.customerID "
+        "GROUP BY c.customerID, c.first_name, c.last_name"
+    ),
+    'get_part_statistics': (
+        "SELECT v.vendorID, v.vendor_name, COALESCE(SUM(p.quantity),0) AS parts_purchased, "
+        "COALESCE(SUM(p.cost * p.quantity),0.00) AS total_spent "
+        "FROM partorders po JOIN vendors v ON po.vendorID = v.vendorID "
+        "JOIN parts p ON p.part_orderID = po.part_orderID GROUP BY v.vendorID, v.vendor_name"
+    ),
+}
+
+
+def assert_reports_match_live():
+    for name, sql in LIVE_REPORTS.items():
+        live = queries.execute_sql(sql)
+        report = getattr(queries, name)()
+        assert len(report) == len(live), name
+        by_key = {tuple(r.values())[0]: r for r in report}
+        for row in live:
+            got = by_key[tuple(row.values())[0]]
+            for col, value in row.items():
+                assert got[col] == pytest.approx(value), (name, col)
+    assert queries.check_report_rollups() == []
+
+
+def test_rollups_follow_the_write_path(sqlite_db):
+    assert_reports_match_live()
+    paid_before = {r['customerID']: r['total_paid'] for r in queries.get_seller_history()}.get(207, 0)
+
+    with app.test_request_context('/'):
+        vid = queries.insert_vehicle_full('VIN-ROLLUP-1', 10.0, 'Coupe', 2030, 'Gas', 1, 1, None)
+        queries.insert_sales_transaction(vid, 1, 205, '2024-01-02')  # sold before the purchase is recorded
+        queries.insert_purchase_transaction(vid, 2, 205, 1234.5, 'Good')
+        vid = queries.insert_vehicle_full('VIN-ROLLUP-2', 10.0, 'Coupe', 2030, 'Gas', 1, 1, None)
+        queries.insert_purchase_transaction(vid, 2, 207, 900.0, 'Fair')
+        queries.insert_sales_transaction(vid, 26, 208, '2024-01-03')
+        queries.insert_part('RP-1', 'Mirror', 19.99, 3, part_order_id=9)
+        db.current_session().commit()
+
+    assert_reports_match_live()
+    sellers = {r['customerID']: r for r in queries.get_seller_history()}
+    assert sellers[207]['total_paid'] == pytest.approx(paid_before + 900.0)
+
+
+def test_rebuild_restores_drifted_rollups(sqlite_db):
+    queries.execute_write("UPDATE vendor_rollup SET total_spent = total_spent + 1 WHERE vendorID = 1")
+    queries.execute_write("DELETE FROM seller_rollup WHERE customerID IN (SELECT MIN(customerID) FROM seller_rollup)")
+    problems = queries.check_report_rollups()
+    assert {(p['table'], p['column']) for p in problems} == {('vendor_rollup', 'total_spent'), ('seller_rollup', '*')}
+    queries.rebuild_report_rollups()
+    assert queries.check_report_rollups() == []
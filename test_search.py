@@ -0,0 +1,53 @@
+"""Vehicle search over the search_terms index."""
+import queries
+import search
+from app import app
+
+
+def test_vehicle_terms_weigh_fields_and_index_the_vin():
+    terms = search.vehicle_terms({'vehicleID': 1, 'vin': '1HGCM-826', 'model_name': 'Civic', 'manufacturer_name': 'Honda',
+                                  'vehicle_type_name': 'Sedan', 'colors': 'Blue, Silver', 'model_year': 2015,
+                                  'description': 'Honda civic, one owner'})
+    assert terms['civic'] == 8 + 1 and terms['honda'] == 6 + 1 and terms['silver'] == 3
+    assert terms['2015'] == 3 and terms['1hgcm826'] == search.VIN_WEIGHT
+    assert search.query_terms('  Civic civic BLUE ') == ['civic', 'blue']
+
+
+def test_search_matches_every_word_by_prefix(sqlite_db):
+    rows = queries.search_vehicles('aston db', get_all=True)
+    assert sorted(r['model_name'] for r in rows) == ['DB7', 'DB9', 'DBS']
+    assert all(r['manufacturer_name'] == 'Aston Martin' for r in rows)
+    assert queries.search_vehicles('036eg6', get_all=True)[0]['vin'] == '036EG6XGHFJ822528'
+    assert queries.search_vehicles('aston zzz', get_all=True) == []
+    assert queries.search_vehicles('!!!') == []
+
+    # combines with the other filters, and exact words rank above prefixes
+    coupes = queries.get_vehicles({'q': 'coupe', 'vehicle_type_id': 2}, include_unready=True)
+    assert coupes and all(r['vehicle_typeID'] == 2 for r in coupes)
+    scores = [r['search_score'] for r in queries.search_vehicles('coupe', get_all=True, limit=100)]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_new_vehicles_are_indexed_with_their_colors(sqlite_db):
+    vid = queries.insert_vehicle_full('ZZTOP123', 10.0, 'Quasar', 2031, 'Battery', 1, 1, 'Prototype hatch')
+    queries.insert_purchase_transaction(vid, 1, 1, 1000.0, 'Good')
+    queries.set_vehicle_colors(vid, [3])
+    found = queries.search_vehicles('quasar black', get_all=True)
+    assert [r['vehicleID'] for r in found] == [vid]
+
+    page = queries.get_vehicles_page({'q': 'quasar'}, True, sort='relevance')
+    assert [r['vehicleID'] for r in page['rows']] == [vid]
+
+
+def test_search_endpoints(sqlite_db):
+    client = app.test_client()
+    # anonymous visitors only see vehicles ready to sell: the unsold Aston still awaits parts
+    assert client.get('/api/search?q=aston').get_json()['results'] == []
+    with client.session_transaction() as s:
+        s['role'] = 'Owner'
+    data = client.get('/api/search?q=aston').get_json()
+    assert data['query'] == 'aston' and data['results']
+    assert all(r['manufacturer_name'] == 'Aston Martin' and r['url'].startswith('/car/') for r in data['results'])
+    html = client.get('/cars?q=aston').get_data(as_text=True)
+    assert html.count('>Details</a>') == len(data['results'])
+    assert 'value="relevance" selected' in html
@@ -0,0 +1,27 @@
+"""Warm-up before fork and the post-fork reset (gunicorn itself is not needed)."""
+import cache
+import db
+import metrics
+import parallel
+import queries
+import serve
+from app import app
+
+
+def test_warm_up_fills_caches_and_leaves_no_connections(sqlite_db):
+    result = serve.warm_up(app)
+    assert result['templates'] >= len(app.jinja_env.list_templates(extensions=['html']))
+    assert db._pool is None  # closed before the fork; each worker opens its own
+
+    hits = cache.lookup_cache.hits
+    queries.get_colors(), queries.get_manufacturers(), queries.get_fuel_types()
+    assert cache.lookup_cache.hits == hits + 3 and db._pool is None
+
+
+def test_post_fork_drops_what_the_parent_owned(sqlite_db):
+    parallel.gather((db.dialect,), (db.dialect,))
+    parent_pool = db.get_pool()
+    metrics.QUERY_SECONDS.observe('warm', 'read', value=0.1)
+    serve.post_fork(server=None, worker=None)
+    assert db._pool is None and parallel._executor is None and not metrics.QUERY_SECONDS.values
+    assert db.get_pool() is not parent_pool
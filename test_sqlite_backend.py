@@ -0,0 +1,76 @@
+"""Run the queries.py functions unchanged against the SQLite backend."""
+import pytest
+
+import db
+import queries
+
+
+def test_read_functions(sqlite_db):
+    assert queries.authenticate_user('nope', 'nope') is None
+    assert {t['table_name'] for t in queries.get_tables()} >= {'vehicles', 'vehicle_summary'}
+    facets = queries.filter_data()
+    assert facets['manufacturers'] and facets['colors'] and facets['model_years'] and facets['fuel_types']
+
+    page = queries.get_vehicles_page(None, True, sort='price', page_size=10)
+    assert len(page['rows']) == 10 and page['next_cursor']
+    assert len(queries.get_vehicles(None, True)) == 277
+
+    car = queries.get_vehicle_details(11)
+    assert car['vehicleID'] == 11 and set(car) >= {'colors', 'sales_price', 'is_sold'}
+    assert queries.get_vehicle_parts(11)
+    assert queries.get_vehicle_transactions(11)['seller'] is not None
+
+    productivity = queries.get_sales_productivity()
+    assert productivity and ' ' in productivity[0]['salesperson']  # CONCAT(first, ' ', last)
+    assert queries.get_seller_history() and queries.get_part_statistics()
+    assert queries.get_customers() and queries.get_parts() and queries.get_users()
+    assert queries.check_vehicle_summary() == []
+
+
+def test_write_functions_share_the_request_transaction(sqlite_db):
+    from app import app
+
+    with app.test_request_context('/'):
+        vid = queries.insert_vehicle_full('VIN-SQLITE-1', 1200.0, 'Roadster', 2031, 'Battery', 1, 1, None)
+        queries.insert_purchase_transaction(vid, 1, 1, 1000.0, 'Good')
+        queries.set_vehicle_colors(vid, [3, 19])
+        # visible inside the request before commit
+        assert queries.get_vehicle_details(vid)['colors'] == 'Black, Red'
+        db.current_session().rollback()
+        db.current_session().close()
+
+    assert queries.get_vehicle_details(vid) is None
+
+    vid = queries.insert_vehicle_full('VIN-SQLITE-2', 1200.0, 'Roadster', 2031, 'Battery', 1, 1, None)
+    queries.insert_purchase_transaction(vid, 1, 1, 1000.0, 'Good')
+    assert queries.get_vehicle_details(vid)['sales_price'] == pytest.approx(1400.0)
+    assert 2031 in queries.get_model_years()
+    assert queries.check_vehicle_summary() == []
+
+
+def test_close_all_reaches_every_thread(sqlite_db):
+    import sqlite3
+    import threading
+
+    from sqlite_backend import ThreadLocalPool
+
+    pool = ThreadLocalPool(str(sqlite_db))
+    held = []
+
+    def worker():
+        conn = pool.acquire()
+        held.append(conn._conn)
+        conn.close()  # idle in the worker's thread
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    busy = pool.acquire()
+    busy_raw = busy._conn
+    pool.close_all()
+    with pytest.raises(sqlite3.ProgrammingError):
+        held[0].cursor().execute("SELECT 1")
+    busy_raw.cursor().execute("SELECT 1")  # still usable until it is handed back
+    busy.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        busy_raw.cursor().execute("SELECT 1")
@@ -0,0 +1,29 @@
+"""Fragment cache and per-template render metrics."""
+import cache
+import metrics
+import queries
+from app import app
+
+
+def _rows_rendered() -> dict:
+    return {labels[1]: n for labels, n in metrics.FRAGMENTS.values.items() if labels[0] == 'cars_row'}
+
+
+def test_cars_rows_are_cached_until_the_vehicle_changes(sqlite_db):
+    client = app.test_client()
+    metrics.reset()
+    first = client.get('/cars?get_all=1&sort=year')
+    assert _rows_rendered() == {'miss': 25}
+    assert client.get('/cars?get_all=1&sort=year').data == first.data
+    assert _rows_rendered() == {'miss': 25, 'hit': 25}
+
+    # a write changes only its own vehicle's key: that row is rendered again, the rest are hits
+    car = queries.get_vehicles_page(None, True, sort='year', page_size=1)['rows'][0]
+    queries.set_vehicle_colors(car['vehicleID'], [3])
+    cache.lookup_cache.clear()
+    page = client.get('/cars?get_all=1&sort=year').get_data(as_text=True)
+    assert _rows_rendered() == {'miss': 26, 'hit': 49}
+    assert 'Black' in page.split(car['vin'])[1].split('</tr>')[0]
+
+    names = {labels[0] for labels in metrics.TEMPLATE_SECONDS.values}
+    assert {'cars/index.html'} <= names
@@ -0,0 +1,51 @@
+"""Conditional GET from table_versions."""
+import app as app_module
+import db
+import queries
+from app import app
+
+
+def test_unchanged_pages_answer_304_without_running_the_view(sqlite_db, monkeypatch):
+    client = app.test_client()
+    first = client.get('/cars')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.last_modified is not None
+
+    def fail(*args, **kwargs):
+        raise AssertionError('view ran')
+
+    view = app_module.get_vehicles_page
+    monkeypatch.setattr(app_module, 'get_vehicles_page', fail)
+    again = client.get('/cars', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.headers['ETag'] == etag and not again.data
+    assert client.get('/cars', headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+
+    # the navbar shows who is logged in, so the viewer is part of the ETag
+    with client.session_transaction() as s:
+        s.update(role='Owner', email='owner@example.com', name='O Wner', user_id=1)
+    monkeypatch.setattr(app_module, 'get_vehicles_page', view)
+    assert client.get('/cars', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_writes_bump_versions_when_the_request_commits(sqlite_db):
+    client = app.test_client()
+    etag = client.get('/parts').headers['ETag']
+    before = queries.get_table_versions('parts', 'vehicle_summary')
+
+    with app.test_request_context('/'):
+        queries.update_part_status(5, 'Installed')
+        # collected on the session, written together with the commit
+        assert db.current_session().touched >= {'parts', 'vehicle_summary'}
+        assert queries.get_table_versions('parts') == {'parts': before['parts']}
+        db.current_session().commit()
+        db.current_session().close()
+
+    after = queries.get_table_versions('parts', 'vehicle_summary')
+    assert after['parts'][0] == before['parts'][0] + 1
+    assert after['vehicle_summary'][0] == before['vehicle_summary'][0] + 1
+    response = client.get('/parts', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+
+    # outside a request the bump is committed with the write itself
+    queries.add_customer('A', 'B', 'ab@example.com', '5550000000', '1 St', 'Town', 'ST', '00000', 'D123')
+    assert queries.get_table_versions('customers')['customers'][0] == 2
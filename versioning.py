@@ -0,0 +1,81 @@
+"""Conditional GET for pages built from slowly changing tables.
+
+Every write through queries.execute_write counts a change to its table in
+table_versions, in the same transaction. A view decorated with
+
+    @conditional('vehicle_summary', 'colors')
+
+gets an ETag made from those tables' versions and the viewer (role and the name
+shown in the navbar), and a Last-Modified from the newest change. A request whose
+If-None-Match (or, without one, If-Modified-Since) still matches is answered with
+304 Not Modified without running the view: one lookup in table_versions instead
+of the page's queries and template.
+
+The versions are read before the view runs, so a write committing in between can
+only make the ETag older than the page (the next request re-renders), never newer.
+They are kept for the rest of the request (versions_for), where the fragment cache
+keys on them too; a write in the request drops them with the query memo.
+"""
+from datetime import datetime, timezone
+from functools import wraps
+import hashlib
+
+from flask import g, has_request_context, make_response, request, session
+
+from queries import get_table_versions
+
+
+def versions_for(*tables: str) -> dict:
+    """{table: (version, updated_at)}, read at most once per request for each table."""
+    if not has_request_context():
+        return get_table_versions(*tables)
+    known = g.setdefault('table_versions', {})
+    missing = [t for t in tables if t not in known]
+    if missing:
+        fetched = get_table_versions(*missing)
+        for table in missing:
+            known[table] = fetched.get(table, (0, 0))
+    return {t: known[t] for t in tables}
+
+
+def _viewer() -> str:
+    return '|'.join(str(session.get(k) or '') for k in ('role', 'user_id', 'email', 'name'))
+
+
+def _not_modified(etag: str, last_modified: datetime | None) -> bool:
+    if request.if_none_match:  # the ETag takes precedence over the date
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional(*tables: str):
+    """Answer GETs with 304 while `tables` and the viewer are unchanged."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+            versions = versions_for(*tables)
+            etag = hashlib.sha1(repr((sorted(versions.items()), _viewer())).encode()).hexdigest()[:20]
+            updated = max((u for _, u in versions.values()), default=0)
+            last_modified = datetime.fromtimestamp(updated, timezone.utc) if updated else None
+            if _not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            # always revalidate, and never share a page between users
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+
+        return wrapper
+
+    return decorator